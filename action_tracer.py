@@ -0,0 +1,544 @@
+"""Trazas de las acciones del usuario, desde el callback de Tk hasta el SQL
+
+Cada acción (el command de un botón o un evento enlazado con bind) abre una
+traza con un span raíz; dentro se anidan los spans de los métodos que la app
+instrumenta (armado de widgets, llamadas a DatabaseManager, cada consulta), los
+callbacks de after que la acción programa y el trabajo que manda a hilos. La
+traza se cierra cuando termina todo eso y se guarda como una línea JSON en un
+archivo local que rota solo.
+
+Está desactivado salvo que se pida:
+    ACTION_TRACE=1 python mascotas-ari.py              (escribe mascotas-ari.actions.jsonl)
+    ACTION_TRACE=acciones.jsonl python mascotas-ari.py
+
+Controles de muestreo y tamaño:
+    ACTION_TRACE_SAMPLE=0.1      traza el 10% de las acciones (por defecto todas)
+    ACTION_TRACE_MIN_MS=50       sólo guarda las que tardaron al menos 50 ms
+    ACTION_TRACE_MAX_MB=5        tamaño del archivo antes de rotar (se guardan 3 viejos)
+
+Para ver las acciones más lentas con su desglose:
+    python action_tracer.py mascotas-ari.actions.jsonl [--limit 20] [--action carrito]
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+ENV_VAR = "ACTION_TRACE"
+SAMPLE_ENV_VAR = "ACTION_TRACE_SAMPLE"
+MIN_MS_ENV_VAR = "ACTION_TRACE_MIN_MS"
+MAX_MB_ENV_VAR = "ACTION_TRACE_MAX_MB"
+
+_tracer = None
+# (traza, índice del span en curso) del contexto actual
+_current = contextvars.ContextVar("action_trace", default=None)
+# Código del callback de after que se está corriendo dentro de una traza
+_running_after = contextvars.ContextVar("action_trace_after", default=None)
+
+
+class Trace:
+    """Spans de una acción; se escribe cuando se libera el último trabajo pendiente"""
+    def __init__(self, tracer: "ActionTracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.at = time.time()
+        self.started = time.perf_counter_ns()
+        # [nombre, tipo, padre, inicio ns, fin ns, hilo]
+        self.spans = []
+        self.dropped = 0
+        self.followed_afters = 0
+        self._pending = 1
+        self._lock = threading.Lock()
+
+    def age(self) -> float:
+        return (time.perf_counter_ns() - self.started) / 1e9
+
+    def open_span(self, name: str, kind: str, parent) -> int:
+        with self._lock:
+            if len(self.spans) >= self.tracer.max_spans:
+                self.dropped += 1
+                return None
+            self.spans.append([name, kind, parent, time.perf_counter_ns(), None,
+                               threading.current_thread().name])
+            return len(self.spans) - 1
+
+    def close_span(self, index):
+        if index is not None:
+            self.spans[index][4] = time.perf_counter_ns()
+
+    def hold(self):
+        with self._lock:
+            self._pending += 1
+
+    def release(self):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self.tracer.write(self)
+
+    def run(self, parent, name: str, kind: str, func, *args, **kwargs):
+        """Corre func dentro de un span de esta traza (en cualquier hilo)"""
+        index = self.open_span(name, kind, parent)
+        token = _current.set((self, parent if index is None else index))
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+            self.close_span(index)
+
+    def bind(self, func, name: str, kind: str, release: bool = False):
+        """func que al correr, más tarde o en otro hilo, cuelga del span actual
+
+        Con release libera además la traza al terminar (el que la sostuvo con
+        hold() ya no la necesita abierta).
+        """
+        current = _current.get()
+        parent = current[1] if current is not None and current[0] is self else 0
+
+        def bound(*args, **kwargs):
+            try:
+                return self.run(parent, name, kind, func, *args, **kwargs)
+            finally:
+                if release:
+                    self.release()
+
+        return bound
+
+    def to_record(self) -> dict:
+        spans = []
+        end = self.started
+        for name, kind, parent, start, stop, thread in self.spans:
+            stop = stop or start
+            end = max(end, stop)
+            spans.append({
+                "name": name,
+                "kind": kind,
+                "parent": parent,
+                "start_ms": round((start - self.started) / 1e6, 3),
+                "duration_ms": round((stop - start) / 1e6, 3),
+                "thread": thread,
+            })
+        record = {
+            "action": self.name,
+            "at": datetime.fromtimestamp(self.at).isoformat(timespec="milliseconds"),
+            "duration_ms": round((end - self.started) / 1e6, 3),
+            "spans": spans,
+        }
+        if self.dropped:
+            record["dropped_spans"] = self.dropped
+        return record
+
+
+class ActionTracer:
+    def __init__(self, output: str, sample_rate: float = 1.0, min_ms: float = 0,
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 3,
+                 follow_after_ms: int = 500, max_trace_seconds: float = 10,
+                 max_spans: int = 2000, max_afters: int = 200):
+        self.output = output
+        self.sample_rate = sample_rate
+        self.min_ms = min_ms
+        # Los after más largos (p. ej. cerrar una notificación a los 3 s) no
+        # retienen la traza; tampoco los que se programan pasado max_trace_seconds
+        self.follow_after_ms = follow_after_ms
+        self.max_trace_seconds = max_trace_seconds
+        self.max_spans = max_spans
+        self.max_afters = max_afters
+        self.written = 0
+
+        self._logger = logging.getLogger(f"action_tracer.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(output, maxBytes=max_bytes, backupCount=backups,
+                                            encoding="utf-8", delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(self._handler)
+
+        self._after_traces = {}
+        self._installed = False
+        # nombre -> (dueño, nuestro gancho) de los ganchos que siguen en la cadena
+        self._hooks = {}
+
+    # --- ganchos de tkinter -------------------------------------------------
+
+    def install(self):
+        import tkinter
+        if self._installed:
+            return
+        self._installed = True
+        # Los ganchos de una instalación anterior que siguen en la cadena se
+        # reutilizan; sólo se crean los que ya se quitaron
+        tracer = self
+        active = lambda: tracer._installed
+
+        if "CallWrapper" not in self._hooks:
+            class TracedCallWrapper(tkinter.CallWrapper):
+                """CallWrapper de tkinter que abre una traza por acción del usuario"""
+                _hook_active = staticmethod(active)
+                _hook_previous = tkinter.CallWrapper
+                _hook_detach = staticmethod(lambda: tracer._hooks.pop("CallWrapper", None))
+
+                def __call__(self, *args):
+                    if (not tracer._installed or _current.get() is not None
+                            or not tracer.is_user_action(self.func)):
+                        return super().__call__(*args)
+                    if tracer.sample_rate < 1 and random.random() >= tracer.sample_rate:
+                        return super().__call__(*args)
+                    trace = Trace(tracer, tracer.action_name(self.func, self.widget))
+                    try:
+                        return trace.run(None, trace.name, "action", super().__call__, *args)
+                    finally:
+                        trace.release()
+
+            self._hook("CallWrapper", tkinter, TracedCallWrapper)
+
+        if "after" not in self._hooks:
+            original_after = tkinter.Misc.after
+
+            def after(widget, ms, func=None, *args):
+                current = _current.get()
+                if (not tracer._installed or func is None or current is None
+                        or not tracer.follows(current[0], ms)):
+                    return original_after(widget, ms, func, *args)
+                key = after_key(func)
+                if key == _running_after.get():
+                    # Se reprograma a sí mismo (un sondeo o una animación): seguirlo
+                    # dejaría la traza abierta hasta el tope y su duración no diría nada
+                    return original_after(widget, ms, func, *args)
+                trace = current[0]
+                trace.hold()
+                trace.followed_afters += 1
+                name = f"after {getattr(func, '__name__', 'callback')}"
+                bound = trace.bind(func, name, "after")
+                after_id = None
+
+                def callback(*callback_args):
+                    tracer._after_traces.pop(after_id, None)
+                    token = _running_after.set(key)
+                    try:
+                        return bound(*callback_args)
+                    finally:
+                        _running_after.reset(token)
+                        trace.release()
+
+                after_id = original_after(widget, ms, callback, *args)
+                tracer._after_traces[after_id] = trace
+                return after_id
+
+            after._hook_active = active
+            after._hook_previous = original_after
+            after._hook_detach = lambda: tracer._hooks.pop("after", None)
+            self._hook("after", tkinter.Misc, after)
+
+        if "after_cancel" not in self._hooks:
+            original_after_cancel = tkinter.Misc.after_cancel
+
+            def after_cancel(widget, id):
+                trace = tracer._after_traces.pop(id, None)
+                try:
+                    return original_after_cancel(widget, id)
+                finally:
+                    if trace is not None:
+                        trace.release()
+
+            after_cancel._hook_active = active
+            after_cancel._hook_previous = original_after_cancel
+            after_cancel._hook_detach = lambda: tracer._hooks.pop("after_cancel", None)
+            self._hook("after_cancel", tkinter.Misc, after_cancel)
+
+    def _hook(self, name: str, owner, hook):
+        self._hooks[name] = (owner, hook)
+        setattr(owner, name, hook)
+
+    def uninstall(self):
+        """Quita cada gancho que siga siendo el de afuera
+
+        Si otro (p. ej. el detector de N+1 de la app) envolvió alguno después,
+        ése queda en la cadena como paso directo para no quitar también el
+        suyo: lo saltea quien lo quite a él, o un install() lo reactiva.
+        """
+        if not self._installed:
+            return
+        self._installed = False
+        for name, (owner, hook) in list(self._hooks.items()):
+            if getattr(owner, name) is hook:
+                setattr(owner, name, skip_inactive_hooks(hook._hook_previous))
+                del self._hooks[name]
+        self._handler.close()
+
+    @staticmethod
+    def is_user_action(func) -> bool:
+        """Los callbacks de after pasan también por CallWrapper: no son acciones"""
+        return not getattr(func, "__qualname__", "").endswith("after.<locals>.callit")
+
+    def follows(self, trace: Trace, ms) -> bool:
+        if trace.followed_afters >= self.max_afters or trace.age() > self.max_trace_seconds:
+            return False
+        return ms == "idle" or (isinstance(ms, (int, float)) and ms <= self.follow_after_ms)
+
+    @staticmethod
+    def action_name(func, widget) -> str:
+        """Nombre de la acción: el texto del widget, si tiene, y el callback"""
+        name = describe(func)
+        try:
+            text = widget.cget("text") if widget is not None else ""
+        except Exception:
+            text = ""
+        if text:
+            name = f"{widget.winfo_class()} «{str(text).strip()}» → {name}"
+        return name
+
+    # --- spans --------------------------------------------------------------
+
+    @contextmanager
+    def span(self, name: str, kind: str = "app"):
+        current = _current.get()
+        if current is None:
+            yield
+            return
+        trace, parent = current
+        index = trace.open_span(name, kind, parent)
+        token = _current.set((trace, parent if index is None else index))
+        try:
+            yield
+        finally:
+            _current.reset(token)
+            trace.close_span(index)
+
+    def wrap(self, func, kind: str, name: str = None, detail=None):
+        """func que registra un span cuando corre dentro de una traza
+
+        detail(*args, **kwargs) puede dar un nombre más útil para cada llamada
+        (p. ej. la forma de la consulta en execute_query).
+        """
+        name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            current = _current.get()
+            if current is None:
+                return func(*args, **kwargs)
+            span_name = name
+            if detail is not None:
+                try:
+                    span_name = detail(*args, **kwargs)
+                except Exception:
+                    pass
+            trace, parent = current
+            return trace.run(parent, span_name, kind, func, *args, **kwargs)
+
+        traced.action_traced = True
+        return traced
+
+    def instrument(self, cls, kind: str, prefixes: tuple = None, detail: dict = None):
+        """Envuelve los métodos públicos de cls (o los que empiezan con prefixes)
+
+        Los métodos ya instrumentados se respetan, así que se puede llamar
+        primero con prefijos específicos y después con el resto.
+        """
+        detail = detail or {}
+        for attr, value in list(vars(cls).items()):
+            if not callable(value) or isinstance(value, (type, staticmethod, classmethod)):
+                continue
+            if getattr(value, "action_traced", False):
+                continue
+            if attr.startswith("__") or (attr.startswith("_") and attr not in detail):
+                continue
+            if prefixes and not attr.startswith(prefixes) and attr not in detail:
+                continue
+            setattr(cls, attr, self.wrap(value, kind, f"{cls.__name__}.{attr}", detail.get(attr)))
+
+    # --- salida -------------------------------------------------------------
+
+    def write(self, trace: Trace):
+        record = trace.to_record()
+        if record["duration_ms"] < self.min_ms:
+            return
+        try:
+            self._logger.info(json.dumps(record, ensure_ascii=False))
+            self.written += 1
+        except Exception as e:
+            print(f"No se pudo guardar la traza de {trace.name}: {e}")
+
+
+def skip_inactive_hooks(previous):
+    """Lo que queda al quitar un gancho: se saltean los de abajo ya desactivados
+
+    Los ganchos (de este módulo o de la app) llevan _hook_active, _hook_previous
+    y _hook_detach, que avisa a su dueño que ya no están en la cadena.
+    """
+    while getattr(previous, "_hook_active", None) is not None and not previous._hook_active():
+        previous._hook_detach()
+        previous = previous._hook_previous
+    return previous
+
+
+def after_key(func):
+    """Identifica un callback de after por su código, así una lambda o un
+    método vuelto a crear en cada paso cuenta como el mismo"""
+    func = getattr(func, "__func__", func)
+    return getattr(func, "__code__", func)
+
+
+def describe(func) -> str:
+    """Nombre corto de un callback (las lambdas, por su línea)"""
+    name = getattr(func, "__qualname__", None) or repr(func)
+    parts = [part for part in name.split(".") if part != "<locals>"]
+    name = ".".join(parts[-2:])
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "<lambda>":
+        name = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+def hold():
+    """Retiene la traza en curso para trabajo que sigue después (None si no hay)"""
+    current = _current.get()
+    if current is None:
+        return None
+    current[0].hold()
+    return current[0]
+
+
+def enable_from_env(app_name: str = None):
+    """Activa las trazas si se pidió por ACTION_TRACE; devuelve el trazador o None
+
+    Hay que llamarla antes de crear los widgets para que sus callbacks cuenten.
+    """
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    output = os.environ.get(ENV_VAR, "")
+    if not output or output == "0":
+        return None
+
+    if output == "1":
+        app_name = app_name or os.path.basename(sys.argv[0] or "app")
+        output = os.path.splitext(app_name)[0] + ".actions.jsonl"
+    _tracer = ActionTracer(
+        output,
+        sample_rate=float(os.environ.get(SAMPLE_ENV_VAR, "1") or 1),
+        min_ms=float(os.environ.get(MIN_MS_ENV_VAR, "0") or 0),
+        max_bytes=int(float(os.environ.get(MAX_MB_ENV_VAR, "5") or 5) * 1024 * 1024),
+    )
+    _tracer.install()
+    print(f"Trazas de acciones en {output}")
+    return _tracer
+
+
+# --- visor --------------------------------------------------------------------
+
+def load_records(paths: list) -> list:
+    """Lee las trazas de los archivos (los rotados incluidos si se pasan)"""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    return records
+
+
+def own_times(spans: list) -> list:
+    """Duración de cada span menos la de sus hijos del mismo hilo"""
+    own = [span["duration_ms"] for span in spans]
+    for span in spans:
+        parent = span["parent"]
+        if parent is not None and spans[parent]["thread"] == span["thread"]:
+            own[parent] -= span["duration_ms"]
+    return [max(ms, 0) for ms in own]
+
+
+def breakdown(record: dict) -> dict:
+    """Tiempo propio por tipo de span, en ms
+
+    Lo que corre en hilos de trabajo se suma aparte y se solapa con el resto;
+    "espera" es el tiempo en que el hilo de la interfaz no hizo nada de la
+    acción (la cola de los hilos, los after pendientes).
+    """
+    spans = record["spans"]
+    own = own_times(spans)
+    totals = {}
+    busy = 0
+    ui_thread = spans[0]["thread"] if spans else None
+    for span, ms in zip(spans, own):
+        totals[span["kind"]] = totals.get(span["kind"], 0) + ms
+        if span["thread"] == ui_thread:
+            busy += ms
+    totals["espera"] = max(record["duration_ms"] - busy, 0)
+    return totals
+
+
+def slowest_spans(record: dict, limit: int = 5) -> list:
+    spans = record["spans"]
+    ranked = sorted(zip(own_times(spans), spans), key=lambda item: -item[0])
+    return [(round(ms, 2), span) for ms, span in ranked[:limit]]
+
+
+def format_breakdown(totals: dict) -> str:
+    ordered = sorted(totals.items(), key=lambda item: -item[1])
+    return " · ".join(f"{kind} {ms:.1f}" for kind, ms in ordered if ms >= 0.05)
+
+
+def print_slowest(records: list, limit: int = 20, spans: int = 5):
+    ranked = sorted(records, key=lambda record: -record["duration_ms"])[:limit]
+    print(f"{'ms':>9}  {'cuándo':<23}  acción")
+    for record in ranked:
+        print(f"{record['duration_ms']:>9.1f}  {record['at']:<23}  {record['action']}")
+        print(f"{'':>9}  {format_breakdown(breakdown(record))}")
+        for ms, span in slowest_spans(record, spans):
+            print(f"{'':>11}{ms:>8.1f} ms  [{span['kind']}] {span['name'][:100]}"
+                  f"{'' if span['thread'] == 'MainThread' else '  (' + span['thread'] + ')'}")
+
+
+def print_by_action(records: list, limit: int = 20):
+    """Resumen por acción: cantidad, mediana, p95 y máximo"""
+    groups = {}
+    for record in records:
+        groups.setdefault(record["action"], []).append(record["duration_ms"])
+    rows = []
+    for action, durations in groups.items():
+        durations.sort()
+        pick = lambda q: durations[min(len(durations) - 1, int(q * len(durations)))]
+        rows.append((pick(0.95), action, len(durations), pick(0.5), durations[-1]))
+    rows.sort(reverse=True)
+    print(f"{'veces':>6} {'p50 ms':>9} {'p95 ms':>9} {'máx ms':>9}  acción")
+    for p95, action, count, p50, worst in rows[:limit]:
+        print(f"{count:>6} {p50:>9.1f} {p95:>9.1f} {worst:>9.1f}  {action}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Acciones más lentas de las trazas de la interfaz")
+    parser.add_argument("traces", nargs="+", help="archivos .actions.jsonl (y sus rotados .1, .2, ...)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--spans", type=int, default=5, help="spans más costosos por acción")
+    parser.add_argument("--action", help="sólo acciones cuyo nombre contiene este texto")
+    parser.add_argument("--by-action", action="store_true", help="agrupar por acción (p50/p95/máx)")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.traces)
+    if args.action:
+        needle = args.action.lower()
+        records = [record for record in records if needle in record["action"].lower()]
+    if not records:
+        print("No hay trazas")
+        return 1
+    if args.by_action:
+        print_by_action(records, args.limit)
+    else:
+        print_slowest(records, args.limit, args.spans)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
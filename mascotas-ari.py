@@ -1,5 +1,10 @@
+# Perfil de arranque opcional (STARTUP_PROFILE=1 o --profile-startup): va antes
+# que los demás imports para poder medirlos
+import startup_profiler
+startup_profiler.enable_from_env()
+
 import tkinter as tk
-from tkinter import ttk, messagebox, font as tkfont, filedialog
+from tkinter import ttk, messagebox, font as tkfont
 import json
 import hashlib
 import random
@@ -7,11 +12,44 @@ import time
 from datetime import datetime, timedelta
 import math
 import threading
+import queue
 import os
+import re
+import bisect
+import unicodedata
+import functools
+import sqlite3
+import sys
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import List, Dict, Optional
-import mysql.connector
-from mysql.connector import Error
+
+# mysql.connector se importa recién al abrir la primera conexión MySQL (ver
+# import_mysql): es el import más lento del arranque y con SQLite no se usa
+mysql = None
+# Los diagnósticos opcionales (ACTION_TRACE, STALL_WATCHDOG) se importan en
+# main() sólo si se piden; mientras tanto el módulo queda en None
+action_tracer = None
+
+class PoolError(Exception):
+    """No hay conexiones disponibles en el pool"""
+
+# Errores de base de datos que maneja la app, sea cual sea el backend
+DB_ERRORS = (sqlite3.Error, PoolError)
+
+def import_mysql():
+    """Importa mysql.connector la primera vez y suma sus errores a DB_ERRORS"""
+    global mysql, DB_ERRORS
+    if mysql is None:
+        try:
+            import mysql.connector
+        except ImportError:
+            raise ImportError("Falta mysql-connector-python: instálalo o usa el backend SQLite (PETZONE_DB=sqlite)")
+        DB_ERRORS = DB_ERRORS + (mysql.connector.Error,)
+    return mysql
 
 @dataclass
 class Product:
@@ -27,6 +65,10 @@ class Product:
     marca: str = None
     tipo_mascota: str = None
     edad_mascota: str = None
+    rating_count: int = 0
+
+class OrderError(Exception):
+    """Un pedido no se puede completar (producto inexistente o sin stock)"""
 
 @dataclass
 class User:
@@ -43,38 +85,2187 @@ class User:
     ciudad: str = None
     codigo_postal: str = None
 
-class DatabaseManager:
-    def __init__(self):
-        self.connection = None
-        self.connect()
+class PooledConnection:
+    """Conexión física administrada por el pool"""
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.broken = False
+        # Se verifica con un ping antes del próximo uso (p. ej. tras un error)
+        self.suspect = False
+        # Sentencias preparadas en esta conexión: texto SQL -> (texto, cursor)
+        self.statements = OrderedDict()
+
+class ConnectionPool:
+    """Pool de conexiones MySQL compartido entre el hilo de Tk y los hilos de trabajo"""
+    def __init__(self, factory, size=5, idle_timeout=300, max_lifetime=1800, checkout_timeout=30,
+                 validator=None, health_check_interval=30):
+        self.factory = factory
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.validator = validator
+        self.health_check_interval = health_check_interval
+        self._idle: List[PooledConnection] = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+
+    def _is_expired(self, entry: PooledConnection, now: float) -> bool:
+        if entry.broken:
+            return True
+        if self.max_lifetime and now - entry.created_at > self.max_lifetime:
+            return True
+        if self.idle_timeout and now - entry.last_used > self.idle_timeout:
+            return True
+        return False
+
+    def _evict_idle(self, now: float) -> List[PooledConnection]:
+        """Retira del pool las conexiones inactivas o viejas (llamar con el lock tomado)"""
+        expired = [entry for entry in self._idle if self._is_expired(entry, now)]
+        if expired:
+            self._idle = [entry for entry in self._idle if entry not in expired]
+            self._open -= len(expired)
+            self._condition.notify(len(expired))
+        return expired
+
+    def _close(self, entries):
+        for entry in entries:
+            try:
+                entry.connection.close()
+            except Exception:
+                pass
+
+    def _needs_health_check(self, entry: PooledConnection, now: float) -> bool:
+        if self.validator is None:
+            return False
+        return entry.suspect or now - entry.last_used > self.health_check_interval
+
+    def _discard(self, entry: PooledConnection):
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+        self._close([entry])
+
+    def _checkout(self) -> PooledConnection:
+        while True:
+            entry = self._checkout_unchecked()
+            # Sólo se hace ping si la conexión estuvo inactiva o falló antes;
+            # el resto de las veces se usa directamente sin ida y vuelta extra
+            if self._needs_health_check(entry, time.monotonic()):
+                if not self.validator(entry.connection):
+                    self._discard(entry)
+                    continue
+                entry.suspect = False
+            return entry
+
+    def _checkout_unchecked(self) -> PooledConnection:
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if expired:
+                    self._close(expired)
+                if self._idle:
+                    # LIFO: la conexión usada más recientemente es la más probable de seguir viva
+                    return self._idle.pop()
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise PoolError("No hay conexiones disponibles en el pool")
+                self._condition.wait(remaining)
         
+        try:
+            return PooledConnection(self.factory())
+        except Exception:
+            with self._condition:
+                self._open -= 1
+                self._condition.notify()
+            raise
+
+    def acquire(self):
+        """Obtiene una conexión; es reentrante dentro del mismo hilo"""
+        held = getattr(self._local, 'entry', None)
+        if held is not None:
+            self._local.depth += 1
+            return held.connection
+        
+        entry = self._checkout()
+        self._local.entry = entry
+        self._local.depth = 1
+        return entry.connection
+
+    def release(self):
+        """Devuelve la conexión del hilo actual al pool"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is None:
+            return
+        
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        
+        self._local.entry = None
+        now = time.monotonic()
+        entry.last_used = now
+        
+        with self._condition:
+            if self._is_expired(entry, now):
+                self._open -= 1
+                discard = True
+            else:
+                self._idle.append(entry)
+                discard = False
+            self._condition.notify()
+        
+        if discard:
+            self._close([entry])
+
+    def invalidate(self):
+        """Marca la conexión del hilo actual para descartarla al devolverla"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is not None:
+            entry.broken = True
+
+    def mark_suspect(self):
+        """Pide verificar la conexión del hilo actual antes de volver a usarla"""
+        entry = getattr(self._local, 'entry', None)
+        if entry is not None:
+            entry.suspect = True
+
+    def current_entry(self) -> Optional[PooledConnection]:
+        """Conexión administrada que tiene tomada el hilo actual"""
+        return getattr(self._local, 'entry', None)
+
+    def is_held(self) -> bool:
+        """Indica si el hilo actual tiene una conexión tomada"""
+        return getattr(self._local, 'depth', 0) > 0
+
+    def is_nested(self) -> bool:
+        """Indica si el hilo actual ya tenía tomada la conexión (p. ej. dentro de una transacción)"""
+        return getattr(self._local, 'depth', 0) > 1
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release()
+
+    def close_all(self):
+        """Cierra todas las conexiones inactivas del pool"""
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        self._close(idle)
+
+class DatabaseBackend:
+    """Motor de base de datos detrás de DatabaseManager
+    
+    El SQL de la app está escrito para MySQL; cada backend sabe abrir y
+    verificar conexiones, iniciar transacciones y, si hace falta, adaptar ese
+    SQL a su dialecto a través de sus cursores.
+    """
+    name = "base"
+    supports_prepared_statements = False
+    # Máximo de conexiones simultáneas que admite el motor (None: sin límite)
+    max_connections = None
+
     def connect(self):
+        raise NotImplementedError
+
+    def is_alive(self, connection) -> bool:
+        raise NotImplementedError
+
+    def is_connection_lost(self, error: Exception) -> bool:
+        return False
+
+    def cursor(self, connection, prepared: bool = False):
+        """Cursor que devuelve filas como diccionarios"""
+        raise NotImplementedError
+
+    def begin(self, connection):
+        raise NotImplementedError
+
+    def index_exists(self, connection, table: str, name: str) -> bool:
+        raise NotImplementedError
+
+class MySQLBackend(DatabaseBackend):
+    """Servidor MySQL/MariaDB a través de mysql.connector"""
+    name = "MySQL"
+    supports_prepared_statements = True
+    # Errores de cliente que indican que se perdió la conexión con el servidor
+    CONNECTION_LOST_ERRORS = {2002, 2003, 2006, 2013, 2055}
+
+    def __init__(self, config: Dict):
+        self.config = config
+
+    def connect(self):
+        return import_mysql().connector.connect(**self.config)
+
+    def is_alive(self, connection) -> bool:
         try:
-            self.connection = mysql.connector.connect(
-                host='localhost',
-                user='root',  # Cambia por tu usuario de MySQL
-                password='',  # Cambia por tu contraseña de MySQL
-                database='petZone'
+            connection.ping(reconnect=False)
+            return True
+        except DB_ERRORS:
+            return False
+
+    def is_connection_lost(self, error: Exception) -> bool:
+        return (getattr(error, 'errno', None) in self.CONNECTION_LOST_ERRORS
+                or isinstance(error, mysql.connector.errors.InterfaceError))
+
+    def cursor(self, connection, prepared: bool = False):
+        return connection.cursor(prepared=prepared, dictionary=True)
+
+    def begin(self, connection):
+        connection.start_transaction()
+
+    def index_exists(self, connection, table: str, name: str) -> bool:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT 1 FROM information_schema.statistics "
+                "WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1",
+                (table, name)
             )
-            if self.connection.is_connected():
-                print("Conexión a MySQL establecida")
-        except Error as e:
-            print(f"Error al conectar a MySQL: {e}")
-            messagebox.showerror("Error de Base de Datos", f"No se pudo conectar a la base de datos: {e}")
+            return cursor.fetchone() is not None
+        finally:
+            cursor.close()
+
+class _SQLiteCursor:
+    """Cursor de sqlite3 que acepta el SQL de MySQL de la app"""
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(mysql_to_sqlite(query), tuple(params or ()))
+
+    def executemany(self, query, seq_of_params):
+        self._cursor.executemany(mysql_to_sqlite(query), [tuple(params) for params in seq_of_params])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def with_rows(self):
+        return self._cursor.description is not None
+
+    def close(self):
+        self._cursor.close()
+
+@functools.lru_cache(maxsize=512)
+def mysql_to_sqlite(query: str) -> str:
+    """Traduce al dialecto de SQLite las construcciones MySQL que usa la app
+    
+    Cubre marcadores %s, NOW(), LAST_INSERT_ID(), SELECT ... FOR UPDATE (en
+    SQLite la transacción ya toma el bloqueo de escritura al empezar) y
+    ON DUPLICATE KEY UPDATE con VALUES(col).
+    """
+    query = re.sub(r"%([s%])", lambda m: "?" if m.group(1) == "s" else "%", query)
+    query = re.sub(r"\bNOW\(\)", "datetime('now', 'localtime')", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bLAST_INSERT_ID\(\)", "last_insert_rowid()", query, flags=re.IGNORECASE)
+    query = re.sub(r"\s+FOR\s+UPDATE\b", "", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", "ON CONFLICT DO UPDATE SET", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", query, flags=re.IGNORECASE)
+    return query
+
+def _split_sql_statements(script: str) -> List[str]:
+    """Separa un volcado SQL en sentencias, respetando comillas y comentarios"""
+    statements = []
+    current = []
+    quote = None
+    i = 0
+    while i < len(script):
+        ch = script[i]
+        if quote:
+            current.append(ch)
+            if ch == "\\" and quote != "`":
+                current.append(script[i + 1:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+            current.append(ch)
+        elif script.startswith("--", i) or ch == "#":
+            end = script.find("\n", i)
+            i = len(script) if end == -1 else end
+            continue
+        elif script.startswith("/*", i):
+            end = script.find("*/", i + 2)
+            i = len(script) if end == -1 else end + 2
+            continue
+        elif ch == ";":
+            statement = "".join(current).strip()
+            if statement:
+                statements.append(statement)
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    statement = "".join(current).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+def _split_top_level(text: str) -> List[str]:
+    """Separa por comas que no estén dentro de paréntesis ni comillas"""
+    parts = []
+    depth = 0
+    quote = None
+    current = []
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"`":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+def _sqlite_identifier_list(columns: str) -> str:
+    return ", ".join(f'"{name}"' for name in re.findall(r"`([^`]+)`", columns))
+
+def _sqlite_column_type(definition: str) -> str:
+    """Traduce la definición MySQL de una columna (sin el nombre) a SQLite"""
+    match = re.match(r"(\w+)(\([^)]*\))?(\s+unsigned)?(\s+zerofill)?", definition, re.IGNORECASE)
+    mysql_type = match.group(1).lower()
+    rest = definition[match.end():]
+    
+    if mysql_type in ('int', 'integer', 'tinyint', 'smallint', 'mediumint', 'bigint', 'bit', 'bool', 'boolean'):
+        sqlite_type = "INTEGER"
+    elif mysql_type in ('decimal', 'numeric', 'float', 'double', 'real'):
+        sqlite_type = "REAL"
+    else:
+        sqlite_type = "TEXT"
+    
+    rest = re.sub(r"\s+ON\s+UPDATE\s+current_timestamp(\(\))?", "", rest, flags=re.IGNORECASE)
+    rest = re.sub(r"current_timestamp(\(\))?", "(datetime('now', 'localtime'))", rest, flags=re.IGNORECASE)
+    rest = re.sub(r"\s+(COLLATE|CHARACTER\s+SET)\s+\w+", "", rest, flags=re.IGNORECASE)
+    rest = re.sub(r"\s+AUTO_INCREMENT\b", "", rest, flags=re.IGNORECASE)
+    rest = re.sub(r"\s+COMMENT\s+'(?:[^'\\]|\\.)*'", "", rest, flags=re.IGNORECASE)
+    rest = rest.replace("`", '"')
+    
+    if mysql_type == 'enum' and match.group(2):
+        # Los valores permitidos del ENUM pasan a ser un CHECK
+        return f"{sqlite_type}{rest} CHECK ({{column}} IN {match.group(2)})"
+    return f"{sqlite_type}{rest}"
+
+def _sqlite_literals(statement: str) -> str:
+    """Pasa las cadenas con escapes de MySQL (\\' \\n ...) al formato estándar ('')"""
+    escapes = {"n": "\n", "r": "\r", "t": "\t", "0": "\0", "Z": "\x1a"}
+    
+    def convert(match):
+        body = match.group(1)
+        body = re.sub(r"\\(.)", lambda m: escapes.get(m.group(1), m.group(1)), body)
+        return "'" + body.replace("'", "''") + "'"
+    
+    statement = re.sub(r"'((?:[^'\\]|\\.|'')*)'", lambda m: convert(m) if "\\" in m.group(1) else m.group(0), statement)
+    return re.sub(r"`([^`]+)`", r'"\1"', statement)
+
+def mysql_dump_to_sqlite(dump: str) -> str:
+    """Traduce un volcado de MySQL/MariaDB (como petzone-ari.sql) a un script de SQLite
+    
+    Las tablas se crean con sus claves primarias, autoincrementos y claves
+    foráneas en el CREATE TABLE (SQLite no permite agregarlas después); los
+    índices pasan a CREATE INDEX y los datos se insertan tal cual.
+    """
+    tables = OrderedDict()
+    inserts = []
+    
+    for statement in _split_sql_statements(dump):
+        keyword = statement.split(None, 2)[:2]
+        keyword = " ".join(keyword).upper()
+        
+        if keyword == "CREATE TABLE":
+            match = re.match(r"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?`([^`]+)`\s*\((.*)\)[^)]*$",
+                             statement, re.IGNORECASE | re.DOTALL)
+            name, body = match.group(1), match.group(2)
+            table = tables.setdefault(name, {'columns': OrderedDict(), 'primary': [], 'auto': set(),
+                                             'indexes': [], 'foreign': []})
+            for part in _split_top_level(body):
+                column = re.match(r"`([^`]+)`\s+(.*)", part, re.DOTALL)
+                if column:
+                    table['columns'][column.group(1)] = column.group(2)
+                    if re.search(r"\bAUTO_INCREMENT\b", column.group(2), re.IGNORECASE):
+                        table['auto'].add(column.group(1))
+                else:
+                    _add_table_clause(table, part)
+        
+        elif keyword == "ALTER TABLE":
+            match = re.match(r"ALTER TABLE\s+`([^`]+)`\s+(.*)", statement, re.IGNORECASE | re.DOTALL)
+            table = tables.get(match.group(1))
+            if table is None:
+                continue
+            for part in _split_top_level(match.group(2)):
+                modify = re.match(r"MODIFY\s+(?:COLUMN\s+)?`([^`]+)`\s+(.*)", part, re.IGNORECASE | re.DOTALL)
+                if modify:
+                    if re.search(r"\bAUTO_INCREMENT\b", modify.group(2), re.IGNORECASE):
+                        table['auto'].add(modify.group(1))
+                elif part.upper().startswith("ADD "):
+                    _add_table_clause(table, part[4:].strip())
+        
+        elif keyword.startswith("INSERT INTO") or keyword.startswith("INSERT IGNORE"):
+            inserts.append(_sqlite_literals(statement))
+    
+    # En SQLite los nombres de índice son globales: se prefija la tabla si se repiten
+    index_names = [index[0] for table in tables.values() for index in table['indexes']]
+    
+    create_tables = []
+    create_indexes = []
+    for name, table in tables.items():
+        definitions = []
+        inline_primary = (
+            len(table['primary']) == 1
+            and _sqlite_column_type(table['columns'].get(table['primary'][0], "text")).startswith("INTEGER")
+        )
+        for column, definition in table['columns'].items():
+            sql = f'"{column}" ' + _sqlite_column_type(definition).replace("{column}", f'"{column}"')
+            if inline_primary and column == table['primary'][0]:
+                # INTEGER PRIMARY KEY es el rowid de SQLite: se autoincrementa solo
+                sql += " PRIMARY KEY"
+                if column in table['auto']:
+                    sql += " AUTOINCREMENT"
+            definitions.append(sql)
+        if table['primary'] and not inline_primary:
+            definitions.append("PRIMARY KEY (" + ", ".join(f'"{c}"' for c in table['primary']) + ")")
+        definitions.extend(table['foreign'])
+        create_tables.append(f'CREATE TABLE "{name}" (\n  ' + ",\n  ".join(definitions) + "\n);")
+        
+        for index_name, unique, columns in table['indexes']:
+            if index_names.count(index_name) > 1:
+                index_name = f"{name}_{index_name}"
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            create_indexes.append(f'CREATE {kind} "{index_name}" ON "{name}" ({columns});')
+    
+    return "\n".join(create_tables + [statement + ";" for statement in inserts] + create_indexes) + "\n"
+
+def _add_table_clause(table: Dict, clause: str):
+    """Agrega a la tabla una clave, índice o clave foránea de la sintaxis MySQL"""
+    primary = re.match(r"PRIMARY KEY\s*\((.*)\)", clause, re.IGNORECASE | re.DOTALL)
+    if primary:
+        table['primary'] = re.findall(r"`([^`]+)`", primary.group(1))
+        return
+    
+    index = re.match(r"(UNIQUE\s+)?(?:KEY|INDEX)\s+`([^`]+)`\s*\((.*)\)", clause, re.IGNORECASE | re.DOTALL)
+    if index:
+        table['indexes'].append((index.group(2), bool(index.group(1)), _sqlite_identifier_list(index.group(3))))
+        return
+    
+    foreign = re.match(r"(?:CONSTRAINT\s+`[^`]+`\s+)?FOREIGN KEY\s*\(([^)]*)\)\s*REFERENCES\s+`([^`]+)`\s*\(([^)]*)\)(.*)",
+                       clause, re.IGNORECASE | re.DOTALL)
+    if foreign:
+        actions = " ".join(re.findall(r"ON\s+(?:DELETE|UPDATE)\s+(?:CASCADE|SET NULL|RESTRICT|NO ACTION)",
+                                      foreign.group(4), re.IGNORECASE))
+        sql = (f"FOREIGN KEY ({_sqlite_identifier_list(foreign.group(1))}) "
+               f'REFERENCES "{foreign.group(2)}" ({_sqlite_identifier_list(foreign.group(3))})')
+        table['foreign'].append(f"{sql} {actions}".strip())
+
+class SQLiteBackend(DatabaseBackend):
+    """Base embebida en un archivo SQLite, sin servidor ni red
+    
+    La primera vez se crea el esquema a partir del volcado de MySQL
+    (petzone-ari.sql) traducido a SQLite. Con path=":memory:" la base vive
+    sólo mientras dure el proceso (útil para pruebas y benchmarks).
+    """
+    name = "SQLite"
+    DEFAULT_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "petzone-ari.sql")
+
+    def __init__(self, path: str = "petzone.db", schema_path: str = None, busy_timeout: float = 30):
+        self.path = path
+        self.schema_path = schema_path or self.DEFAULT_SCHEMA
+        self.busy_timeout = busy_timeout
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._anchor = None
+        if path == ":memory:":
+            # Base en memoria compartida entre las conexiones del pool; la
+            # conexión "ancla" la mantiene viva. SQLite en memoria compartida
+            # bloquea por tabla, así que se usa una sola conexión a la vez
+            self.target = f"file:petzone-{id(self)}?mode=memory&cache=shared"
+            self.max_connections = 1
+            self._anchor = self._open()
+
+    def _open(self):
+        connection = sqlite3.connect(
+            self.target if self.path == ":memory:" else self.path,
+            timeout=self.busy_timeout,
+            isolation_level=None,
+            check_same_thread=False,
+            uri=self.path == ":memory:"
+        )
+        connection.row_factory = lambda cursor, row: {
+            column[0]: value for column, value in zip(cursor.description, row)
+        }
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    def connect(self):
+        connection = self._open()
+        if self.path != ":memory:":
+            # WAL: las lecturas no esperan a las escrituras de otros hilos
+            connection.execute("PRAGMA journal_mode = WAL")
+        self._ensure_schema(connection)
+        return connection
+
+    def _ensure_schema(self, connection):
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            exists = connection.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'productos'"
+            ).fetchone()
+            if not exists:
+                with open(self.schema_path, encoding='utf-8') as dump:
+                    script = mysql_dump_to_sqlite(dump.read())
+                connection.execute("PRAGMA foreign_keys = OFF")
+                try:
+                    connection.executescript(f"BEGIN;\n{script}COMMIT;")
+                except sqlite3.Error:
+                    connection.rollback()
+                    raise
+                finally:
+                    connection.execute("PRAGMA foreign_keys = ON")
+            self._schema_ready = True
+
+    def is_alive(self, connection) -> bool:
+        try:
+            connection.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def cursor(self, connection, prepared: bool = False):
+        return _SQLiteCursor(connection.cursor())
+
+    def begin(self, connection):
+        # IMMEDIATE toma el bloqueo de escritura al empezar: hace las veces
+        # de los SELECT ... FOR UPDATE de MySQL
+        connection.execute("BEGIN IMMEDIATE")
+
+    def index_exists(self, connection, table: str, name: str) -> bool:
+        return connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?",
+            (table, name)
+        ).fetchone() is not None
+
+def create_backend(spec: str = None) -> Optional[DatabaseBackend]:
+    """Backend según spec o la variable de entorno PETZONE_DB
+    
+    "sqlite" o "sqlite:ruta.db" usa una base embebida creada desde
+    petzone-ari.sql; "mysql" (por defecto) devuelve None para que
+    DatabaseManager use el servidor de su configuración.
+    """
+    spec = spec or os.environ.get("PETZONE_DB", "mysql")
+    kind, _, path = spec.partition(":")
+    if kind.lower() == "sqlite":
+        return SQLiteBackend(path or "petzone.db")
+    return None
+
+class ProductSearchIndex:
+    """Índice invertido en memoria para la búsqueda de productos
+    
+    Reemplaza el LIKE '%término%' (que recorría toda la tabla) por un índice
+    por términos: sin acentos ni mayúsculas, con stemming ligero en español y
+    resultados ordenados por relevancia (BM25 con pesos por campo). Los
+    términos de nombres y marcas tienen además un índice de trigramas para
+    tolerar errores de tipeo ("royl canin" -> "royal canin").
+    """
+    # Peso de cada campo al puntuar: el nombre pesa más que la descripción
+    FIELD_WEIGHTS = {'nombre': 3.0, 'marca': 2.0, 'categoria': 1.5, 'tipo_mascota': 1.0, 'descripcion': 1.0}
+    # Columnas de productos que alimentan el índice
+    INDEXED_COLUMNS = {'nombre', 'marca', 'descripcion', 'tipo_mascota', 'categoria_id'}
+    STOPWORDS = {
+        'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'para',
+        'por', 'sin', 'su', 'sus', 'tu', 'un', 'una', 'unos', 'unas', 'y', 'o', 'e'
+    }
+    K1 = 1.2
+    B = 0.75
+    # Campos cuyo vocabulario se usa para corregir errores de tipeo
+    FUZZY_FIELDS = ('nombre', 'marca')
+    # Términos más cortos no se corrigen: casi cualquier cosa está a 1 letra
+    FUZZY_MIN_LENGTH = 4
+    # Las coincidencias aproximadas puntúan menos que las exactas
+    FUZZY_PENALTY = 0.7
+
+    def __init__(self, db, max_age: float = 300, candidate_cache_size: int = 32):
+        self.db = db
+        # Cada cuánto se reconstruye igual, por cambios hechos fuera de la app
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._built_at = 0.0
+        # Estado del índice; se reemplaza completo en cada reconstrucción
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._doc_lengths: Dict[int, float] = {}
+        self._categories: Dict[int, str] = {}
+        self._avg_length = 0.0
+        self._sorted_terms: List[str] = []
+        # Palabra sin acentos (sin stemming) -> términos a los que se reduce,
+        # para buscar como prefijo la palabra a medio escribir ("luce" -> "luz")
+        self._word_terms: Dict[str, set] = {}
+        self._sorted_words: List[str] = []
+        # Trigrama -> términos de nombres/marcas que lo contienen, y la palabra
+        # (sin acentos) más común de cada término, para "¿Quisiste decir...?"
+        self._trigrams: Dict[str, set] = {}
+        self._surface: Dict[str, str] = {}
+        # Candidatos de búsquedas recientes, para refinar mientras se escribe:
+        # tupla de (término, es_prefijo) -> conjunto de IDs
+        self.candidate_cache_size = candidate_cache_size
+        self._candidate_cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def fold(text: str) -> str:
+        """Pasa a minúsculas y quita acentos: 'Ortopédica' -> 'ortopedica'"""
+        decomposed = unicodedata.normalize('NFKD', text.lower())
+        return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+    @staticmethod
+    def stem(word: str) -> str:
+        """Stemming ligero en español: plurales y terminación de género"""
+        if len(word) > 4 and word.endswith("ces"):
+            word = word[:-3] + "z"
+        elif len(word) > 4 and word.endswith("es") and word[-3] not in "aeiou":
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        
+        if len(word) > 4 and word[-1] in "aeo":
+            word = word[:-1]
+        return word
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Términos normalizados de un texto, en orden"""
+        if not text:
+            return []
+        words = re.findall(r"[a-z0-9]+", cls.fold(text))
+        return [cls.stem(word) for word in words if word not in cls.STOPWORDS]
+
+    @classmethod
+    def parse_query(cls, text: str) -> tuple:
+        """Términos de una búsqueda como (término, es_prefijo)
+        
+        La última palabra, si no terminó con un espacio, puede estar a medio
+        escribir y se busca como prefijo; a esa no se le aplica stemming (un
+        prefijo de "luces" no es prefijo de su término "luz").
+        """
+        terms = {}
+        words = re.findall(r"[a-z0-9]+", cls.fold(text or ""))
+        partial = bool(words) and not text[-1].isspace()
+        for position, word in enumerate(words):
+            if word in cls.STOPWORDS:
+                continue
+            is_prefix = partial and position == len(words) - 1
+            term = word if is_prefix else cls.stem(word)
+            terms[(term, is_prefix)] = None
+        return tuple(terms)
+
+    def on_change(self, table: str, columns: set = None, ids: list = None):
+        """Listener de DatabaseManager: marca el índice para reconstruirlo"""
+        if table == 'categorias' or (table == 'productos' and (columns is None or columns & self.INDEXED_COLUMNS)):
+            self._dirty = True
+
+    def invalidate(self):
+        self._dirty = True
+
+    def _ensure_fresh(self):
+        if not self._dirty and time.monotonic() - self._built_at < self.max_age:
+            return
+        with self._lock:
+            if not self._dirty and time.monotonic() - self._built_at < self.max_age:
+                return
+            self._build()
+
+    def _build(self):
+        query = """
+        SELECT p.id, p.nombre, p.descripcion, p.marca, p.tipo_mascota, c.nombre as categoria
+        FROM productos p
+        JOIN categorias c ON p.categoria_id = c.id
+        """
+        # Se limpia antes de consultar: un cambio durante la carga vuelve a marcarlo
+        self._dirty = False
+        rows = self.db.execute_query(query, fetch_all=True)
+        if rows is None:
+            # Sin base de datos se sigue usando el índice anterior
+            self._dirty = True
+            return
+        
+        postings: Dict[str, Dict[int, float]] = {}
+        doc_lengths: Dict[int, float] = {}
+        categories: Dict[int, str] = {}
+        surface_counts: Dict[str, Dict[str, int]] = {}
+        word_terms: Dict[str, set] = {}
+        
+        for row in rows:
+            product_id = row['id']
+            categories[product_id] = row['categoria']
+            length = 0.0
+            for field, weight in self.FIELD_WEIGHTS.items():
+                for word in re.findall(r"[a-z0-9]+", self.fold(row[field] or "")):
+                    if word in self.STOPWORDS:
+                        continue
+                    term = self.stem(word)
+                    word_terms.setdefault(word, set()).add(term)
+                    doc_terms = postings.setdefault(term, {})
+                    doc_terms[product_id] = doc_terms.get(product_id, 0.0) + weight
+                    length += weight
+            doc_lengths[product_id] = length
+            
+            for field in self.FUZZY_FIELDS:
+                for word in re.findall(r"[a-z0-9]+", self.fold(row[field] or "")):
+                    if word in self.STOPWORDS:
+                        continue
+                    counts = surface_counts.setdefault(self.stem(word), {})
+                    counts[word] = counts.get(word, 0) + 1
+        
+        trigrams: Dict[str, set] = {}
+        surface = {}
+        for term, counts in surface_counts.items():
+            surface[term] = max(counts, key=lambda word: (counts[word], word))
+            if len(term) >= self.FUZZY_MIN_LENGTH:
+                for gram in self.trigrams(term):
+                    trigrams.setdefault(gram, set()).add(term)
+        
+        self._postings, self._doc_lengths, self._categories = postings, doc_lengths, categories
+        self._trigrams, self._surface = trigrams, surface
+        self._sorted_terms = sorted(postings)
+        self._word_terms, self._sorted_words = word_terms, sorted(word_terms)
+        self._avg_length = sum(doc_lengths.values()) / len(doc_lengths) if doc_lengths else 0.0
+        self._built_at = time.monotonic()
+        with self._cache_lock:
+            self._candidate_cache.clear()
+
+    @staticmethod
+    def trigrams(term: str) -> set:
+        """Trigramas del término con bordes marcados: 'gato' -> {'  g', ' ga', 'gat', 'ato', 'to '}"""
+        padded = f"  {term} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @staticmethod
+    def edit_distance(a: str, b: str, max_distance: int) -> int:
+        """Distancia de Levenshtein acotada: devuelve max_distance + 1 si la supera"""
+        if abs(len(a) - len(b)) > max_distance:
+            return max_distance + 1
+        previous = list(range(len(b) + 1))
+        for i, char_a in enumerate(a, 1):
+            current = [i]
+            for j, char_b in enumerate(b, 1):
+                current.append(min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b)
+                ))
+            if min(current) > max_distance:
+                return max_distance + 1
+            previous = current
+        return previous[-1]
+
+    def max_typos(self, term: str) -> int:
+        return 1 if len(term) <= 5 else 2
+
+    def similar_terms(self, term: str) -> List[tuple]:
+        """Términos del vocabulario a distancia acotada, como (distancia, término)
+        
+        Los trigramas filtran los candidatos: sólo se calcula la distancia contra
+        términos que comparten suficientes trigramas, nunca contra todo el vocabulario.
+        """
+        if len(term) < self.FUZZY_MIN_LENGTH:
+            return []
+        max_distance = self.max_typos(term)
+        grams = self.trigrams(term)
+        trigram_index = self._trigrams
+        
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in trigram_index.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        
+        # Cada edición cambia a lo sumo 3 trigramas
+        min_shared = len(grams) - 3 * max_distance
+        matches = []
+        for candidate, count in shared.items():
+            if count < min_shared or candidate == term:
+                continue
+            distance = self.edit_distance(term, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        # A igual distancia se prefiere la misma inicial (rara vez es la letra
+        # equivocada) y el término que aparece en más productos
+        return sorted(matches, key=lambda match: (
+            match[0], match[1][0] != term[0], -len(self._postings.get(match[1], {})), match[1]
+        ))
+
+    def _fuzzy_postings(self, term: str) -> Dict[int, float]:
+        """Frecuencias de los términos parecidos a uno que no aparece en el índice"""
+        merged: Dict[int, float] = {}
+        for _, candidate in self.similar_terms(term):
+            for product_id, tf in self._postings.get(candidate, {}).items():
+                merged[product_id] = max(merged.get(product_id, 0.0), tf * self.FUZZY_PENALTY)
+        return merged
+
+    def correct(self, text: str) -> Optional[str]:
+        """Sugerencia "¿Quisiste decir...?" para la búsqueda, o None si no hace falta
+        
+        No reconstruye el índice: usa el vocabulario ya cargado.
+        """
+        words = re.findall(r"[a-z0-9]+", self.fold(text or ""))
+        postings = self._postings
+        
+        # Productos con las palabras bien escritas: entre correcciones igual de
+        # cercanas se elige una que aparezca junto a ellas
+        context = None
+        for word in words:
+            term = self.stem(word)
+            if word not in self.STOPWORDS and term in postings:
+                docs = postings[term].keys()
+                context = set(docs) if context is None else context & docs
+        
+        corrected = []
+        changed = False
+        for word in words:
+            term = self.stem(word)
+            if word in self.STOPWORDS or term in postings:
+                corrected.append(word)
+                continue
+            matches = self.similar_terms(term)
+            if not matches:
+                corrected.append(word)
+                continue
+            best = matches[0][1]
+            if context:
+                best = next(
+                    (candidate for distance, candidate in matches
+                     if distance == matches[0][0] and context & postings.get(candidate, {}).keys()),
+                    best
+                )
+            corrected.append(self._surface.get(best, best))
+            changed = True
+        return " ".join(corrected) if changed else None
+
+    def _term_postings(self, term: str, is_prefix: bool) -> Dict[int, float]:
+        """Frecuencias por producto de un término o, con is_prefix, de todos los
+        términos que empiezan con él o que vienen de una palabra que empieza con él"""
+        if not is_prefix:
+            return self._postings.get(term, {})
+        
+        matched = set()
+        sorted_terms = self._sorted_terms
+        position = bisect.bisect_left(sorted_terms, term)
+        while position < len(sorted_terms) and sorted_terms[position].startswith(term):
+            matched.add(sorted_terms[position])
+            position += 1
+        sorted_words, word_terms = self._sorted_words, self._word_terms
+        position = bisect.bisect_left(sorted_words, term)
+        while position < len(sorted_words) and sorted_words[position].startswith(term):
+            matched |= word_terms[sorted_words[position]]
+            position += 1
+        
+        merged: Dict[int, float] = {}
+        for matched_term in matched:
+            for product_id, tf in self._postings[matched_term].items():
+                merged[product_id] = merged.get(product_id, 0.0) + tf
+        return merged
+
+    @staticmethod
+    def _refines(terms: tuple, base: tuple) -> bool:
+        """True si todo resultado de terms también es resultado de base"""
+        for base_term, base_prefix in base:
+            if base_prefix:
+                covered = any(term.startswith(base_term) for term, _ in terms)
+            else:
+                covered = (base_term, False) in terms
+            if not covered:
+                return False
+        return True
+
+    def _cached_candidates(self, terms: tuple) -> Optional[set]:
+        """Candidatos de la búsqueda anterior más específica que terms refina"""
+        with self._cache_lock:
+            if terms in self._candidate_cache:
+                self._candidate_cache.move_to_end(terms)
+                return self._candidate_cache[terms]
+            bases = [base for base in self._candidate_cache if self._refines(terms, base)]
+            if not bases:
+                return None
+            return min((self._candidate_cache[base] for base in bases), key=len)
+
+    def _remember_candidates(self, terms: tuple, candidates: set):
+        with self._cache_lock:
+            self._candidate_cache[terms] = candidates
+            self._candidate_cache.move_to_end(terms)
+            while len(self._candidate_cache) > self.candidate_cache_size:
+                self._candidate_cache.popitem(last=False)
+
+    def search(self, text: str, category: str = None) -> List[int]:
+        """IDs de los productos que contienen todos los términos, del más al menos relevante
+        
+        La última palabra se busca como prefijo si no terminó con un espacio. Los
+        términos que no aparecen en el índice se reemplazan por los parecidos.
+        """
+        self._ensure_fresh()
+        terms = self.parse_query(text)
+        if not terms:
+            return []
+        
+        doc_lengths, categories = self._doc_lengths, self._categories
+        term_postings = [self._term_postings(term, is_prefix) for term, is_prefix in terms]
+        fuzzy = not all(term_postings)
+        if fuzzy:
+            term_postings = [
+                doc_terms or self._fuzzy_postings(self.stem(term) if is_prefix else term)
+                for (term, is_prefix), doc_terms in zip(terms, term_postings)
+            ]
+            if not all(term_postings):
+                return []
+        
+        # Se intersecta empezando por el término menos frecuente, o por los
+        # resultados de una búsqueda que esta refina (p. ej. "cam" -> "cama").
+        # Los resultados aproximados no se guardan: no cumplen esa inclusión.
+        term_postings.sort(key=len)
+        candidates = None if fuzzy else self._cached_candidates(terms)
+        if candidates is None:
+            candidates = set(term_postings[0])
+        for doc_terms in term_postings:
+            if len(candidates) <= len(doc_terms):
+                candidates = {product_id for product_id in candidates if product_id in doc_terms}
+            else:
+                candidates = candidates & doc_terms.keys()
+            if not candidates:
+                break
+        if not fuzzy:
+            self._remember_candidates(terms, candidates)
+        if not candidates:
+            return []
+        
+        if category and category != "Todos":
+            candidates = {product_id for product_id in candidates if categories.get(product_id) == category}
+        
+        total_docs = len(doc_lengths)
+        avg_length = self._avg_length or 1.0
+        scores = {}
+        for doc_terms in term_postings:
+            idf = math.log(1 + (total_docs - len(doc_terms) + 0.5) / (len(doc_terms) + 0.5))
+            for product_id in candidates:
+                tf = doc_terms[product_id]
+                norm = self.K1 * (1 - self.B + self.B * doc_lengths[product_id] / avg_length)
+                scores[product_id] = scores.get(product_id, 0.0) + idf * tf * (self.K1 + 1) / (tf + norm)
+        
+        return sorted(candidates, key=lambda product_id: (-scores[product_id], product_id))
+
+class _TrieNode:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        # Claves de sugerencias que terminan en este nodo
+        self.entries = set()
+        # Mejores sugerencias del subárbol, ya ordenadas
+        self.top: List[str] = []
+
+class ProductAutocomplete:
+    """Sugerencias para el buscador a partir de nombres, marcas y categorías
+    
+    Un trie en memoria donde cada nodo guarda sus mejores sugerencias
+    (ponderadas por unidades vendidas), así que completar un prefijo no
+    consulta la base: sólo recorre tantos nodos como letras tenga.
+    """
+    TOP_K = 8
+    # Profundidad máxima del trie; prefijos más largos se filtran en memoria
+    MAX_DEPTH = 40
+    KIND_COLUMNS = {'producto': 'nombre', 'marca': 'marca', 'categoria': 'categoria'}
+    INDEXED_COLUMNS = {'nombre', 'marca', 'categoria_id'}
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.RLock()
+        self._root = _TrieNode()
+        # clave -> [texto, tipo, {producto_id: ventas}]
+        self._entries: Dict[str, list] = {}
+        # producto_id -> (claves a las que aporta, ventas)
+        self._products: Dict[int, tuple] = {}
+        self.built = False
+        # Cambios pendientes de aplicar en el hilo de fondo (se juntan)
+        self._pending_lock = threading.Lock()
+        self._pending_ids = set()
+        self._pending_build = False
+        self._scheduled = False
+        self._executor = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Clave de búsqueda: minúsculas, sin acentos ni signos, espacios simples"""
+        return " ".join(re.findall(r"[a-z0-9]+", ProductSearchIndex.fold(text or "")))
+
+    def _rank(self, key: str):
+        text, _, contributions = self._entries[key]
+        return (-sum(contributions.values()), len(text), key)
+
+    @staticmethod
+    def _full_suffixes(key: str) -> List[str]:
+        """La clave completa y lo que sigue a cada espacio: 'ortop' también sugiere 'Cama Ortopédica'"""
+        return [key] + [key[i + 1:] for i, ch in enumerate(key) if ch == " "]
+
+    def _suffix_keys(self, key: str) -> List[str]:
+        """Caminos de la clave en el trie (recortados a MAX_DEPTH)"""
+        return [suffix[:self.MAX_DEPTH] for suffix in self._full_suffixes(key)]
+
+    def _path(self, suffix: str, create: bool = False) -> List[_TrieNode]:
+        node = self._root
+        path = [node]
+        for ch in suffix:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return path
+                child = node.children[ch] = _TrieNode()
+            node = child
+            path.append(node)
+        return path
+
+    def _recompute(self, node: _TrieNode):
+        candidates = list(node.entries)
+        for child in node.children.values():
+            candidates.extend(child.top)
+        node.top = sorted(set(candidates), key=self._rank)[:self.TOP_K]
+
+    def _query_products(self, product_ids: List[int] = None) -> Optional[List[Dict]]:
+        sales_filter = product_filter = ""
+        params = None
+        if product_ids:
+            # Sólo se suman las ventas de esos productos, no todo el historial
+            placeholders = ", ".join(["%s"] * len(product_ids))
+            sales_filter = f"WHERE producto_id IN ({placeholders})"
+            product_filter = f"WHERE p.id IN ({placeholders})"
+            params = list(product_ids) * 2
+        query = f"""
+        SELECT p.id, p.nombre, p.marca, c.nombre as categoria,
+               COALESCE(v.vendidos, 0) as vendidos
+        FROM productos p
+        JOIN categorias c ON p.categoria_id = c.id
+        LEFT JOIN (
+            SELECT producto_id, SUM(cantidad) as vendidos
+            FROM detalle_pedido
+            {sales_filter}
+            GROUP BY producto_id
+        ) v ON v.producto_id = p.id
+        {product_filter}
+        """
+        return self.db.execute_query(query, params, fetch_all=True)
+
+    def _add_product(self, row, touched: set):
+        keys = []
+        sales = int(row['vendidos'] or 0)
+        for kind, column in self.KIND_COLUMNS.items():
+            text = row[column]
+            key = self.normalize(text)
+            if not key:
+                continue
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = [text, kind, {}]
+                for suffix in self._suffix_keys(key):
+                    self._path(suffix, create=True)[-1].entries.add(key)
+            entry[2][row['id']] = sales
+            keys.append(key)
+            touched.add(key)
+        self._products[row['id']] = (keys, sales)
+
+    def _remove_product(self, product_id: int, touched: set):
+        keys, _ = self._products.pop(product_id, ([], 0))
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            entry[2].pop(product_id, None)
+            touched.add(key)
+            if not entry[2]:
+                # Ningún producto la respalda: se quita del trie
+                for suffix in self._suffix_keys(key):
+                    self._path(suffix)[-1].entries.discard(key)
+                del self._entries[key]
+
+    def _recompute_all(self, node: _TrieNode):
+        stack = [(node, False)]
+        while stack:
+            current, children_done = stack.pop()
+            if children_done:
+                self._recompute(current)
+            else:
+                stack.append((current, True))
+                stack.extend((child, False) for child in current.children.values())
+
+    def build(self) -> bool:
+        """Carga todo desde la base (al iniciar la app, en un hilo de trabajo)"""
+        rows = self._query_products()
+        if rows is None:
+            return False
+        with self._lock:
+            self._root = _TrieNode()
+            self._entries = {}
+            self._products = {}
+            touched = set()
+            for row in rows:
+                self._add_product(row, touched)
+            self._recompute_all(self._root)
+            self.built = True
+        return True
+
+    def refresh_products(self, product_ids: List[int]):
+        """Actualiza sólo los productos indicados y los nodos de sus claves"""
+        rows = self._query_products(product_ids)
+        if rows is None:
+            return
+        with self._lock:
+            touched = set()
+            for product_id in product_ids:
+                self._remove_product(product_id, touched)
+            for row in rows:
+                self._add_product(row, touched)
+            
+            # Se recalculan de abajo hacia arriba los caminos de las claves tocadas
+            nodes = {}
+            for key in touched:
+                for suffix in self._suffix_keys(key):
+                    for depth, node in enumerate(self._path(suffix)):
+                        nodes[id(node)] = (depth, node)
+            for _, node in sorted(nodes.values(), key=lambda item: -item[0]):
+                self._recompute(node)
+
+    def on_change(self, table: str, columns: set = None, ids: list = None):
+        """Listener de DatabaseManager: mantiene el trie al día sin reconstruirlo entero"""
+        if not self.built:
+            return
+        if table == 'productos' and columns is not None and not columns & self.INDEXED_COLUMNS:
+            return
+        if table not in ('productos', 'detalle_pedido', 'categorias'):
+            return
+        # Se aplica en un hilo de fondo: quien guardó el cambio (crear un
+        # pedido, editar un producto) no espera a que se recalcule el trie
+        with self._pending_lock:
+            if ids and table != 'categorias':
+                self._pending_ids.update(ids)
+            else:
+                self._pending_build = True
+            if self._scheduled:
+                return
+            self._scheduled = True
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="petzone-autocomplete")
+            self._executor.submit(self._apply_pending)
+
+    def _apply_pending(self):
+        """Aplica los cambios juntados mientras el hilo estaba ocupado"""
+        while True:
+            with self._pending_lock:
+                product_ids = sorted(self._pending_ids)
+                rebuild = self._pending_build
+                self._pending_ids = set()
+                self._pending_build = False
+                if not product_ids and not rebuild:
+                    self._scheduled = False
+                    return
+            try:
+                if rebuild:
+                    self.build()
+                else:
+                    self.refresh_products(product_ids)
+            except Exception as e:
+                print(f"Error actualizando sugerencias: {e}")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def suggest(self, text: str, limit: int = None) -> List[tuple]:
+        """Sugerencias (texto, tipo) para lo escrito; nunca consulta la base"""
+        prefix = self.normalize(text)
+        if not prefix:
+            return []
+        limit = limit or self.TOP_K
+        with self._lock:
+            node = self._root
+            for ch in prefix[:self.MAX_DEPTH]:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            keys = node.top
+            if len(prefix) > self.MAX_DEPTH:
+                keys = [key for key in keys if any(s.startswith(prefix) for s in self._full_suffixes(key))]
+            return [(self._entries[key][0], self._entries[key][1]) for key in keys[:limit]]
+
+class FacetIndex:
+    """Índice de facetas en memoria con un bitmap (int) por valor
+    
+    Cada producto ocupa un bit; los productos con un valor de faceta son un
+    entero con esos bits encendidos. Filtrar es un AND/OR de enteros y contar
+    es int.bit_count(), así que los conteos de todas las facetas salen sin
+    volver a consultar la base al marcar o desmarcar un filtro.
+    """
+    FACETS = ('categoria', 'tipo_mascota', 'edad_mascota', 'marca', 'precio')
+    # Rangos de precio en ARS: (clave, desde, hasta); hasta=None es sin límite
+    PRICE_BUCKETS = [
+        ('0-10000', 0, 10000),
+        ('10000-20000', 10000, 20000),
+        ('20000-30000', 20000, 30000),
+        ('30000+', 30000, None),
+    ]
+    INDEXED_COLUMNS = {'categoria_id', 'tipo_mascota', 'edad_mascota', 'marca', 'precio'}
+
+    def __init__(self, db, max_age: float = 300):
+        self.db = db
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._built_at = 0.0
+        # producto_id -> bit, y faceta -> valor -> bitmap
+        self._bits: Dict[int, int] = {}
+        self._bitmaps: Dict[str, Dict[str, int]] = {facet: {} for facet in self.FACETS}
+        self._all = 0
+
+    @classmethod
+    def price_bucket(cls, price: float) -> str:
+        for key, low, high in cls.PRICE_BUCKETS:
+            if price >= low and (high is None or price < high):
+                return key
+        return cls.PRICE_BUCKETS[0][0]
+
+    def on_change(self, table: str, columns: set = None, ids: list = None):
+        """Listener de DatabaseManager: marca el índice para reconstruirlo"""
+        if table == 'categorias' or (table == 'productos' and (columns is None or columns & self.INDEXED_COLUMNS)):
+            self._dirty = True
+
+    def _ensure_fresh(self):
+        if not self._dirty and time.monotonic() - self._built_at < self.max_age:
+            return
+        with self._lock:
+            if not self._dirty and time.monotonic() - self._built_at < self.max_age:
+                return
+            self._build()
+
+    def _build(self):
+        query = """
+        SELECT p.id, c.nombre as categoria, p.tipo_mascota, p.edad_mascota, p.marca, p.precio
+        FROM productos p
+        JOIN categorias c ON p.categoria_id = c.id
+        """
+        self._dirty = False
+        rows = self.db.execute_query(query, fetch_all=True)
+        if rows is None:
+            self._dirty = True
+            return
+        
+        bits: Dict[int, int] = {}
+        bitmaps: Dict[str, Dict[str, int]] = {facet: {} for facet in self.FACETS}
+        for position, row in enumerate(rows):
+            bit = 1 << position
+            bits[row['id']] = bit
+            values = dict(row, precio=self.price_bucket(float(row['precio'])))
+            for facet in self.FACETS:
+                value = values[facet]
+                if value is None:
+                    continue
+                bitmaps[facet][value] = bitmaps[facet].get(value, 0) | bit
+        
+        self._bits, self._bitmaps = bits, bitmaps
+        self._all = (1 << len(rows)) - 1
+        self._built_at = time.monotonic()
+
+    def _selection_mask(self, filters: Dict[str, set], skip: str = None) -> int:
+        """Productos que cumplen los filtros: OR dentro de cada faceta, AND entre facetas"""
+        mask = self._all
+        for facet, values in (filters or {}).items():
+            if facet == skip or not values:
+                continue
+            facet_mask = 0
+            for value in values:
+                facet_mask |= self._bitmaps.get(facet, {}).get(value, 0)
+            mask &= facet_mask
+        return mask
+
+    def mask_for(self, product_ids) -> int:
+        bits = self._bits
+        mask = 0
+        for product_id in product_ids:
+            mask |= bits.get(product_id, 0)
+        return mask
+
+    def filter_ids(self, product_ids: List[int], filters: Dict[str, set]) -> List[int]:
+        """Conserva, en el mismo orden, los productos que cumplen los filtros"""
+        if not any(filters.values()):
+            return product_ids
+        self._ensure_fresh()
+        mask = self._selection_mask(filters)
+        bits = self._bits
+        return [product_id for product_id in product_ids if bits.get(product_id, 0) & mask]
+
+    def counts(self, filters: Dict[str, set] = None, product_ids: List[int] = None) -> Dict[str, Dict[str, int]]:
+        """Cantidad de productos por valor de cada faceta con la selección actual
+        
+        Cada faceta se cuenta sin su propio filtro, para que sus otros valores
+        muestren cuántos productos sumaría marcarlos. product_ids limita los
+        conteos a un conjunto (p. ej. los resultados de una búsqueda).
+        """
+        self._ensure_fresh()
+        filters = filters or {}
+        base = self._all if product_ids is None else self.mask_for(product_ids)
+        result = {}
+        for facet in self.FACETS:
+            mask = base & self._selection_mask(filters, skip=facet)
+            result[facet] = {
+                value: (bitmap & mask).bit_count()
+                for value, bitmap in self._bitmaps[facet].items()
+            }
+        return result
+
+class QueryCache:
+    """Caché de resultados de consultas de lectura, invalidada por tabla
+    
+    Cada entrada se guarda con las tablas que leyó (tags). Cuando la app
+    escribe una tabla, DatabaseManager avisa y se descartan las entradas con
+    ese tag. Además hay un límite de tamaño (LRU) y un TTL, que acota cuánto
+    puede durar un cambio hecho fuera de la app.
+    """
+    def __init__(self, max_size: int = 256, ttl: float = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # clave -> (resultado, guardado_en, tags)
+        self._entries = OrderedDict()
+        self._by_tag: Dict[str, set] = {}
+        # Versión de cada tag: una lectura que empezó antes de una escritura
+        # no guarda su resultado (podría ser anterior al cambio)
+        self._versions: Dict[str, int] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(query, params, fetch_one, fetch_all):
+        return (query, tuple(params) if params is not None else None, fetch_one, fetch_all)
+
+    def get(self, key):
+        """Devuelve (True, resultado) si hay una entrada vigente, o (False, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return False, None
+            result, stored_at, tags = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True, result
+
+    def versions(self, tags) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def put(self, key, result, tags, versions: tuple):
+        """Guarda el resultado si ninguna de sus tablas cambió desde que empezó la lectura"""
+        with self._lock:
+            if tuple(self._versions.get(tag, 0) for tag in tags) != versions:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, time.monotonic(), tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.stats['evictions'] += 1
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+
+    def invalidate(self, tag: str):
+        """Descarta las entradas que leyeron la tabla indicada"""
+        with self._lock:
+            self._versions[tag] = self._versions.get(tag, 0) + 1
+            keys = self._by_tag.pop(tag, set())
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+            self.stats['invalidations'] += len(keys)
+
+    def on_change(self, table: str, columns: set = None, ids: list = None):
+        """Listener de DatabaseManager"""
+        self.invalidate(table)
+
+    def clear(self):
+        with self._lock:
+            for tag in list(self._by_tag) + list(self._versions):
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._entries)
+            stats['max_size'] = self.max_size
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / total if total else 0.0
+        return stats
+
+class QueryMetrics:
+    """Métricas de las consultas de DatabaseManager, agrupadas por forma
     
-    def reconnect(self):
-        if not self.connection or not self.connection.is_connected():
+    La forma es el SQL con los valores reemplazados por ? (las listas IN y
+    los VALUES de largo variable cuentan como una sola forma). Por cada una se
+    lleva la cantidad de llamadas, errores, aciertos de caché, filas devueltas
+    y los tiempos de las últimas SAMPLE_SIZE ejecuciones para los percentiles.
+    Las consultas más lentas que slow_threshold (segundos) quedan además en un
+    registro, con los parámetros ocultos.
+    """
+    SAMPLE_SIZE = 1000
+
+    _LITERALS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\b\d+(?:\.\d+)?\b|%s")
+    _VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+    _CASE_ARMS = re.compile(r"(?:WHEN \? THEN \? ?)+", re.IGNORECASE)
+
+    def __init__(self, slow_threshold: float = 0.2, slow_log_size: int = 100):
+        self.slow_threshold = slow_threshold
+        self._lock = threading.Lock()
+        self._shapes: Dict[str, Dict] = {}
+        self._slow_log = deque(maxlen=slow_log_size)
+        self.started_at = datetime.now()
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def shape(query: str) -> str:
+        shape = QueryMetrics._LITERALS.sub("?", query)
+        shape = " ".join(shape.split())
+        shape = QueryMetrics._VALUE_LISTS.sub("(...)", shape)
+        return QueryMetrics._CASE_ARMS.sub("WHEN ? THEN ? ... ", shape).strip()
+
+    @staticmethod
+    def redact(params) -> list:
+        """Tipo (y largo de los textos) de cada parámetro, sin su valor"""
+        if params is None:
+            return []
+        redacted = []
+        for value in params:
+            if value is None:
+                redacted.append(None)
+            elif isinstance(value, str):
+                redacted.append(f"<str:{len(value)}>")
+            else:
+                redacted.append(f"<{type(value).__name__}>")
+        return redacted
+
+    def _entry(self, shape: str) -> Dict:
+        entry = self._shapes.get(shape)
+        if entry is None:
+            entry = self._shapes[shape] = {
+                'calls': 0, 'errors': 0, 'cache_hits': 0, 'total': 0.0, 'max': 0.0,
+                'rows': 0, 'samples': deque(maxlen=self.SAMPLE_SIZE)
+            }
+        return entry
+
+    def record(self, query: str, params, seconds: float, rows: Optional[int] = None, failed: bool = False):
+        shape = self.shape(query)
+        with self._lock:
+            entry = self._entry(shape)
+            entry['calls'] += 1
+            entry['total'] += seconds
+            entry['max'] = max(entry['max'], seconds)
+            entry['samples'].append(seconds)
+            if failed:
+                entry['errors'] += 1
+            if rows:
+                entry['rows'] += rows
+            slow = seconds >= self.slow_threshold
+            if slow:
+                self._slow_log.append({
+                    'at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'query': shape,
+                    'ms': round(seconds * 1000, 1),
+                    'rows': rows,
+                    'params': self.redact(params),
+                    'thread': threading.current_thread().name,
+                })
+        if slow:
+            print(f"Consulta lenta ({seconds * 1000:.0f} ms): {shape[:120]}")
+
+    def record_cache_hit(self, query: str):
+        shape = self.shape(query)
+        with self._lock:
+            self._entry(shape)['cache_hits'] += 1
+
+    @staticmethod
+    def _percentile(values: list, fraction: float) -> float:
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(fraction * len(values)))]
+
+    def snapshot(self, top: int = None, order: str = 'total_ms') -> List[Dict]:
+        """Resumen por forma, ordenado de mayor a menor según order"""
+        with self._lock:
+            entries = [(shape, dict(entry, samples=sorted(entry['samples']))) for shape, entry in self._shapes.items()]
+        result = []
+        for shape, entry in entries:
+            samples = entry['samples']
+            calls = entry['calls']
+            result.append({
+                'query': shape,
+                'calls': calls,
+                'errors': entry['errors'],
+                'cache_hits': entry['cache_hits'],
+                'total_ms': round(entry['total'] * 1000, 2),
+                'mean_ms': round(entry['total'] * 1000 / calls, 3) if calls else 0.0,
+                'p50_ms': round(self._percentile(samples, 0.50) * 1000, 3),
+                'p95_ms': round(self._percentile(samples, 0.95) * 1000, 3),
+                'p99_ms': round(self._percentile(samples, 0.99) * 1000, 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'rows': entry['rows'],
+                'rows_per_call': round(entry['rows'] / calls, 2) if calls else 0.0,
+            })
+        result.sort(key=lambda item: item.get(order, 0), reverse=True)
+        return result[:top] if top else result
+
+    def slow_queries(self) -> List[Dict]:
+        with self._lock:
+            return list(self._slow_log)
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+            self._slow_log.clear()
+            self.started_at = datetime.now()
+
+_STDLIB_DIR = os.path.dirname(os.__file__)
+
+class QueryBudgetExceeded(Exception):
+    """Una acción de la interfaz hizo más consultas que su presupuesto"""
+    pass
+
+class QueryAction:
+    """Consultas hechas durante una acción de la interfaz y el trabajo que lanzó
+    
+    Una acción sigue abierta mientras tenga trabajo pendiente (el callback de Tk,
+    pedidos a AsyncDatabase o acciones hijas); al cerrarse la última se revisa.
+    """
+    def __init__(self, tracker: 'QueryTracker', name: str, budget: int = None,
+                 parent: 'QueryAction' = None):
+        self.tracker = tracker
+        self.name = name
+        self.budget = budget
+        self.parent = parent
+        self.queries: List[tuple] = []
+        self._pending = 1
+        self._lock = threading.Lock()
+        if parent is not None:
+            parent.hold()
+
+    def record(self, shape: str, site: str):
+        action = self
+        while action is not None:
+            action.queries.append((shape, site))
+            action = action.parent
+
+    def hold(self):
+        with self._lock:
+            self._pending += 1
+
+    def release(self) -> List[str]:
+        """Termina una parte del trabajo; devuelve los presupuestos superados
+        por esta acción y las que se cerraron con ella"""
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if not done:
+            return []
+        violations = self.tracker.check_action(self)
+        if self.parent is not None:
+            violations += self.parent.release()
+        return violations
+
+class QueryTracker:
+    """Detector de N+1 y presupuestos de consultas por acción de la interfaz
+    
+    Agrupa las consultas de DatabaseManager por acción (cada callback de Tk,
+    o un bloque action()) siguiendo el contexto hasta los hilos de
+    AsyncDatabase y sus callbacks de resultado. Al cerrar una acción avisa de
+    las formas de consulta repetidas, con el sitio que las emite, y de los
+    presupuestos declarados con @query_budget que se superaron. En modo
+    estricto los excesos lanzan QueryBudgetExceeded (para las pruebas): al
+    salir de action() o, si terminan después en otro hilo, desde check().
+    
+    Desactivado no cuesta más que una consulta a un ContextVar por consulta.
+    """
+    # Funciones de este archivo que sólo transportan la consulta: el sitio
+    # informado es el primer llamador fuera de ellas
+    PLUMBING = frozenset({
+        'execute_query', '_execute_with_retries', '_execute_once', 'cached_query',
+        '_measure', 'execute', 'executemany', 'record', 'run_budgeted', 'wrapper'
+    })
+
+    def __init__(self, repeat_threshold: int = 3, max_sites: int = 3):
+        self.repeat_threshold = repeat_threshold
+        self.max_sites = max_sites
+        self.enabled = False
+        self.strict = False
+        self.violations: List[str] = []
+        self._current = contextvars.ContextVar('petzone_query_action', default=None)
+        self.tk_callbacks = False
+        self._call_wrapper = None
+
+    def enable(self, strict: bool = False, tk_callbacks: bool = True):
+        """Activa el seguimiento; con tk_callbacks cada callback de Tk es una acción"""
+        self.enabled = True
+        self.strict = strict
+        self.tk_callbacks = tk_callbacks
+        if tk_callbacks and self._call_wrapper is None:
+            self._call_wrapper = self._make_call_wrapper(tk.CallWrapper)
+            tk.CallWrapper = self._call_wrapper
+
+    def disable(self):
+        self.enabled = False
+        # Otro gancho (p. ej. las trazas de acciones) puede haber envuelto al
+        # nuestro después: sólo se quita si sigue siendo el de afuera; si no,
+        # queda en la cadena como paso directo y un enable() lo reutiliza.
+        # Al quitarlo se saltean también los de abajo que ya se desactivaron
+        if self._call_wrapper is not None and tk.CallWrapper is self._call_wrapper:
+            base = self._call_wrapper._hook_previous
+            while getattr(base, '_hook_active', None) is not None and not base._hook_active():
+                base._hook_detach()
+                base = base._hook_previous
+            tk.CallWrapper = base
+            self._call_wrapper = None
+
+    def _make_call_wrapper(self, base):
+        tracker = self
+
+        class TrackedCallWrapper(base):
+            """CallWrapper de tkinter que abre una acción por callback"""
+            # Para que otro gancho que lo envuelva pueda saltearlo si ya no está activo
+            _hook_active = staticmethod(lambda: tracker.enabled and tracker.tk_callbacks)
+            _hook_previous = base
+            _hook_detach = staticmethod(lambda: setattr(tracker, '_call_wrapper', None))
+
+            def __call__(self, *args):
+                if not (tracker.enabled and tracker.tk_callbacks) or tracker.current() is not None:
+                    return super().__call__(*args)
+                action = QueryAction(tracker, tracker.describe(self.func))
+                token = tracker._current.set(action)
+                try:
+                    return super().__call__(*args)
+                finally:
+                    tracker._current.reset(token)
+                    tracker.release(action)
+
+        return TrackedCallWrapper
+
+    def current(self) -> Optional[QueryAction]:
+        return self._current.get()
+
+    @staticmethod
+    def describe(func) -> str:
+        """Nombre legible de un callback (las lambdas, por su línea)"""
+        name = getattr(func, '__qualname__', None) or repr(func)
+        code = getattr(func, '__code__', None)
+        if code is not None and code.co_name == '<lambda>':
+            name = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    @contextmanager
+    def action(self, name: str, budget: int = None):
+        """Bloque medido como una acción (anidado dentro de la acción en curso)"""
+        if not self.enabled:
+            yield None
+            return
+        action = QueryAction(self, name, budget, self.current())
+        token = self._current.set(action)
+        try:
+            yield action
+        finally:
+            self._current.reset(token)
+            self.release(action, raise_errors=True)
+
+    def release(self, action: QueryAction, raise_errors: bool = False):
+        """Cierra una parte del trabajo de la acción
+        
+        Sólo el bloque action() lanza en modo estricto; en callbacks de Tk y
+        entregas de AsyncDatabase el exceso queda en violations para check().
+        """
+        violations = action.release()
+        if violations and raise_errors and self.strict:
+            for message in violations:
+                self.violations.remove(message)
+            raise QueryBudgetExceeded("; ".join(violations))
+
+    def record(self, query: str):
+        """Anota una consulta que llega a la base de datos"""
+        action = self._current.get()
+        if action is None:
+            return
+        action.record(QueryMetrics.shape(query), self.call_site())
+
+    def call_site(self) -> str:
+        """Primeros dos llamadores fuera de la maquinaria de consultas, de la
+        biblioteca estándar (hilos, contextvars) y de las trazas de acciones"""
+        sites = []
+        frame = sys._getframe(2)
+        while frame is not None and len(sites) < 2:
+            code = frame.f_code
+            if code.co_filename == __file__:
+                if code.co_name not in self.PLUMBING:
+                    sites.append(f"{code.co_name}:{frame.f_lineno}")
+            elif (not code.co_filename.startswith(_STDLIB_DIR)
+                  and (action_tracer is None or code.co_filename != action_tracer.__file__)):
+                sites.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return " ← ".join(sites) or "?"
+
+    def check_action(self, action: QueryAction) -> List[str]:
+        """Revisa una acción terminada: formas repetidas y presupuesto"""
+        if not action.queries:
+            return []
+        
+        # Las repeticiones se informan en la acción más externa para no duplicar avisos
+        if action.parent is None:
+            by_shape: Dict[str, List[str]] = {}
+            for shape, site in action.queries:
+                by_shape.setdefault(shape, []).append(site)
+            for shape, sites in by_shape.items():
+                if len(sites) >= self.repeat_threshold:
+                    distinct = list(dict.fromkeys(sites))[:self.max_sites]
+                    print(f"⚠️ Posible N+1 en {action.name}: {len(sites)}× {shape[:120]} "
+                          f"(desde {'; '.join(distinct)})")
+        
+        if action.budget is not None and len(action.queries) > action.budget:
+            message = (f"{action.name} hizo {len(action.queries)} consultas "
+                       f"(presupuesto: {action.budget})")
+            self.violations.append(message)
+            print(f"⚠️ Presupuesto de consultas superado: {message}")
+            return [message]
+        return []
+
+    def check(self):
+        """Lanza QueryBudgetExceeded si alguna acción superó su presupuesto"""
+        violations, self.violations = self.violations, []
+        if violations:
+            raise QueryBudgetExceeded("; ".join(violations))
+
+    def run_in_context(self, executor: ThreadPoolExecutor, func, *args, **kwargs) -> Future:
+        """executor.submit que mantiene abierta la acción en curso hasta que func termina
+        
+        Devuelve el Future y, si había acción, la deja en future.query_action
+        para que quien entregue el resultado la cierre con finish_in_context.
+        """
+        action = self.current()
+        if action is None:
+            return executor.submit(func, *args, **kwargs)
+        action.hold()
+        future = executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+        future.query_action = action
+        return future
+
+    def finish_in_context(self, future: Future, callback, *args):
+        """Corre el callback del resultado dentro de la acción que pidió el trabajo y la cierra"""
+        action = getattr(future, 'query_action', None)
+        if action is None:
+            if callback:
+                callback(*args)
+            return
+        token = self._current.set(action)
+        try:
+            if callback:
+                callback(*args)
+        finally:
+            self._current.reset(token)
+            self.release(action)
+
+# Detector de N+1: PETZONE_QUERY_CHECK=1 avisa, PETZONE_QUERY_CHECK=strict además
+# lanza QueryBudgetExceeded al superar un presupuesto
+query_tracker = QueryTracker()
+if os.environ.get("PETZONE_QUERY_CHECK"):
+    query_tracker.enable(strict=os.environ["PETZONE_QUERY_CHECK"] == "strict")
+
+def query_budget(limit: int):
+    """Declara cuántas consultas puede hacer una acción, incluido el trabajo
+    asíncrono que lanza y los callbacks de sus resultados"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not query_tracker.enabled:
+                return func(*args, **kwargs)
+            with query_tracker.action(func.__qualname__, limit):
+                return func(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+class _MeasuredCursor:
+    """Cursor de una transacción que registra cada sentencia en QueryMetrics
+    y en el detector de N+1"""
+    def __init__(self, cursor, metrics: Optional[QueryMetrics]):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def _measure(self, method, query, params, logged_params):
+        query_tracker.record(query)
+        started = time.perf_counter()
+        failed = True
+        try:
+            result = method(query, params)
+            failed = False
+            return result
+        finally:
+            if self._metrics is not None:
+                self._metrics.record(query, logged_params, time.perf_counter() - started, failed=failed)
+
+    def execute(self, query, params=()):
+        return self._measure(self._cursor.execute, query, params, params)
+
+    def executemany(self, query, seq_of_params):
+        return self._measure(self._cursor.executemany, query, seq_of_params, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class DatabaseManager:
+    # Resultado interno de una consulta que falló (execute_query devuelve None)
+    _FAILED = object()
+
+    def __init__(self, pool_size: int = 5, idle_timeout: float = 300, max_lifetime: float = 1800,
+                 health_check_interval: float = 30, max_retries: int = 3, retry_backoff: float = 0.1,
+                 use_prepared_statements: bool = True, statement_cache_size: int = 64,
+                 query_cache_size: int = 0, query_cache_ttl: float = 60,
+                 backend: DatabaseBackend = None, eager_connect: bool = True,
+                 collect_metrics: bool = True, slow_query_threshold: float = 0.2):
+        self.config = {
+            'host': 'localhost',
+            'user': 'root',  # Cambia por tu usuario de MySQL
+            'password': '',  # Cambia por tu contraseña de MySQL
+            'database': 'petZone',
+            # Cada consulta suelta se confirma sola; las escrituras de varios pasos
+            # abren su propia transacción explícita
+            'autocommit': True
+        }
+        # Motor de base de datos: el servidor MySQL de self.config salvo que se indique otro
+        self.backend = backend or MySQLBackend(self.config)
+        if self.backend.max_connections:
+            pool_size = min(pool_size, self.backend.max_connections)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.use_prepared_statements = use_prepared_statements
+        self.statement_cache_size = statement_cache_size
+        self.statement_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._stats_lock = threading.Lock()
+        # Favoritos por usuario, cargados una vez por sesión
+        self._favorite_ids: Dict[int, set] = {}
+        self._favorites_lock = threading.Lock()
+        # Usuario -> momento (monotonic) desde el que se puede reintentar una carga fallida
+        self._favorites_retry_at: Dict[int, float] = {}
+        # Funciones a avisar cuando la app modifica una tabla: listener(tabla, columnas, ids)
+        self._change_listeners = []
+        self.search_index = ProductSearchIndex(self)
+        self.add_change_listener(self.search_index.on_change)
+        self.autocomplete = ProductAutocomplete(self)
+        self.add_change_listener(self.autocomplete.on_change)
+        self.facet_index = FacetIndex(self)
+        self.add_change_listener(self.facet_index.on_change)
+        # Métricas por consulta y registro de consultas lentas (ver QueryMetrics)
+        self.metrics = QueryMetrics(slow_query_threshold) if collect_metrics else None
+        # Caché de lecturas: desactivada con query_cache_size=0
+        self.query_cache = None
+        if query_cache_size > 0:
+            self.query_cache = QueryCache(query_cache_size, query_cache_ttl)
+            self.add_change_listener(self.query_cache.on_change)
+        self.pool = ConnectionPool(
+            self._create_connection,
+            size=pool_size,
+            idle_timeout=idle_timeout,
+            max_lifetime=max_lifetime,
+            validator=self._is_alive,
+            health_check_interval=health_check_interval
+        )
+        # Con eager_connect=False la primera conexión se abre con la primera
+        # consulta (o con check_connection), p. ej. en segundo plano
+        if eager_connect:
             self.connect()
+        
+    def _create_connection(self):
+        return self.backend.connect()
+    
+    def _is_alive(self, connection) -> bool:
+        return self.backend.is_alive(connection)
+    
+    def _is_connection_lost(self, error: Exception) -> bool:
+        return self.backend.is_connection_lost(error)
+        
+    def check_connection(self) -> bool:
+        """Abre (o reutiliza) una conexión del pool; los errores se propagan"""
+        with self.pool.connection() as connection:
+            return self.backend.is_alive(connection)
+    
+    def connect(self):
+        try:
+            if self.check_connection():
+                print(f"Conexión a {self.backend.name} establecida")
+        except DB_ERRORS as e:
+            print(f"Error al conectar a {self.backend.name}: {e}")
+            messagebox.showerror("Error de Base de Datos", f"No se pudo conectar a la base de datos: {e}")
+    
+    def close(self):
+        """Cierra las conexiones abiertas del pool"""
+        self.autocomplete.shutdown()
+        self.pool.close_all()
+    
+    def add_change_listener(self, listener):
+        """Registra una función que se llama cuando la app modifica una tabla"""
+        self._change_listeners.append(listener)
+    
+    def _notify_change(self, table: str, columns: set = None, ids: list = None):
+        """Avisa a los listeners
+        
+        columns=None significa que pudo cambiar cualquier columna; ids son las
+        filas afectadas (para detalle_pedido, los productos), si se conocen.
+        """
+        for listener in self._change_listeners:
+            try:
+                listener(table, columns, ids)
+            except Exception as e:
+                print(f"Error en listener de cambios: {e}")
+    
+    @contextmanager
+    def transaction(self):
+        """Ejecuta un bloque en una única transacción: confirma al final o revierte ante cualquier error"""
+        with self.pool.connection() as connection:
+            cursor = self.backend.cursor(connection)
+            if self.metrics is not None or query_tracker.enabled:
+                cursor = _MeasuredCursor(cursor, self.metrics)
+            try:
+                self.backend.begin(connection)
+                yield cursor
+                connection.commit()
+            except Exception as e:
+                if isinstance(e, DB_ERRORS) and self._is_connection_lost(e):
+                    self.pool.invalidate()
+                else:
+                    try:
+                        connection.rollback()
+                    except DB_ERRORS:
+                        self.pool.invalidate()
+                raise
+            finally:
+                try:
+                    cursor.close()
+                except DB_ERRORS:
+                    self.pool.invalidate()
     
     def execute_query(self, query, params=None, fetch_one=False, fetch_all=False, commit=False):
+        query_tracker.record(query)
+        started = time.perf_counter()
+        result = self._execute_with_retries(query, params, fetch_one, fetch_all, commit)
+        failed = result is self._FAILED
+        if failed:
+            result = None
+        if self.metrics is not None:
+            if isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = 1 if isinstance(result, dict) else None
+            self.metrics.record(query, params, time.perf_counter() - started, rows, failed)
+        return result
+    
+    def _execute_with_retries(self, query, params, fetch_one, fetch_all, commit):
+        attempt = 0
+        while True:
+            sent = [False]
+            try:
+                return self._execute_once(query, params, fetch_one, fetch_all, commit, sent)
+            except DB_ERRORS as e:
+                # Se reintenta sólo si se perdió la conexión, fuera de una transacción
+                # y sin riesgo de repetir una escritura que quizás ya se aplicó
+                retryable = (
+                    self._is_connection_lost(e)
+                    and not self.pool.is_held()
+                    and (not commit or not sent[0])
+                    and attempt < self.max_retries
+                )
+                if not retryable:
+                    print(f"Error en la consulta: {e}")
+                    return self._FAILED
+                
+                delay = self.retry_backoff * (2 ** attempt)
+                attempt += 1
+                print(f"Conexión perdida, reintentando ({attempt}/{self.max_retries}) en {delay:.1f}s")
+                time.sleep(delay)
+    
+    def cached_query(self, tags, query, params=None, fetch_one=False, fetch_all=False):
+        """execute_query de lectura a través de la caché
+        
+        tags son las tablas que lee la consulta; cualquier escritura de la app
+        sobre una de ellas descarta el resultado guardado. Sin caché configurada
+        equivale a execute_query. El resultado es compartido: no modificarlo.
+        """
+        cache = self.query_cache
+        if cache is None:
+            return self.execute_query(query, params, fetch_one=fetch_one, fetch_all=fetch_all)
+        
+        key = cache.make_key(query, params, fetch_one, fetch_all)
+        found, result = cache.get(key)
+        if found:
+            if self.metrics is not None:
+                self.metrics.record_cache_hit(query)
+            return result
+        
+        tags = tuple(tags)
+        versions = cache.versions(tags)
+        result = self.execute_query(query, params, fetch_one=fetch_one, fetch_all=fetch_all)
+        if result is not None:
+            cache.put(key, result, tags, versions)
+        return result
+
+    def get_query_cache_stats(self) -> Dict:
+        """Aciertos, fallos, desalojos e invalidaciones de la caché de consultas"""
+        if self.query_cache is None:
+            return {'enabled': False}
+        return dict(self.query_cache.get_stats(), enabled=True)
+
+    def get_query_metrics(self, top: int = None, order: str = 'total_ms') -> List[Dict]:
+        """Métricas por forma de consulta (ver QueryMetrics.snapshot)"""
+        return self.metrics.snapshot(top, order) if self.metrics is not None else []
+    
+    def get_slow_queries(self) -> List[Dict]:
+        """Últimas consultas lentas, con los parámetros redactados"""
+        return self.metrics.slow_queries() if self.metrics is not None else []
+    
+    def export_metrics(self, path: str):
+        """Guarda en JSON las métricas de consultas, las consultas lentas y las cachés"""
+        snapshot = {
+            'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'since': self.metrics.started_at.strftime("%Y-%m-%d %H:%M:%S") if self.metrics else None,
+            'backend': self.backend.name,
+            'slow_query_threshold_ms': self.metrics.slow_threshold * 1000 if self.metrics else None,
+            'queries': self.get_query_metrics(),
+            'slow_queries': self.get_slow_queries(),
+            'query_cache': self.get_query_cache_stats(),
+            'statement_cache': self.get_statement_cache_stats(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        return snapshot
+    
+    def _count_statement(self, stat: str):
+        with self._stats_lock:
+            self.statement_stats[stat] += 1
+
+    def get_statement_cache_stats(self) -> Dict:
+        """Aciertos, fallos y expulsiones del cache de sentencias preparadas"""
+        with self._stats_lock:
+            stats = dict(self.statement_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def _prepared_cursor(self, connection, query):
+        """Devuelve el cursor preparado para esta forma de consulta, reutilizándolo si existe
+        
+        Se devuelve también el texto original con el que se preparó: el cursor
+        sólo reutiliza la sentencia si recibe exactamente ese objeto.
+        """
+        statements = self.pool.current_entry().statements
+        cached = statements.get(query)
+        if cached is not None:
+            statements.move_to_end(query)
+            self._count_statement('hits')
+            return cached
+        
+        cursor = self.backend.cursor(connection, prepared=True)
+        statements[query] = (query, cursor)
+        self._count_statement('misses')
+        
+        if len(statements) > self.statement_cache_size:
+            _, (_, old_cursor) = statements.popitem(last=False)
+            try:
+                old_cursor.close()
+            except DB_ERRORS:
+                pass
+            self._count_statement('evictions')
+        
+        return query, cursor
+
+    def _forget_prepared(self, query):
+        """Quita del cache una sentencia cuyo estado quedó incierto tras un error"""
+        entry = self.pool.current_entry()
+        cached = entry.statements.pop(query, None) if entry else None
+        if cached is not None:
+            try:
+                cached[1].close()
+            except DB_ERRORS:
+                pass
+
+    def _execute_once(self, query, params, fetch_one, fetch_all, commit, sent):
         cursor = None
+        connection = None
+        prepared = False
         try:
-            self.reconnect()
-            cursor = self.connection.cursor(dictionary=True)
+            connection = self.pool.acquire()
+            if self.use_prepared_statements and self.backend.supports_prepared_statements:
+                query, cursor = self._prepared_cursor(connection, query)
+                prepared = True
+            else:
+                cursor = self.backend.cursor(connection)
+            sent[0] = True
             cursor.execute(query, params or ())
             
-            if commit:
-                self.connection.commit()
+            # Con autocommit activo no hace falta un COMMIT aparte; sólo se
+            # confirma explícitamente si la conexión participa de una transacción
+            if commit and connection.in_transaction and not self.pool.is_nested():
+                connection.commit()
+            
+            if prepared:
+                # Un cursor preparado se reutiliza: hay que leer todas las filas
+                # para dejarlo listo para la próxima ejecución
+                rows = cursor.fetchall() if cursor.with_rows else []
+                if fetch_one:
+                    return rows[0] if rows else None
+                elif fetch_all:
+                    return rows
+                return True
             
             if fetch_one:
                 return cursor.fetchone()
@@ -82,14 +2273,29 @@ class DatabaseManager:
                 return cursor.fetchall()
             
             return True
-        except Error as e:
-            print(f"Error en la consulta: {e}")
-            if self.connection:
-                self.connection.rollback()
-            return None
+        except DB_ERRORS as e:
+            if prepared:
+                self._forget_prepared(query)
+                cursor = None
+            if connection is not None:
+                if self._is_connection_lost(e):
+                    self.pool.invalidate()
+                else:
+                    self.pool.mark_suspect()
+                    if not self.pool.is_nested():
+                        try:
+                            connection.rollback()
+                        except DB_ERRORS:
+                            self.pool.invalidate()
+            raise
         finally:
-            if cursor:
-                cursor.close()
+            if cursor and not prepared:
+                try:
+                    cursor.close()
+                except DB_ERRORS:
+                    self.pool.invalidate()
+            if connection is not None:
+                self.pool.release()
     
     def hash_password(self, password: str) -> str:
         return hashlib.sha256(password.encode()).hexdigest()
@@ -141,6 +2347,9 @@ class DatabaseManager:
                     product[7], product[8], product[9], product[2]
                 )
                 self.execute_query(query, params, commit=True)
+            
+            self._notify_change('categorias')
+            self._notify_change('productos')
 
     def create_user(self, username: str, email: str, password: str, nombre: str = None, apellido: str = None) -> bool:
         """Crea un nuevo usuario en la base de datos"""
@@ -161,6 +2370,8 @@ class DatabaseManager:
         params = (username, email, password_hash, nombre or username, apellido or "")
         result = self.execute_query(query, params, commit=True)
         
+        if result:
+            self._notify_change('usuarios')
         return bool(result)
 
     def authenticate_user(self, email: str, password: str) -> Optional[User]:
@@ -191,13 +2402,82 @@ class DatabaseManager:
             )
         return None
 
-    def get_products(self, category: str = None, search: str = None) -> List[Product]:
-        """Obtiene productos con filtros opcionales"""
-        query = """
-        SELECT p.id, p.nombre as name, p.precio as price, c.nombre as category, 
-               p.descripcion as description, p.stock, p.marca, p.tipo_mascota, p.edad_mascota
+    # Columnas comunes a todas las lecturas de productos. El rating sale del
+    # resumen producto_rating (una fila por producto), sin agregar las reseñas
+    PRODUCT_COLUMNS = """
+        p.id, p.nombre as name, p.precio as price, c.nombre as category, 
+        p.descripcion as description, p.stock, p.marca, p.tipo_mascota, p.edad_mascota,
+        r.suma * 1.0 / NULLIF(r.cantidad, 0) as avg_rating, r.cantidad as rating_count
+    """
+    RATING_JOIN = """
+        LEFT JOIN producto_rating r ON r.producto_id = p.id
+    """
+    # Tablas que leen las consultas de productos (tags de la caché)
+    PRODUCT_TAGS = ('productos', 'categorias', 'producto_rating')
+
+    def _row_to_product(self, row) -> Product:
+        """Convierte una fila de PRODUCT_COLUMNS en un Product"""
+        avg_rating = row['avg_rating'] if row['avg_rating'] else 4.0
+        return Product(
+            id=row['id'],
+            name=row['name'],
+            price=float(row['price']),
+            category=row['category'],
+            rating=float(avg_rating),
+            description=row['description'],
+            stock=row['stock'],
+            marca=row['marca'],
+            tipo_mascota=row['tipo_mascota'],
+            edad_mascota=row['edad_mascota'],
+            rating_count=row['rating_count'] or 0
+        )
+
+    # Columna SQL de cada faceta (el precio se filtra por rangos)
+    FACET_COLUMNS = {'categoria': 'c.nombre', 'tipo_mascota': 'p.tipo_mascota',
+                     'edad_mascota': 'p.edad_mascota', 'marca': 'p.marca'}
+
+    def _facet_conditions(self, filters: Dict[str, set]):
+        """Condiciones SQL para los filtros de facetas: OR dentro de cada una, AND entre ellas"""
+        conditions = ""
+        params = []
+        for facet, values in sorted((filters or {}).items()):
+            if not values:
+                continue
+            if facet == 'precio':
+                ranges = []
+                for key, low, high in FacetIndex.PRICE_BUCKETS:
+                    if key not in values:
+                        continue
+                    if high is None:
+                        ranges.append("p.precio >= %s")
+                        params.append(low)
+                    else:
+                        ranges.append("(p.precio >= %s AND p.precio < %s)")
+                        params.extend([low, high])
+                if ranges:
+                    conditions += f" AND ({' OR '.join(ranges)})"
+            elif facet in self.FACET_COLUMNS:
+                values = sorted(values)
+                placeholders = ", ".join(["%s"] * len(values))
+                conditions += f" AND {self.FACET_COLUMNS[facet]} IN ({placeholders})"
+                params.extend(values)
+        return conditions, params
+
+    def get_products(self, category: str = None, search: str = None,
+                     limit: int = None, after: tuple = None,
+                     filters: Dict[str, set] = None) -> List[Product]:
+        """Obtiene productos con filtros opcionales, ordenados por nombre
+        
+        Con limit se obtiene una página; after es el cursor (nombre, id) del
+        último producto de la página anterior. Con search se usa el índice de
+        búsqueda y los resultados vienen ordenados por relevancia. filters
+        son los valores marcados por faceta, p. ej. {'tipo_mascota': {'gato'}}.
+        """
+        query = f"""
+        SELECT {self.PRODUCT_COLUMNS}
         FROM productos p
         JOIN categorias c ON p.categoria_id = c.id
+        {self.RATING_JOIN}
         WHERE 1=1
         """
         params = []
@@ -207,123 +2487,207 @@ class DatabaseManager:
             params.append(category)
         
         if search:
-            query += " AND (p.nombre LIKE %s OR p.descripcion LIKE %s)"
-            params.extend([f"%{search}%", f"%{search}%"])
+            return self._search_products(search, category, limit, after, filters)
         
-        query += " ORDER BY p.nombre"
+        if filters:
+            conditions, filter_params = self._facet_conditions(filters)
+            query += conditions
+            params.extend(filter_params)
         
-        results = self.execute_query(query, params, fetch_all=True) or []
+        if after:
+            query += " AND (p.nombre > %s OR (p.nombre = %s AND p.id > %s))"
+            params.extend([after[0], after[0], after[1]])
         
-        products = []
-        for row in results:
-            # Obtener rating promedio si existe
-            rating_query = "SELECT AVG(rating) as avg_rating FROM reseñas WHERE producto_id = %s"
-            rating_result = self.execute_query(rating_query, (row['id'],), fetch_one=True)
-            avg_rating = rating_result['avg_rating'] if rating_result and rating_result['avg_rating'] else 4.0
-            
-            products.append(Product(
-                id=row['id'],
-                name=row['name'],
-                price=float(row['price']),
-                category=row['category'],
-                rating=float(avg_rating),
-                description=row['description'],
-                stock=row['stock'],
-                marca=row['marca'],
-                tipo_mascota=row['tipo_mascota'],
-                edad_mascota=row['edad_mascota']
-            ))
-        
-        return products
+        query += " ORDER BY p.nombre, p.id"
+        
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        
+        results = self.cached_query(self.PRODUCT_TAGS, query, params, fetch_all=True) or []
+        return [self._row_to_product(row) for row in results]
+
+    def _search_products(self, search: str, category: str = None, limit: int = None,
+                         after: tuple = None, filters: Dict[str, set] = None) -> List[Product]:
+        """Busca con el índice en memoria y trae de la base sólo la página pedida"""
+        ranked_ids = self.search_index.search(search, category)
+        if filters:
+            ranked_ids = self.facet_index.filter_ids(ranked_ids, filters)
+        
+        # El cursor es el mismo que el del catálogo; para continuar sólo se usa su id
+        start = 0
+        if after:
+            try:
+                start = ranked_ids.index(after[1]) + 1
+            except ValueError:
+                return []
+        
+        page_ids = ranked_ids[start:start + limit] if limit else ranked_ids[start:]
+        if not page_ids:
+            return []
+        
+        placeholders = ", ".join(["%s"] * len(page_ids))
+        query = f"""
+        SELECT {self.PRODUCT_COLUMNS}
+        FROM productos p
+        JOIN categorias c ON p.categoria_id = c.id
+        {self.RATING_JOIN}
+        WHERE p.id IN ({placeholders})
+        """
+        results = self.cached_query(self.PRODUCT_TAGS, query, page_ids, fetch_all=True) or []
+        
+        # Se respeta el orden por relevancia del índice
+        products = {row['id']: self._row_to_product(row) for row in results}
+        return [products[product_id] for product_id in page_ids if product_id in products]
+
+    def get_facet_counts(self, category: str = None, search: str = None,
+                         filters: Dict[str, set] = None) -> Dict[str, Dict[str, int]]:
+        """Conteos por valor de cada faceta para la selección actual
+        
+        Salen del índice de bitmaps en memoria; sólo la primera llamada (o tras
+        un cambio en productos) consulta la base.
+        """
+        filters = dict(filters or {})
+        if category and category != "Todos":
+            filters['categoria'] = {category}
+        product_ids = self.search_index.search(search) if search else None
+        return self.facet_index.counts(filters, product_ids)
+
+    def suggest_search_correction(self, search: str) -> Optional[str]:
+        """Búsqueda corregida para "¿Quisiste decir...?", o None si no tiene errores
+        
+        Sólo usa el índice en memoria: se puede llamar desde el hilo de Tk.
+        """
+        return self.search_index.correct(search)
 
     def get_product_by_id(self, product_id: int) -> Optional[Product]:
         """Obtiene un producto por ID"""
-        query = """
-        SELECT p.id, p.nombre as name, p.precio as price, c.nombre as category, 
-               p.descripcion as description, p.stock, p.marca, p.tipo_mascota, p.edad_mascota
+        query = f"""
+        SELECT {self.PRODUCT_COLUMNS}
         FROM productos p
         JOIN categorias c ON p.categoria_id = c.id
+        {self.RATING_JOIN}
         WHERE p.id = %s
         """
-        result = self.execute_query(query, (product_id,), fetch_one=True)
+        result = self.cached_query(self.PRODUCT_TAGS, query, (product_id,), fetch_one=True)
         
         if result:
-            # Obtener rating promedio
-            rating_query = "SELECT AVG(rating) as avg_rating FROM reseñas WHERE producto_id = %s"
-            rating_result = self.execute_query(rating_query, (product_id,), fetch_one=True)
-            avg_rating = rating_result['avg_rating'] if rating_result and rating_result['avg_rating'] else 4.0
-            
-            return Product(
-                id=result['id'],
-                name=result['name'],
-                price=float(result['price']),
-                category=result['category'],
-                rating=float(avg_rating),
-                description=result['description'],
-                stock=result['stock'],
-                marca=result['marca'],
-                tipo_mascota=result['tipo_mascota'],
-                edad_mascota=result['edad_mascota']
-            )
+            return self._row_to_product(result)
         return None
 
     def create_order(self, user_id: int, items: List[Dict], total: float, shipping_address: str) -> int:
-        """Crea un nuevo pedido en la base de datos"""
+        """Crea un nuevo pedido en la base de datos dentro de una única transacción"""
+        # Agrupar cantidades por producto conservando el orden del carrito
+        quantities = {}
+        for item in items:
+            quantities[item['product_id']] = quantities.get(item['product_id'], 0) + item['quantity']
+        
+        if not quantities:
+            return None
+        
+        product_ids = list(quantities)
+        placeholders = ", ".join(["%s"] * len(product_ids))
+        
         try:
-            # Crear el pedido principal
-            query = """
-            INSERT INTO pedidos (usuario_id, total, estado, direccion_envio, fecha_pedido)
-            VALUES (%s, %s, 'pendiente', %s, NOW())
-            """
-            params = (user_id, total, shipping_address)
-            self.execute_query(query, params, commit=True)
-            
-            # Obtener el ID del pedido recién creado
-            order_id = self.execute_query("SELECT LAST_INSERT_ID() as id", fetch_one=True)['id']
-            
-            # Insertar los items del pedido
-            for item in items:
-                product = self.get_product_by_id(item['product_id'])
-                if product:
-                    query = """
-                    INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
-                    VALUES (%s, %s, %s, %s, %s)
-                    """
-                    params = (order_id, item['product_id'], item['quantity'], product.price, 
-                             product.price * item['quantity'])
-                    self.execute_query(query, params, commit=True)
-                    
-                    # Actualizar el stock del producto
-                    query = "UPDATE productos SET stock = stock - %s WHERE id = %s"
-                    self.execute_query(query, (item['quantity'], item['product_id']), commit=True)
+            with self.transaction() as cursor:
+                # Precios de todos los productos, bloqueando sus filas hasta el COMMIT
+                cursor.execute(
+                    f"SELECT id, precio FROM productos WHERE id IN ({placeholders}) FOR UPDATE",
+                    product_ids
+                )
+                prices = {row['id']: float(row['precio']) for row in cursor.fetchall()}
+                
+                missing = [product_id for product_id in product_ids if product_id not in prices]
+                if missing:
+                    raise OrderError(f"Productos inexistentes: {missing}")
+                
+                # Crear el pedido principal
+                query = """
+                INSERT INTO pedidos (usuario_id, total, estado, direccion_envio, fecha_pedido)
+                VALUES (%s, %s, 'pendiente', %s, NOW())
+                """
+                cursor.execute(query, (user_id, total, shipping_address))
+                order_id = cursor.lastrowid
+                
+                # Insertar todos los items del pedido de una vez
+                query = """
+                INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
+                VALUES (%s, %s, %s, %s, %s)
+                """
+                cursor.executemany(query, [
+                    (order_id, product_id, quantity, prices[product_id], prices[product_id] * quantity)
+                    for product_id, quantity in quantities.items()
+                ])
+                
+                # Descontar el stock en una sola sentencia que no permite sobreventa:
+                # si algún producto no alcanza, esa fila no se actualiza
+                cases = " ".join(["WHEN %s THEN %s"] * len(product_ids))
+                case_params = [value for pair in quantities.items() for value in pair]
+                query = f"""
+                UPDATE productos
+                SET stock = stock - CASE id {cases} END
+                WHERE id IN ({placeholders}) AND stock >= CASE id {cases} END
+                """
+                cursor.execute(query, case_params + product_ids + case_params)
+                
+                if cursor.rowcount != len(product_ids):
+                    raise OrderError("Stock insuficiente para completar el pedido")
             
+            self._notify_change('pedidos', ids=[order_id])
+            self._notify_change('detalle_pedido', ids=product_ids)
+            self._notify_change('productos', {'stock'}, ids=product_ids)
             return order_id
-        except Error as e:
+        except DB_ERRORS + (OrderError,) as e:
             print(f"Error al crear pedido: {e}")
             return None
 
-    def get_user_orders(self, user_id: int) -> List[Dict]:
-        """Obtiene los pedidos de un usuario"""
+    def get_user_orders(self, user_id: int, limit: int = None, after: tuple = None) -> List[Dict]:
+        """Obtiene los pedidos de un usuario, del más reciente al más antiguo
+        
+        Con limit se obtiene una página; after es el cursor (created_at, id) del
+        último pedido de la página anterior.
+        """
         query = """
         SELECT p.id, p.total, p.estado as status, p.fecha_pedido as created_at, 
                p.direccion_envio as shipping_address
         FROM pedidos p
         WHERE p.usuario_id = %s
-        ORDER BY p.fecha_pedido DESC
         """
-        results = self.execute_query(query, (user_id,), fetch_all=True) or []
+        params = [user_id]
+        
+        if after:
+            query += " AND (p.fecha_pedido < %s OR (p.fecha_pedido = %s AND p.id < %s))"
+            params.extend([after[0], after[0], after[1]])
+        
+        query += " ORDER BY p.fecha_pedido DESC, p.id DESC"
+        
+        if limit:
+            query += " LIMIT %s"
+            params.append(limit)
+        
+        results = self.cached_query(('pedidos',), query, params, fetch_all=True) or []
+        if not results:
+            return []
+        
+        # Items de todos los pedidos de la página en una sola consulta
+        order_ids = [row['id'] for row in results]
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        items_query = f"""
+        SELECT dp.pedido_id, pr.nombre, dp.cantidad 
+        FROM detalle_pedido dp
+        JOIN productos pr ON dp.producto_id = pr.id
+        WHERE dp.pedido_id IN ({placeholders})
+        ORDER BY dp.pedido_id, dp.id
+        """
+        items_result = self.cached_query(('detalle_pedido', 'productos'), items_query, order_ids, fetch_all=True) or []
+        
+        items_by_order = {}
+        for item in items_result:
+            items_by_order.setdefault(item['pedido_id'], []).append(f"{item['nombre']} x{item['cantidad']}")
         
         orders = []
         for row in results:
-            # Obtener items del pedido
-            items_query = """
-            SELECT pr.nombre, dp.cantidad 
-            FROM detalle_pedido dp
-            JOIN productos pr ON dp.producto_id = pr.id
-            WHERE dp.pedido_id = %s
-            """
-            items_result = self.execute_query(items_query, (row['id'],), fetch_all=True) or []
-            items_str = ", ".join([f"{item['nombre']} x{item['cantidad']}" for item in items_result])
+            items_str = ", ".join(items_by_order.get(row['id'], []))
             
             orders.append({
                 'id': row['id'],
@@ -336,6 +2700,250 @@ class DatabaseManager:
         
         return orders
 
+    def get_user_order_summary(self, user_id: int) -> Dict:
+        """Obtiene la cantidad de pedidos y el total gastado por un usuario"""
+        query = """
+        SELECT COUNT(*) as count, COALESCE(SUM(total), 0) as total_spent
+        FROM pedidos
+        WHERE usuario_id = %s
+        """
+        result = self.cached_query(('pedidos',), query, (user_id,), fetch_one=True)
+        
+        if result:
+            return {'count': result['count'], 'total_spent': float(result['total_spent'])}
+        return {'count': 0, 'total_spent': 0.0}
+
+    def _apply_rating_delta(self, cursor, product_id: int, count: int, total: int, stars: Dict[int, int]):
+        """Suma un cambio al resumen de rating del producto, dentro de la transacción del cursor
+        
+        El UPSERT con incrementos relativos es atómico por fila: dos reseñas
+        simultáneas del mismo producto no se pisan.
+        """
+        star_values = [stars.get(star, 0) for star in range(1, 6)]
+        query = """
+        INSERT INTO producto_rating
+            (producto_id, cantidad, suma, estrellas_1, estrellas_2, estrellas_3, estrellas_4, estrellas_5)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            suma = suma + VALUES(suma),
+            estrellas_1 = estrellas_1 + VALUES(estrellas_1),
+            estrellas_2 = estrellas_2 + VALUES(estrellas_2),
+            estrellas_3 = estrellas_3 + VALUES(estrellas_3),
+            estrellas_4 = estrellas_4 + VALUES(estrellas_4),
+            estrellas_5 = estrellas_5 + VALUES(estrellas_5)
+        """
+        cursor.execute(query, [product_id, count, total] + star_values)
+
+    def submit_review(self, user_id: int, product_id: int, rating: int, comment: str = None) -> Optional[int]:
+        """Guarda la reseña del usuario para el producto (una por usuario: si ya existe, se actualiza)
+        
+        Devuelve el id de la reseña, o None si no se pudo guardar.
+        """
+        if rating not in (1, 2, 3, 4, 5):
+            return None
+        
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    "SELECT id, rating FROM reseñas WHERE usuario_id = %s AND producto_id = %s FOR UPDATE",
+                    (user_id, product_id)
+                )
+                existing = cursor.fetchone()
+                
+                if existing:
+                    review_id = existing['id']
+                    cursor.execute(
+                        "UPDATE reseñas SET rating = %s, comentario = %s, fecha_creacion = NOW() WHERE id = %s",
+                        (rating, comment, review_id)
+                    )
+                    old_rating = existing['rating']
+                    if old_rating != rating:
+                        self._apply_rating_delta(cursor, product_id, 0, rating - old_rating,
+                                                 {old_rating: -1, rating: 1})
+                else:
+                    cursor.execute(
+                        """
+                        INSERT INTO reseñas (usuario_id, producto_id, rating, comentario, fecha_creacion)
+                        VALUES (%s, %s, %s, %s, NOW())
+                        """,
+                        (user_id, product_id, rating, comment)
+                    )
+                    review_id = cursor.lastrowid
+                    self._apply_rating_delta(cursor, product_id, 1, rating, {rating: 1})
+            
+            self._notify_change('reseñas', ids=[product_id])
+            self._notify_change('producto_rating', ids=[product_id])
+            return review_id
+        except DB_ERRORS as e:
+            print(f"Error al guardar reseña: {e}")
+            return None
+
+    def delete_review(self, user_id: int, review_id: int) -> bool:
+        """Elimina una reseña del usuario y la descuenta del resumen del producto"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute(
+                    "SELECT producto_id, rating FROM reseñas WHERE id = %s AND usuario_id = %s FOR UPDATE",
+                    (review_id, user_id)
+                )
+                review = cursor.fetchone()
+                if not review:
+                    return False
+                
+                cursor.execute("DELETE FROM reseñas WHERE id = %s", (review_id,))
+                self._apply_rating_delta(cursor, review['producto_id'], -1, -review['rating'],
+                                         {review['rating']: -1})
+            
+            self._notify_change('reseñas', ids=[review['producto_id']])
+            self._notify_change('producto_rating', ids=[review['producto_id']])
+            return True
+        except DB_ERRORS as e:
+            print(f"Error al eliminar reseña: {e}")
+            return False
+
+    def get_product_reviews(self, product_id: int, limit: int = 10, after: tuple = None) -> List[Dict]:
+        """Obtiene las reseñas de un producto, de la más reciente a la más antigua
+        
+        after es el cursor (created_at, id) de la última reseña de la página anterior.
+        """
+        query = """
+        SELECT r.id, r.usuario_id as user_id, u.username, r.rating, r.comentario as comment,
+               r.fecha_creacion as created_at
+        FROM reseñas r
+        LEFT JOIN usuarios u ON r.usuario_id = u.id
+        WHERE r.producto_id = %s
+        """
+        params = [product_id]
+        
+        if after:
+            query += " AND (r.fecha_creacion < %s OR (r.fecha_creacion = %s AND r.id < %s))"
+            params.extend([after[0], after[0], after[1]])
+        
+        query += " ORDER BY r.fecha_creacion DESC, r.id DESC LIMIT %s"
+        params.append(limit)
+        
+        results = self.cached_query(('reseñas', 'usuarios'), query, params, fetch_all=True) or []
+        return [
+            {
+                'id': row['id'],
+                'user_id': row['user_id'],
+                'username': row['username'] or "Anónimo",
+                'rating': row['rating'],
+                'comment': row['comment'] or "",
+                'created_at': row['created_at']
+            }
+            for row in results
+        ]
+
+    def get_rating_summary(self, product_id: int) -> Dict:
+        """Cantidad, promedio e histograma de estrellas de un producto (una sola fila)"""
+        query = """
+        SELECT cantidad, suma, estrellas_1, estrellas_2, estrellas_3, estrellas_4, estrellas_5
+        FROM producto_rating
+        WHERE producto_id = %s
+        """
+        row = self.cached_query(('producto_rating',), query, (product_id,), fetch_one=True)
+        if not row or not row['cantidad']:
+            return {'count': 0, 'average': 0.0, 'histogram': {star: 0 for star in range(1, 6)}}
+        
+        return {
+            'count': row['cantidad'],
+            'average': float(row['suma']) / row['cantidad'],
+            'histogram': {star: row[f'estrellas_{star}'] for star in range(1, 6)}
+        }
+
+    # Esquema que el código espera y que una base importada de un dump anterior
+    # no tiene; SQL válido tanto en MySQL como en SQLite
+    RATING_SUMMARY_DDL = """
+    CREATE TABLE IF NOT EXISTS producto_rating (
+        producto_id INT NOT NULL PRIMARY KEY,
+        cantidad INT NOT NULL DEFAULT 0,
+        suma INT NOT NULL DEFAULT 0,
+        estrellas_1 INT NOT NULL DEFAULT 0,
+        estrellas_2 INT NOT NULL DEFAULT 0,
+        estrellas_3 INT NOT NULL DEFAULT 0,
+        estrellas_4 INT NOT NULL DEFAULT 0,
+        estrellas_5 INT NOT NULL DEFAULT 0,
+        FOREIGN KEY (producto_id) REFERENCES productos (id) ON DELETE CASCADE
+    )
+    """
+    SCHEMA_INDEXES = [
+        ('reseñas', 'uq_reseñas_usuario_producto', "CREATE UNIQUE INDEX uq_reseñas_usuario_producto ON reseñas (usuario_id, producto_id)"),
+        ('reseñas', 'idx_reseñas_producto_fecha', "CREATE INDEX idx_reseñas_producto_fecha ON reseñas (producto_id, fecha_creacion)"),
+    ]
+
+    def ensure_schema(self) -> bool:
+        """Pone al día una base existente con el esquema de petzone-ari.sql
+        
+        Crea producto_rating y los índices de reseñas si faltan (antes de la
+        clave única se descartan las reseñas repetidas, quedando la más nueva
+        de cada usuario por producto) y carga el resumen si está vacío. Es
+        idempotente: se corre en cada arranque y sólo hace algo la primera vez.
+        """
+        removed = 0
+        try:
+            with self.pool.connection() as connection:
+                cursor = self.backend.cursor(connection)
+                try:
+                    cursor.execute(self.RATING_SUMMARY_DDL)
+                    for table, name, ddl in self.SCHEMA_INDEXES:
+                        if self.backend.index_exists(connection, table, name):
+                            continue
+                        if name == 'uq_reseñas_usuario_producto':
+                            cursor.execute("""
+                            DELETE FROM reseñas
+                            WHERE usuario_id IS NOT NULL AND producto_id IS NOT NULL
+                              AND id NOT IN (
+                                SELECT id FROM (
+                                    SELECT MAX(id) AS id FROM reseñas
+                                    WHERE usuario_id IS NOT NULL AND producto_id IS NOT NULL
+                                    GROUP BY usuario_id, producto_id
+                                ) AS ultimas
+                              )
+                            """)
+                            removed = cursor.rowcount
+                        cursor.execute(ddl)
+                        print(f"Esquema actualizado: índice {name}")
+                    
+                    cursor.execute("SELECT COUNT(*) AS count FROM producto_rating")
+                    summaries = cursor.fetchone()['count']
+                    cursor.execute("SELECT COUNT(*) AS count FROM reseñas WHERE rating IS NOT NULL")
+                    reviews = cursor.fetchone()['count']
+                    connection.commit()
+                finally:
+                    cursor.close()
+        except DB_ERRORS as e:
+            print(f"Error al actualizar el esquema: {e}")
+            return False
+        
+        if removed > 0:
+            print(f"Se descartaron {removed} reseñas repetidas")
+            self._notify_change('reseñas')
+        if summaries == 0 and reviews > 0:
+            return self.rebuild_rating_summary()
+        return True
+
+    def rebuild_rating_summary(self) -> bool:
+        """Recalcula producto_rating desde cero a partir de reseñas (p. ej. tras una migración)"""
+        try:
+            with self.transaction() as cursor:
+                cursor.execute("DELETE FROM producto_rating")
+                cursor.execute("""
+                INSERT INTO producto_rating
+                    (producto_id, cantidad, suma, estrellas_1, estrellas_2, estrellas_3, estrellas_4, estrellas_5)
+                SELECT producto_id, COUNT(*), SUM(rating),
+                       SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+                FROM reseñas
+                WHERE producto_id IS NOT NULL AND rating IS NOT NULL
+                GROUP BY producto_id
+                """)
+            self._notify_change('producto_rating')
+            return True
+        except DB_ERRORS as e:
+            print(f"Error al recalcular ratings: {e}")
+            return False
+
     def add_to_favorites(self, user_id: int, product_id: int) -> bool:
         """Agrega un producto a favoritos"""
         # Verificar si ya es favorito
@@ -343,64 +2951,200 @@ class DatabaseManager:
         result = self.execute_query(query, (user_id, product_id), fetch_one=True)
         
         if result:
+            # Ya estaba en la base: se corrige el conjunto en memoria si difería
+            self._remember_favorite(user_id, product_id, True)
             return False
         
         # Agregar a favoritos
         query = "INSERT INTO favoritos (usuario_id, producto_id, fecha_agregado) VALUES (%s, %s, NOW())"
-        return bool(self.execute_query(query, (user_id, product_id), commit=True))
+        added = bool(self.execute_query(query, (user_id, product_id), commit=True))
+        if added:
+            self._remember_favorite(user_id, product_id, True)
+            self._notify_change('favoritos')
+        return added
 
     def remove_from_favorites(self, user_id: int, product_id: int) -> bool:
         """Remueve un producto de favoritos"""
         query = "DELETE FROM favoritos WHERE usuario_id = %s AND producto_id = %s"
-        return bool(self.execute_query(query, (user_id, product_id), commit=True))
+        removed = bool(self.execute_query(query, (user_id, product_id), commit=True))
+        if removed:
+            self._remember_favorite(user_id, product_id, False)
+            self._notify_change('favoritos')
+        return removed
+
+    # Tras una carga de favoritos fallida, segundos sin volver a intentarla desde is_favorite
+    FAVORITES_RETRY_SECONDS = 30
+
+    def load_favorite_ids(self, user_id: int) -> set:
+        """Carga desde la base los IDs de productos favoritos del usuario y los guarda en memoria"""
+        query = "SELECT producto_id FROM favoritos WHERE usuario_id = %s"
+        results = self.execute_query(query, (user_id,), fetch_all=True)
+        
+        if results is None:
+            with self._favorites_lock:
+                self._favorites_retry_at[user_id] = time.monotonic() + self.FAVORITES_RETRY_SECONDS
+            return set(self._favorite_ids.get(user_id, set()))
+        
+        favorite_ids = {row['producto_id'] for row in results}
+        with self._favorites_lock:
+            self._favorite_ids[user_id] = favorite_ids
+            self._favorites_retry_at.pop(user_id, None)
+        return set(favorite_ids)
+
+    def forget_favorites(self, user_id: int):
+        """Descarta el conjunto de favoritos en memoria (p. ej. al cerrar sesión)"""
+        with self._favorites_lock:
+            self._favorite_ids.pop(user_id, None)
+            self._favorites_retry_at.pop(user_id, None)
+
+    def _remember_favorite(self, user_id: int, product_id: int, is_fav: bool):
+        with self._favorites_lock:
+            favorite_ids = self._favorite_ids.get(user_id)
+            if favorite_ids is None:
+                return
+            if is_fav:
+                favorite_ids.add(product_id)
+            else:
+                favorite_ids.discard(product_id)
 
     def get_user_favorites(self, user_id: int) -> List[Product]:
         """Obtiene los productos favoritos de un usuario"""
-        query = """
-        SELECT p.id, p.nombre as name, p.precio as price, c.nombre as category, 
-               p.descripcion as description, p.stock, p.marca, p.tipo_mascota, p.edad_mascota
+        query = f"""
+        SELECT {self.PRODUCT_COLUMNS}
         FROM favoritos f
         JOIN productos p ON f.producto_id = p.id
         JOIN categorias c ON p.categoria_id = c.id
+        {self.RATING_JOIN}
         WHERE f.usuario_id = %s
         ORDER BY f.fecha_agregado DESC
         """
-        results = self.execute_query(query, (user_id,), fetch_all=True) or []
-        
-        favorites = []
-        for row in results:
-            # Obtener rating promedio
-            rating_query = "SELECT AVG(rating) as avg_rating FROM reseñas WHERE producto_id = %s"
-            rating_result = self.execute_query(rating_query, (row['id'],), fetch_one=True)
-            avg_rating = rating_result['avg_rating'] if rating_result and rating_result['avg_rating'] else 4.0
-            
-            favorites.append(Product(
-                id=row['id'],
-                name=row['name'],
-                price=float(row['price']),
-                category=row['category'],
-                rating=float(avg_rating),
-                description=row['description'],
-                stock=row['stock'],
-                marca=row['marca'],
-                tipo_mascota=row['tipo_mascota'],
-                edad_mascota=row['edad_mascota']
-            ))
-        
+        results = self.cached_query(self.PRODUCT_TAGS + ('favoritos',), query, (user_id,), fetch_all=True)
+        if results is None:
+            return []
+        
+        # La lista completa también sirve para reconciliar el conjunto en memoria
+        favorites = [self._row_to_product(row) for row in results]
+        with self._favorites_lock:
+            self._favorite_ids[user_id] = {product.id for product in favorites}
         return favorites
 
     def is_favorite(self, user_id: int, product_id: int) -> bool:
-        """Verifica si un producto está en favoritos"""
-        query = "SELECT id FROM favoritos WHERE usuario_id = %s AND producto_id = %s"
-        result = self.execute_query(query, (user_id, product_id), fetch_one=True)
-        return bool(result)
+        """Verifica si un producto está en favoritos
+        
+        Usa el conjunto en memoria del usuario; sólo la primera consulta de la
+        sesión, si no se llamó antes a load_favorite_ids, va a la base. Si esa
+        carga falló, hasta FAVORITES_RETRY_SECONDS después responde False sin
+        consultar (una grilla no hace una consulta bloqueante por tarjeta).
+        """
+        favorite_ids = self._favorite_ids.get(user_id)
+        if favorite_ids is None:
+            if time.monotonic() < self._favorites_retry_at.get(user_id, 0):
+                return False
+            favorite_ids = self.load_favorite_ids(user_id)
+        return product_id in favorite_ids
 
     def get_categories(self) -> List[str]:
         """Obtiene todas las categorías disponibles"""
         query = "SELECT nombre FROM categorias ORDER BY nombre"
-        results = self.execute_query(query, fetch_all=True) or []
+        results = self.cached_query(('categorias',), query, fetch_all=True) or []
         return ["Todos"] + [row['nombre'] for row in results]
 
+class AsyncDatabase:
+    """Ejecuta llamadas a DatabaseManager en hilos de trabajo y entrega los
+    resultados en el hilo de Tk mediante root.after"""
+    def __init__(self, root, db: DatabaseManager, workers: int = 4, poll_interval: int = 15):
+        self.root = root
+        self.db = db
+        self.poll_interval = poll_interval
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="petzone-db")
+        self._results = queue.Queue()
+        self._latest: Dict[str, Future] = {}
+        self._pending = 0
+        self._polling = False
+
+    def submit(self, method, *args, on_success=None, on_error=None, key: str = None, **kwargs) -> Future:
+        """Encola una llamada; method es el nombre de un método de DatabaseManager o una función.
+        
+        Si se indica key, un pedido nuevo con la misma clave vuelve obsoleto al
+        anterior: se cancela si todavía no empezó y su resultado se descarta.
+        """
+        func = getattr(self.db, method) if isinstance(method, str) else method
+        
+        if key is not None:
+            self.cancel(key)
+        
+        # Con trazas activas, el trabajo y la entrega del resultado cuelgan de
+        # la acción que los pidió
+        trace = action_tracer.hold() if action_tracer is not None else None
+        if trace is not None:
+            func = trace.bind(func, f"hilo {getattr(func, '__name__', 'tarea')}", "async")
+        
+        # Con el detector de N+1 activo, el trabajo cuenta para la acción que lo pidió
+        future = query_tracker.run_in_context(self.executor, func, *args, **kwargs)
+        future.trace = trace
+        if key is not None:
+            self._latest[key] = future
+        
+        self._pending += 1
+        future.add_done_callback(lambda f: self._results.put((f, key, on_success, on_error)))
+        self._schedule_poll()
+        return future
+
+    def cancel(self, key: str):
+        """Cancela el pedido pendiente con esa clave, si lo hay"""
+        previous = self._latest.pop(key, None)
+        if previous is not None:
+            previous.cancel()
+
+    def is_pending(self, key: str) -> bool:
+        return key in self._latest
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Entrega en el hilo de Tk los resultados que terminaron"""
+        self._polling = False
+        while True:
+            try:
+                future, key, on_success, on_error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            deliver = self._deliver
+            if future.trace is not None:
+                deliver = future.trace.bind(deliver, f"resultado {key or ''}".strip(), "callback", release=True)
+            query_tracker.finish_in_context(future, deliver, future, key, on_success, on_error)
+        
+        if self._pending > 0:
+            self._schedule_poll()
+
+    def _deliver(self, future: Future, key, on_success, on_error):
+        if future.cancelled():
+            return
+        
+        if key is not None:
+            # Descartar resultados de pedidos reemplazados por uno más nuevo
+            if self._latest.get(key) is not future:
+                return
+            del self._latest[key]
+        
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Error en operación de base de datos: {error}")
+            return
+        
+        if on_success:
+            on_success(future.result())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 class NotificationManager:
     def __init__(self, parent):
         self.parent = parent
@@ -446,50 +3190,487 @@ class NotificationManager:
             wraplength=250,
             justify=tk.LEFT
         )
-        label.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        label.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        
+        close_btn = tk.Button(
+            frame,
+            text="✕",
+            font=("Arial", 8),
+            bg=bg_color,
+            fg="white",
+            relief=tk.FLAT,
+            command=lambda: self.close_notification(notification)
+        )
+        close_btn.pack(side=tk.RIGHT)
+        
+        self.notifications.append(notification)
+        
+        # Auto-cerrar
+        self.parent.after(duration, lambda: self.close_notification(notification))
+
+    def close_notification(self, notification):
+        """Cierra una notificación"""
+        if notification in self.notifications:
+            self.notifications.remove(notification)
+            try:
+                notification.destroy()
+            except:
+                pass
+            
+            # Reposicionar notificaciones restantes
+            for i, notif in enumerate(self.notifications):
+                try:
+                    x = self.parent.winfo_x() + self.parent.winfo_width() - 300
+                    y = self.parent.winfo_y() + 80 + i * 70
+                    notif.geometry(f"280x60+{x}+{y}")
+                except:
+                    pass
+
+class ProductCard:
+    """Tarjeta de producto reutilizable: los widgets se crean una sola vez y se
+    vuelven a enlazar a otro Product cuando la grilla se desplaza"""
+    def __init__(self, app, canvas):
+        self.app = app
+        self.canvas = canvas
+        self.product: Optional[Product] = None
+        self.category = None
+        self.is_mobile = app.is_mobile
+        
+        self.frame = tk.Frame(canvas, bg=app.card_bg, bd=2, relief=tk.SOLID)
+        self.frame.pack_propagate(False)
+        self.window_id = canvas.create_window(0, 0, window=self.frame, anchor="nw", state="hidden")
+        
+        # Imagen del producto (placeholder mejorado)
+        image_frame = tk.Frame(self.frame, bg=app.card_bg, height=120)
+        image_frame.pack(fill=tk.X, pady=10)
+        image_frame.pack_propagate(False)
+        
+        self.image_canvas = tk.Canvas(image_frame, width=100, height=100, 
+                                      bg=app.card_bg, highlightthickness=0)
+        self.image_canvas.pack()
+        
+        # Información del producto
+        info_frame = tk.Frame(self.frame, bg=app.card_bg)
+        info_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        self.name_label = tk.Label(
+            info_frame,
+            font=app.label_font,
+            bg=app.card_bg,
+            fg=app.fg_color,
+            justify=tk.LEFT
+        )
+        self.name_label.pack(anchor="w", pady=2)
+        
+        # Precio con descuento (sólo visible si hay descuento)
+        price_frame = tk.Frame(info_frame, bg=app.card_bg)
+        price_frame.pack(fill=tk.X, pady=2)
+        
+        self.original_label = tk.Label(
+            price_frame,
+            font=app.copyright_font,
+            bg=app.card_bg,
+            fg="gray"
+        )
+        self.discount_label = tk.Label(
+            price_frame,
+            font=app.copyright_font,
+            bg="red",
+            fg="white",
+            padx=3
+        )
+        
+        # Precio actual
+        self.price_label = tk.Label(
+            info_frame,
+            font=app.button_font,
+            bg=app.card_bg,
+            fg=app.accent_color,
+            anchor="w"
+        )
+        self.price_label.pack(fill=tk.X, pady=2)
+        
+        # Rating y stock
+        details_frame = tk.Frame(info_frame, bg=app.card_bg)
+        details_frame.pack(fill=tk.X, pady=2)
+        
+        self.rating_label = tk.Label(
+            details_frame,
+            font=app.copyright_font,
+            bg=app.card_bg,
+            fg="#FFD700"
+        )
+        self.rating_label.pack(side=tk.LEFT)
+        
+        self.stock_label = tk.Label(
+            details_frame,
+            font=app.copyright_font,
+            bg=app.card_bg
+        )
+        self.stock_label.pack(side=tk.RIGHT)
+        
+        # Botones de acción
+        buttons_frame = tk.Frame(self.frame, bg=app.card_bg)
+        buttons_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        self.fav_button = None
+        if self.is_mobile:
+            # En móvil, solo botón de añadir
+            self.add_button = tk.Button(
+                buttons_frame,
+                font=app.label_font,
+                fg=app.button_text_color,
+                relief=tk.RAISED,
+                borderwidth=1,
+                command=lambda: app.add_to_cart(self.product)
+            )
+            self.add_button.pack(fill=tk.X)
+        else:
+            # En desktop, botones separados
+            view_button = tk.Button(
+                buttons_frame,
+                text="👁️ Ver",
+                font=app.copyright_font,
+                bg=app.card_bg,
+                fg=app.fg_color,
+                relief=tk.GROOVE,
+                borderwidth=1,
+                command=lambda: app.show_product_detail(self.product)
+            )
+            view_button.pack(side=tk.LEFT, padx=2, fill=tk.X, expand=True)
+            
+            # Botón de favoritos (sólo se muestra con sesión iniciada)
+            self.fav_button = tk.Button(
+                buttons_frame,
+                font=app.copyright_font,
+                bg=app.card_bg,
+                relief=tk.GROOVE,
+                borderwidth=1,
+                command=lambda: app.toggle_favorite(self.product)
+            )
+            
+            self.add_button = tk.Button(
+                buttons_frame,
+                font=app.copyright_font,
+                fg=app.button_text_color,
+                relief=tk.RAISED,
+                borderwidth=1,
+                command=lambda: app.add_to_cart(self.product)
+            )
+            self.add_button.pack(side=tk.LEFT, padx=2)
+        
+        # Hacer la tarjeta clickeable; los bindings se crean una sola vez
+        def on_card_click(event):
+            app.show_product_detail(self.product)
+        
+        for widget in [self.frame, self.image_canvas, self.name_label, self.price_label]:
+            widget.bind("<Button-1>", on_card_click)
+            
+            if not self.is_mobile:
+                widget.bind("<Enter>", lambda e: self.frame.configure(bg=app.highlight_color))
+                widget.bind("<Leave>", lambda e: self.frame.configure(bg=app.card_bg))
+
+    def bind_product(self, product: Product, is_fav: bool):
+        """Muestra en la tarjeta los datos de otro producto"""
+        self.product = product
+        app = self.app
+        
+        if product.category != self.category:
+            app.draw_product_image(self.image_canvas, product.category)
+            self.category = product.category
+        
+        self.name_label.config(text=product.name)
+        
+        if product.discount > 0:
+            original_price = product.price / (1 - product.discount)
+            self.original_label.config(text=f"$ {original_price:,.0f}")
+            self.discount_label.config(text=f"-{product.discount*100:.0f}%")
+            self.original_label.pack(side=tk.LEFT)
+            self.discount_label.pack(side=tk.RIGHT)
+        else:
+            self.original_label.pack_forget()
+            self.discount_label.pack_forget()
+        
+        self.price_label.config(text=f"$ {product.price:,.0f} ARS")
+        
+        stars_text = "★" * int(product.rating) + "☆" * (5 - int(product.rating))
+        self.rating_label.config(text=f"{stars_text} ({product.rating})")
+        
+        stock_color = app.accent_color if product.stock > 10 else "#FF9800" if product.stock > 0 else "#F44336"
+        stock_text = f"Stock: {product.stock}" if product.stock > 0 else "Sin stock"
+        self.stock_label.config(text=stock_text, fg=stock_color)
+        
+        in_stock = product.stock > 0
+        if self.is_mobile:
+            add_text = "🛒 Añadir" if in_stock else "Sin stock"
+        else:
+            add_text = "🛒" if in_stock else "❌"
+        self.add_button.config(
+            text=add_text,
+            bg=app.button_color if in_stock else "gray",
+            state=tk.NORMAL if in_stock else tk.DISABLED
+        )
         
-        close_btn = tk.Button(
-            frame,
-            text="✕",
-            font=("Arial", 8),
-            bg=bg_color,
-            fg="white",
-            relief=tk.FLAT,
-            command=lambda: self.close_notification(notification)
+        self.show_favorite(is_fav)
+
+    def show_favorite(self, is_fav: Optional[bool]):
+        """Actualiza sólo el botón de favorito; None lo oculta (sin sesión)"""
+        if self.fav_button is None:
+            return
+        if is_fav is None:
+            self.fav_button.pack_forget()
+            return
+        self.fav_button.config(
+            text="❤️" if is_fav else "🤍",
+            fg="red" if is_fav else self.app.fg_color
+        )
+        if not self.fav_button.winfo_ismapped():
+            self.fav_button.pack(side=tk.LEFT, padx=2, before=self.add_button)
+
+    def place(self, x, y, width, height):
+        self.frame.config(width=width, height=height)
+        self.name_label.config(wraplength=width - 20)
+        self.canvas.coords(self.window_id, x, y)
+        self.canvas.itemconfigure(self.window_id, width=width, height=height, state="normal")
+
+    def hide(self):
+        self.canvas.itemconfigure(self.window_id, state="hidden")
+        self.product = None
+
+    def destroy(self):
+        self.canvas.delete(self.window_id)
+        self.frame.destroy()
+
+class VirtualProductGrid:
+    """Grilla de productos virtualizada sobre un Canvas
+    
+    Sólo existen widgets para las filas visibles (más un margen); al
+    desplazarse, las tarjetas que salen de la vista se reutilizan para las
+    que entran.
+    """
+    BUFFER_ROWS = 2
+    PADDING = 5
+    STATUS_HEIGHT = 60
+
+    def __init__(self, app, canvas, scrollbar, on_near_end=None):
+        self.app = app
+        self.canvas = canvas
+        self.scrollbar = scrollbar
+        self.on_near_end = on_near_end
+        self.products: List[Product] = []
+        self.cards_by_index: Dict[int, ProductCard] = {}
+        self.free_cards: List[ProductCard] = []
+        self.layout = None
+        # (ancho, alto del contenido) con que se configuró el scrollregion
+        self.geometry = None
+        
+        self.status_item = canvas.create_text(
+            0, 0, text="", font=app.label_font, fill=app.fg_color, anchor="n"
         )
-        close_btn.pack(side=tk.RIGHT)
         
-        self.notifications.append(notification)
+        canvas.configure(yscrollcommand=self._on_scroll)
+        canvas.bind("<Configure>", lambda e: self.refresh())
+
+    def _compute_layout(self):
+        columns = 1 if self.app.is_mobile else 2
+        width = self.canvas.winfo_width()
+        if width <= 1:
+            width = self.app.window_width - 40
+        card_width = max(150, (width - self.PADDING * (columns + 1)) // columns)
+        card_height = 280 if self.app.is_mobile else 320
+        return (columns, width, card_width, card_height, self.app.is_mobile)
+
+    def _update_layout(self):
+        layout = self._compute_layout()
+        if self.layout is not None and layout[4] != self.layout[4]:
+            # Cambió el modo móvil/desktop: las tarjetas tienen otra estructura
+            self._destroy_cards()
+        elif layout != self.layout:
+            self._release_all()
+        self.layout = layout
+
+    def _row_height(self):
+        return self.layout[3] + self.PADDING * 2
+
+    def _content_height(self):
+        columns = self.layout[0]
+        rows = (len(self.products) + columns - 1) // columns
+        return rows * self._row_height()
+
+    def _acquire_card(self) -> ProductCard:
+        if self.free_cards:
+            return self.free_cards.pop()
+        return self._bind_scroll(ProductCard(self.app, self.canvas))
+
+    def _bind_scroll(self, card: ProductCard) -> ProductCard:
+        """Las tarjetas tapan el canvas: la rueda del mouse sobre ellas también desplaza"""
+        def scroll(event):
+            if event.num == 4:
+                delta = -1
+            elif event.num == 5:
+                delta = 1
+            else:
+                delta = int(-1 * (event.delta / 120))
+            self.canvas.yview_scroll(delta, "units")
+        
+        def bind_all(widget):
+            widget.bind("<MouseWheel>", scroll, add="+")
+            widget.bind("<Button-4>", scroll, add="+")
+            widget.bind("<Button-5>", scroll, add="+")
+            for child in widget.winfo_children():
+                bind_all(child)
+        
+        bind_all(card.frame)
+        return card
+
+    def _release(self, index: int):
+        card = self.cards_by_index.pop(index)
+        card.hide()
+        self.free_cards.append(card)
+
+    def _release_all(self):
+        for index in list(self.cards_by_index):
+            self._release(index)
+
+    def _destroy_cards(self):
+        self._release_all()
+        for card in self.free_cards:
+            card.destroy()
+        self.free_cards = []
+
+    def _favorite_state(self, product: Product) -> Optional[bool]:
+        user = self.app.current_user
+        if not user:
+            return None
+        return self.app.db.is_favorite(user.id, product.id)
+
+    def set_products(self, products: List[Product]):
+        """Reemplaza todos los productos de la grilla"""
+        self.products = list(products)
+        self._release_all()
+        self.canvas.yview_moveto(0)
+        self.refresh()
+
+    def replace_products(self, products: List[Product]):
+        """Reemplaza los productos volviendo a enlazar sólo las tarjetas que cambiaron
         
-        # Auto-cerrar
-        self.parent.after(duration, lambda: self.close_notification(notification))
+        Las tarjetas visibles que siguen mostrando el mismo producto en la misma
+        posición no se tocan (p. ej. al refinar una búsqueda mientras se escribe).
+        """
+        previous = self.products
+        self.products = list(products)
+        for index, card in list(self.cards_by_index.items()):
+            if index >= len(self.products):
+                self._release(index)
+            elif self.products[index] != previous[index]:
+                product = self.products[index]
+                card.bind_product(product, self._favorite_state(product))
+        self.canvas.yview_moveto(0)
+        self.refresh()
 
-    def close_notification(self, notification):
-        """Cierra una notificación"""
-        if notification in self.notifications:
-            self.notifications.remove(notification)
-            try:
-                notification.destroy()
-            except:
-                pass
-            
-            # Reposicionar notificaciones restantes
-            for i, notif in enumerate(self.notifications):
-                try:
-                    x = self.parent.winfo_x() + self.parent.winfo_width() - 300
-                    y = self.parent.winfo_y() + 80 + i * 70
-                    notif.geometry(f"280x60+{x}+{y}")
-                except:
-                    pass
+    def append_products(self, products: List[Product]):
+        """Agrega productos al final (siguiente página del catálogo)"""
+        self.products.extend(products)
+        self.refresh()
+
+    def set_status(self, text: str = "", color: str = None):
+        """Mensaje debajo de la última fila (cargando, sin resultados, error)"""
+        self.canvas.itemconfigure(
+            self.status_item, text=text, fill=color or self.app.fg_color, font=self.app.label_font
+        )
+        self.refresh()
+
+    def update_product(self, product_id: int, product: Product = None):
+        """Actualiza en el lugar la tarjeta de un producto sin redibujar la grilla"""
+        for index, current in enumerate(self.products):
+            if current.id == product_id:
+                if product is not None:
+                    self.products[index] = product
+                card = self.cards_by_index.get(index)
+                if card is not None:
+                    card.bind_product(self.products[index], self._favorite_state(self.products[index]))
+                return
+
+    def refresh(self):
+        """Recalcula el tamaño del contenido y las tarjetas visibles"""
+        self._update_layout()
+        width = self.layout[1]
+        content_height = self._content_height()
+        
+        # Cada configure redibuja el canvas y vuelve a llamar a yscrollcommand:
+        # sólo se toca si cambió el tamaño, o _on_scroll se dispararía sin fin
+        geometry = (width, content_height)
+        if geometry != self.geometry:
+            self.geometry = geometry
+            self.canvas.coords(self.status_item, width // 2, content_height + 20)
+            self.canvas.configure(scrollregion=(0, 0, width, content_height + self.STATUS_HEIGHT))
+        
+        self._bind_visible()
+
+    def _bind_visible(self):
+        """Enlaza tarjetas sólo a las filas visibles (más el margen)"""
+        columns, width, card_width, card_height, _ = self.layout
+        row_height = self._row_height()
+        top = self.canvas.canvasy(0)
+        view_height = max(self.canvas.winfo_height(), row_height)
+        first_row = max(0, int(top // row_height) - self.BUFFER_ROWS)
+        last_row = int((top + view_height) // row_height) + self.BUFFER_ROWS
+        visible = range(first_row * columns, min(len(self.products), (last_row + 1) * columns))
+        
+        for index in list(self.cards_by_index):
+            if index not in visible:
+                self._release(index)
+        
+        for index in visible:
+            if index in self.cards_by_index:
+                continue
+            product = self.products[index]
+            card = self._acquire_card()
+            card.bind_product(product, self._favorite_state(product))
+            row, column = divmod(index, columns)
+            card.place(
+                self.PADDING + column * (card_width + self.PADDING),
+                row * row_height + self.PADDING,
+                card_width,
+                card_height
+            )
+            self.cards_by_index[index] = card
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if self.layout is None:
+            return
+        self._bind_visible()
+        # Cerca del final se pide la página siguiente del catálogo
+        if float(last) >= 0.9 and self.on_near_end:
+            self.on_near_end()
 
 class ImprovedPetZoneApp:
+    # Pedidos que se cargan por página en la pantalla de pedidos
+    ORDERS_PAGE_SIZE = 20
+    # Productos que se cargan por página en el catálogo
+    CATALOG_PAGE_SIZE = 24
+    # Reseñas que se cargan por página en el detalle de producto
+    REVIEWS_PAGE_SIZE = 5
+    # Espera (ms) tras la última tecla antes de buscar mientras se escribe
+    SEARCH_DEBOUNCE_MS = 250
+    # Ícono de cada tipo de sugerencia del buscador
+    SUGGESTION_ICONS = {'producto': "🐾", 'marca': "🏷️", 'categoria': "📂"}
+    # Facetas del panel de filtros y cuántas marcas se muestran como máximo
+    FACET_LABELS = {'tipo_mascota': "Mascota", 'edad_mascota': "Edad", 'marca': "Marca"}
+    MAX_FACET_VALUES = 8
+
     def __init__(self, root):
         self.root = root
         self.root.title("PetZone - Tienda de Mascotas")
         
-        # Inicializar managers
-        self.db = DatabaseManager()
-        self.db.init_sample_data()
+        # Inicializar managers. El catálogo cambia poco: las lecturas repetidas
+        # al navegar salen de la caché hasta que la app escribe esas tablas.
+        # PETZONE_DB=sqlite usa una base embebida en lugar del servidor MySQL.
+        # La conexión se abre en segundo plano (initialize_database)
+        self.db = DatabaseManager(query_cache_size=256, query_cache_ttl=60,
+                                  backend=create_backend(), eager_connect=False)
+        self.async_db = AsyncDatabase(root, self.db)
         self.notifications = NotificationManager(root)
         
         # Usuario actual
@@ -515,15 +3696,18 @@ class ImprovedPetZoneApp:
         # Carrito de compras
         self.cart_items = []
         
-        # Categorías
-        self.categories = self.db.get_categories()
+        # Categorías: se completan cuando la base está lista
+        self.categories = ["Todos"]
         self.selected_category = "Todos"
+        # Valores marcados por faceta, p. ej. {'tipo_mascota': {'gato'}}
+        self.facet_filters: Dict[str, set] = {}
+        self.facets_visible = False
         
         # Crear frames
         self.setup_frames()
         
-        # Inicializar pantallas
-        self.setup_all_screens()
+        # Las pantallas se construyen la primera vez que se muestran
+        self.setup_screen_builders()
         
         # Configurar eventos
         self.root.bind('<Configure>', self.on_window_resize)
@@ -531,9 +3715,43 @@ class ImprovedPetZoneApp:
         # Mostrar pantalla de bienvenida
         self.show_frame_with_animation(self.welcome_frame)
         
+        # Conectar y preparar la base mientras se ve la bienvenida
+        self.initialize_database()
+        
         # Configurar cierre de aplicación
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def initialize_database(self):
+        """Conecta, carga los datos de ejemplo y las categorías en segundo plano"""
+        db = self.db
+        
+        def initialize():
+            db.check_connection()
+            db.ensure_schema()
+            db.init_sample_data()
+            return db.get_categories()
+        
+        self.async_db.submit(
+            initialize,
+            key="db-init",
+            on_success=self.on_database_ready,
+            on_error=lambda e: messagebox.showerror(
+                "Error de Base de Datos", f"No se pudo conectar a la base de datos: {e}"
+            )
+        )
+
+    def on_database_ready(self, categories: List[str]):
+        """Completa la pantalla principal con lo cargado por initialize_database"""
+        print(f"Conexión a {self.db.backend.name} establecida")
+        self.categories = categories
+        # Las sugerencias del buscador se cargan una vez, fuera del hilo de Tk
+        self.async_db.submit(self.db.autocomplete.build)
+        
+        if self.is_screen_built(self.home_frame):
+            self.render_categories()
+            # Si el catálogo se pidió antes de cargar los datos de ejemplo
+            self.display_products(getattr(self, 'catalog_search', None))
+
     def setup_form_variables(self):
         """Configura variables para formularios"""
         self.username_var = tk.StringVar()
@@ -543,6 +3761,8 @@ class ImprovedPetZoneApp:
         self.new_password_var = tk.StringVar()
         self.confirm_password_var = tk.StringVar()
         self.search_var = tk.StringVar()
+        self.search_after_id = None
+        self.search_var.trace_add("write", self.on_search_changed)
         self.shipping_address_var = tk.StringVar()
 
     def setup_responsive_window(self):
@@ -614,18 +3834,39 @@ class ImprovedPetZoneApp:
         self.orders_frame = tk.Frame(self.root)
         self.settings_frame = tk.Frame(self.root)
 
-    def setup_all_screens(self):
-        """Inicializa todas las pantallas"""
-        self.setup_welcome_screen()
-        self.setup_login_screen()
-        self.setup_register_screen()
-        self.setup_home_screen()
-        self.setup_cart_screen()
-        self.setup_product_detail_screen()
-        self.setup_profile_screen()
-        self.setup_favorites_screen()
-        self.setup_orders_screen()
-        self.setup_settings_screen()
+    def setup_screen_builders(self):
+        """Asocia cada frame con la función que construye su pantalla"""
+        self.screen_builders = {
+            self.welcome_frame: self.setup_welcome_screen,
+            self.login_frame: self.setup_login_screen,
+            self.register_frame: self.setup_register_screen,
+            self.home_frame: self.setup_home_screen,
+            self.cart_frame: self.setup_cart_screen,
+            self.product_detail_frame: self.setup_product_detail_screen,
+            self.profile_frame: self.setup_profile_screen,
+            self.favorites_frame: self.setup_favorites_screen,
+            self.orders_frame: self.setup_orders_screen,
+            self.settings_frame: self.setup_settings_screen,
+        }
+        # Pantallas cuyo contenido depende del usuario: se reconstruyen si
+        # cambió desde la última vez que se mostraron
+        self.user_screens = {self.home_frame, self.profile_frame, self.favorites_frame, self.orders_frame}
+        # frame -> id del usuario con el que se construyó
+        self.built_screens = {}
+
+    def is_screen_built(self, frame) -> bool:
+        return frame in self.built_screens
+
+    def ensure_screen(self, frame):
+        """Construye la pantalla del frame si todavía no existe (o si cambió el usuario)"""
+        user_id = self.current_user.id if self.current_user else None
+        if frame in self.built_screens:
+            if frame not in self.user_screens or self.built_screens[frame] == user_id:
+                return
+            for widget in frame.winfo_children():
+                widget.destroy()
+        self.built_screens[frame] = user_id
+        self.screen_builders[frame]()
 
     def on_window_resize(self, event):
         """Maneja el redimensionamiento de la ventana"""
@@ -642,13 +3883,16 @@ class ImprovedPetZoneApp:
     def on_closing(self):
         """Maneja el cierre de la aplicación"""
         if messagebox.askokcancel("Salir", "¿Está seguro que desea salir?"):
+            self.async_db.shutdown()
+            self.db.close()
             self.root.destroy()
 
     def show_frame_with_animation(self, frame):
         """Muestra un frame con animación suave"""
         if self.animation_in_progress:
             return
-            
+        
+        self.ensure_screen(frame)
         self.animation_in_progress = True
         frame.configure(bg=self.bg_color)
         self.update_frame_colors(frame)
@@ -1033,9 +4277,27 @@ class ImprovedPetZoneApp:
             )
             return
         
-        # Autenticar usuario
-        user = self.db.authenticate_user(email, password)
-        
+        db = self.db
+        
+        def authenticate():
+            user = db.authenticate_user(email, password)
+            if user:
+                # Los favoritos se cargan una sola vez por sesión
+                db.load_favorite_ids(user.id)
+            return user
+        
+        # Autenticar usuario en segundo plano
+        self.async_db.submit(
+            authenticate,
+            key="login",
+            on_success=self.on_login_result,
+            on_error=lambda e: self.notifications.show_notification(
+                "No se pudo conectar con el servidor", "error"
+            )
+        )
+
+    def on_login_result(self, user: Optional[User]):
+        """Completa el login con el resultado de la autenticación"""
         if user:
             self.current_user = user
             self.notifications.show_notification(
@@ -1243,8 +4505,19 @@ class ImprovedPetZoneApp:
             )
             return
         
-        # Crear usuario
-        if self.db.create_user(username, email, password):
+        # Crear usuario en segundo plano
+        self.async_db.submit(
+            "create_user", username, email, password,
+            key="register",
+            on_success=lambda created: self.on_register_result(created, username),
+            on_error=lambda e: self.notifications.show_notification(
+                "No se pudo conectar con el servidor", "error"
+            )
+        )
+
+    def on_register_result(self, created: bool, username: str):
+        """Completa el registro con el resultado de la base de datos"""
+        if created:
             self.notifications.show_notification(
                 f"Usuario {username} registrado correctamente", "success"
             )
@@ -1285,19 +4558,18 @@ class ImprovedPetZoneApp:
         products_main_frame = tk.Frame(content, bg=self.bg_color)
         products_main_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
-        # Canvas y scrollbar para productos
+        # Canvas y scrollbar para productos; la grilla virtualizada sólo crea
+        # tarjetas para las filas visibles
         self.products_canvas = tk.Canvas(products_main_frame, bg=self.bg_color, highlightthickness=0)
         products_scrollbar = ttk.Scrollbar(products_main_frame, orient=tk.VERTICAL, command=self.products_canvas.yview)
-        self.products_container = tk.Frame(self.products_canvas, bg=self.bg_color)
 
-        self.products_container.bind(
-            "<Configure>",
-            lambda e: self.products_canvas.configure(scrollregion=self.products_canvas.bbox("all"))
+        self.product_grid = VirtualProductGrid(
+            self,
+            self.products_canvas,
+            products_scrollbar,
+            on_near_end=self.load_next_products_page
         )
 
-        self.products_canvas.create_window((0, 0), window=self.products_container, anchor="nw")
-        self.products_canvas.configure(yscrollcommand=products_scrollbar.set)
-
         # Configurar scroll con rueda del mouse
         def _on_mousewheel(event):
             self.products_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
@@ -1308,9 +4580,6 @@ class ImprovedPetZoneApp:
         products_scrollbar.pack(side="right", fill="y")
         
         self.display_products()
-        # Configurar scroll after showing products
-        self.products_container.update_idletasks()
-        self.products_canvas.configure(scrollregion=self.products_canvas.bbox("all"))
         self.create_responsive_footer(self.home_frame)
 
     def setup_header_buttons(self, header):
@@ -1385,6 +4654,7 @@ class ImprovedPetZoneApp:
     def logout(self):
         """Cierra la sesión del usuario"""
         if messagebox.askyesno("Cerrar Sesión", "¿Está seguro que desea cerrar sesión?"):
+            self.db.forget_favorites(self.current_user.id)
             self.current_user = None
             self.cart_items = []
             self.notifications.show_notification("Sesión cerrada", "info")
@@ -1416,6 +4686,28 @@ class ImprovedPetZoneApp:
         )
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, pady=5)
         self.search_entry.bind('<Return>', lambda e: self.search_products())
+        self.search_entry.bind('<Down>', self.focus_suggestions)
+        self.search_entry.bind('<Escape>', lambda e: self.hide_suggestions())
+        self.search_entry.bind('<FocusOut>', lambda e: self.root.after(150, self.hide_suggestions_if_unfocused))
+        
+        # Lista de sugerencias, superpuesta debajo de la barra
+        self.search_frame = search_frame
+        self.suggestions_listbox = tk.Listbox(
+            parent,
+            font=self.label_font,
+            bg=self.card_bg,
+            fg=self.fg_color,
+            selectbackground=self.highlight_color,
+            activestyle="none",
+            relief=tk.SOLID,
+            bd=1,
+            height=0
+        )
+        self.suggestions_listbox.bind('<ButtonRelease-1>', lambda e: self.choose_suggestion())
+        self.suggestions_listbox.bind('<Return>', lambda e: self.choose_suggestion())
+        self.suggestions_listbox.bind('<Escape>', lambda e: self.hide_suggestions(focus_entry=True))
+        self.suggestions_listbox.bind('<FocusOut>', lambda e: self.root.after(150, self.hide_suggestions_if_unfocused))
+        self.current_suggestions = []
         
         search_button = tk.Button(
             search_frame,
@@ -1427,6 +4719,17 @@ class ImprovedPetZoneApp:
             command=self.search_products
         )
         search_button.pack(side=tk.RIGHT, padx=10, pady=5)
+        
+        # "¿Quisiste decir...?": visible sólo si la búsqueda tenía errores de tipeo
+        self.correction_label = tk.Label(
+            parent,
+            font=self.copyright_font,
+            bg=self.bg_color,
+            fg=self.accent_color,
+            cursor="hand2"
+        )
+        self.correction_label.bind('<Button-1>', lambda e: self.apply_search_correction())
+        self.search_correction = None
 
     def setup_filters(self, parent):
         """Configura los filtros de productos"""
@@ -1446,7 +4749,7 @@ class ImprovedPetZoneApp:
         if self.is_mobile:
             # Combobox para móvil
             self.category_var = tk.StringVar(value=self.selected_category)
-            category_combo = ttk.Combobox(
+            self.category_combo = category_combo = ttk.Combobox(
                 filters_frame,
                 textvariable=self.category_var,
                 values=self.categories,
@@ -1459,24 +4762,29 @@ class ImprovedPetZoneApp:
                                lambda e: self.filter_by_category(self.category_var.get()))
         else:
             # Botones para desktop
-            categories_frame = tk.Frame(filters_frame, bg=self.bg_color)
-            categories_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
-            
-            for category in self.categories:
-                is_selected = category == self.selected_category
-                category_button = tk.Button(
-                    categories_frame,
-                    text=category,
-                    font=self.copyright_font,
-                    bg=self.button_color if is_selected else self.card_bg,
-                    fg=self.button_text_color if is_selected else self.fg_color,
-                    relief=tk.RAISED if is_selected else tk.GROOVE,
-                    borderwidth=1,
-                    padx=8,
-                    pady=3,
-                    command=lambda c=category: self.filter_by_category(c)
-                )
-                category_button.pack(side=tk.LEFT, padx=2)
+            self.category_combo = None
+            self.categories_frame = tk.Frame(filters_frame, bg=self.bg_color)
+            self.categories_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+            self.render_categories()
+        
+        # Panel de facetas (mascota, edad, marca y precio), con conteos
+        facets_button = tk.Button(
+            filters_frame,
+            text="⚙️ Filtros",
+            font=self.copyright_font,
+            bg=self.card_bg,
+            fg=self.fg_color,
+            relief=tk.GROOVE,
+            borderwidth=1,
+            command=self.toggle_facets_panel
+        )
+        facets_button.pack(side=tk.RIGHT, padx=5)
+        
+        self.filters_frame = filters_frame
+        self.facets_frame = tk.Frame(parent, bg=self.bg_color)
+        if self.facets_visible:
+            self.facets_frame.pack(fill=tk.X, after=filters_frame)
+            self.refresh_facet_counts()
 
     def setup_promotional_banner(self, parent):
         """Configura el banner promocional"""
@@ -1505,215 +4813,105 @@ class ImprovedPetZoneApp:
         
         animate_banner_text()
 
-    def display_products(self, search_term=None):
-        """Muestra productos de forma mejorada"""
-        for widget in self.products_container.winfo_children():
-            widget.destroy()
-        
-        # Obtener productos de la base de datos
-        products = self.db.get_products(
-            category=self.selected_category if self.selected_category != "Todos" else None,
-            search=search_term
+    def create_loading_placeholder(self, parent, text="⏳ Cargando..."):
+        """Muestra un indicador de carga mientras se espera a la base de datos"""
+        loading_label = tk.Label(
+            parent,
+            text=text,
+            font=self.label_font,
+            bg=self.bg_color,
+            fg=self.fg_color
         )
+        loading_label.pack(pady=30)
+        return loading_label
+
+    def clear_container(self, container):
+        """Elimina todos los widgets de un contenedor"""
+        for widget in container.winfo_children():
+            widget.destroy()
+
+    @query_budget(3)
+    def display_products(self, search_term=None, keep_results=False):
+        """Muestra productos de forma mejorada
         
-        if not products:
-            no_products_label = tk.Label(
-                self.products_container,
-                text="No se encontraron productos",
-                font=self.label_font,
-                bg=self.bg_color,
-                fg=self.fg_color
-            )
-            no_products_label.pack(pady=30)
+        Con keep_results la grilla conserva los resultados actuales hasta que
+        llega la primera página nueva (búsqueda mientras se escribe).
+        """
+        # Estado de la paginación del catálogo
+        self.catalog_search = search_term
+        self.catalog_cursor = None
+        self.catalog_exhausted = False
+        # Una página que falló no se vuelve a pedir sola al desplazarse; se
+        # reintenta con la próxima búsqueda o cambio de categoría
+        self.catalog_failed = False
+        if not keep_results:
+            self.product_grid.set_products([])
+        
+        # Un pedido nuevo con la misma clave descarta la carga anterior, p. ej.
+        # si el usuario cambia de categoría antes de que termine
+        self.async_db.cancel("products")
+        self.load_next_products_page()
+        self.refresh_facet_counts()
+
+    def load_next_products_page(self):
+        """Pide a la base de datos la siguiente página del catálogo"""
+        if not hasattr(self, 'catalog_cursor'):
+            return
+        if self.catalog_exhausted or self.catalog_failed or self.async_db.is_pending("products"):
             return
         
-        # Crear grid responsive
-        columns = 1 if self.is_mobile else 2
-        row_frame = None
+        text = "⏳ Cargando productos..." if self.catalog_cursor is None else "⏳ Cargando más..."
+        self.product_grid.set_status(text)
         
-        for i, product in enumerate(products):
-            if i % columns == 0:
-                row_frame = tk.Frame(self.products_container, bg=self.bg_color)
-                row_frame.pack(fill=tk.X, pady=5)
-            
-            self.create_product_card(row_frame, product, columns)
+        # Obtener productos de la base de datos sin bloquear la interfaz
+        self.async_db.submit(
+            "get_products",
+            category=self.selected_category if self.selected_category != "Todos" else None,
+            search=self.catalog_search,
+            limit=self.CATALOG_PAGE_SIZE,
+            after=self.catalog_cursor,
+            filters=self.active_facet_filters(),
+            key="products",
+            on_success=self.append_products_page,
+            on_error=self.products_page_failed
+        )
 
-    def create_product_card(self, parent, product: Product, columns):
-        """Crea una tarjeta de producto mejorada"""
-        card_width = (self.window_width - 40) if columns == 1 else (self.window_width - 60) // 2
-        card_height = 280 if self.is_mobile else 320
-        
-        product_card = tk.Frame(parent, bg=self.card_bg, bd=2, relief=tk.SOLID, 
-                               width=card_width, height=card_height)
-        product_card.pack(side=tk.LEFT, padx=5, pady=5, fill=tk.BOTH, expand=True)
-        product_card.pack_propagate(False)
-        
-        # Imagen del producto (placeholder mejorado)
-        image_frame = tk.Frame(product_card, bg=self.card_bg, height=120)
-        image_frame.pack(fill=tk.X, pady=10)
-        image_frame.pack_propagate(False)
-        
-        # Crear imagen placeholder más atractiva
-        image_canvas = tk.Canvas(image_frame, width=100, height=100, 
-                               bg=self.card_bg, highlightthickness=0)
-        image_canvas.pack()
-        
-        # Dibujar imagen según categoría
-        self.draw_product_image(image_canvas, product.category)
-        
-        # Información del producto
-        info_frame = tk.Frame(product_card, bg=self.card_bg)
-        info_frame.pack(fill=tk.BOTH, expand=True, padx=10)
-        
-        # Nombre del producto
-        name_label = tk.Label(
-            info_frame,
-            text=product.name,
+    def products_page_failed(self, error):
+        """Marca la carga como fallida para que el desplazamiento no la repita"""
+        print(f"Error al cargar productos: {error}")
+        self.catalog_failed = True
+        self.product_grid.set_status("No se pudieron cargar los productos", "#F44336")
+
+    def show_load_error(self, container, what):
+        """Reemplaza el indicador de carga por un mensaje de error"""
+        self.clear_container(container)
+        error_label = tk.Label(
+            container,
+            text=f"No se pudieron cargar los {what}",
             font=self.label_font,
-            bg=self.card_bg,
-            fg=self.fg_color,
-            wraplength=card_width - 20,
-            justify=tk.LEFT
-        )
-        name_label.pack(anchor="w", pady=2)
-        
-        # Precio con descuento
-        price_frame = tk.Frame(info_frame, bg=self.card_bg)
-        price_frame.pack(fill=tk.X, pady=2)
-        
-        if product.discount > 0:
-            original_price = product.price / (1 - product.discount)
-            
-            # Precio original tachado
-            original_label = tk.Label(
-                price_frame,
-                text=f"$ {original_price:,.0f}",
-                font=self.copyright_font,
-                bg=self.card_bg,
-                fg="gray"
-            )
-            original_label.pack(side=tk.LEFT)
-            
-            # Descuento
-            discount_label = tk.Label(
-                price_frame,
-                text=f"-{product.discount*100:.0f}%",
-                font=self.copyright_font,
-                bg="red",
-                fg="white",
-                padx=3
-            )
-            discount_label.pack(side=tk.RIGHT)
-        
-        # Precio actual
-        price_label = tk.Label(
-            info_frame,
-            text=f"$ {product.price:,.0f} ARS",
-            font=self.button_font,
-            bg=self.card_bg,
-            fg=self.accent_color,
-            anchor="w"
-        )
-        price_label.pack(fill=tk.X, pady=2)
-        
-        # Rating y stock
-        details_frame = tk.Frame(info_frame, bg=self.card_bg)
-        details_frame.pack(fill=tk.X, pady=2)
-        
-        # Estrellas
-        stars_text = "★" * int(product.rating) + "☆" * (5 - int(product.rating))
-        rating_label = tk.Label(
-            details_frame,
-            text=f"{stars_text} ({product.rating})",
-            font=self.copyright_font,
-            bg=self.card_bg,
-            fg="#FFD700"
-        )
-        rating_label.pack(side=tk.LEFT)
-        
-        # Stock
-        stock_color = self.accent_color if product.stock > 10 else "#FF9800" if product.stock > 0 else "#F44336"
-        stock_text = f"Stock: {product.stock}" if product.stock > 0 else "Sin stock"
-        
-        stock_label = tk.Label(
-            details_frame,
-            text=stock_text,
-            font=self.copyright_font,
-            bg=self.card_bg,
-            fg=stock_color
+            bg=self.bg_color,
+            fg="#F44336"
         )
-        stock_label.pack(side=tk.RIGHT)
-        
-        # Botones de acción
-        buttons_frame = tk.Frame(product_card, bg=self.card_bg)
-        buttons_frame.pack(fill=tk.X, padx=10, pady=10)
-        
-        if self.is_mobile:
-            # En móvil, solo botón de añadir
-            add_button = tk.Button(
-                buttons_frame,
-                text="🛒 Añadir" if product.stock > 0 else "Sin stock",
-                font=self.label_font,
-                bg=self.button_color if product.stock > 0 else "gray",
-                fg=self.button_text_color,
-                relief=tk.RAISED,
-                borderwidth=1,
-                state=tk.NORMAL if product.stock > 0 else tk.DISABLED,
-                command=lambda p=product: self.add_to_cart(p)
-            )
-            add_button.pack(fill=tk.X)
+        error_label.pack(pady=30)
+
+    def append_products_page(self, products: List[Product]):
+        """Agrega a la grilla una página de productos ya obtenidos"""
+        self.catalog_exhausted = len(products) < self.CATALOG_PAGE_SIZE
+        
+        if self.catalog_cursor is None:
+            self.show_search_correction()
+            # Primera página: sólo se redibujan las tarjetas que cambiaron
+            self.product_grid.replace_products(products)
+            if not products:
+                self.product_grid.set_status("No se encontraron productos")
+                return
         else:
-            # En desktop, botones separados
-            view_button = tk.Button(
-                buttons_frame,
-                text="👁️ Ver",
-                font=self.copyright_font,
-                bg=self.card_bg,
-                fg=self.fg_color,
-                relief=tk.GROOVE,
-                borderwidth=1,
-                command=lambda p=product: self.show_product_detail(p)
-            )
-            view_button.pack(side=tk.LEFT, padx=2, fill=tk.X, expand=True)
-            
-            # Botón de favoritos
-            if self.current_user:
-                is_fav = self.db.is_favorite(self.current_user.id, product.id)
-                fav_button = tk.Button(
-                    buttons_frame,
-                    text="❤️" if is_fav else "🤍",
-                    font=self.copyright_font,
-                    bg=self.card_bg,
-                    fg="red" if is_fav else self.fg_color,
-                    relief=tk.GROOVE,
-                    borderwidth=1,
-                    command=lambda p=product: self.toggle_favorite(p)
-                )
-                fav_button.pack(side=tk.LEFT, padx=2)
-            
-            add_button = tk.Button(
-                buttons_frame,
-                text="🛒" if product.stock > 0 else "❌",
-                font=self.copyright_font,
-                bg=self.button_color if product.stock > 0 else "gray",
-                fg=self.button_text_color,
-                relief=tk.RAISED,
-                borderwidth=1,
-                state=tk.NORMAL if product.stock > 0 else tk.DISABLED,
-                command=lambda p=product: self.add_to_cart(p)
-            )
-            add_button.pack(side=tk.LEFT, padx=2)
+            self.product_grid.append_products(products)
         
-        # Hacer la tarjeta clickeable
-        def on_card_click(event):
-            self.show_product_detail(product)
+        self.product_grid.set_status("")
         
-        for widget in [product_card, image_canvas, name_label, price_label]:
-            widget.bind("<Button-1>", on_card_click)
-            
-            if not self.is_mobile:
-                widget.bind("<Enter>", lambda e, card=product_card: card.configure(bg=self.highlight_color))
-                widget.bind("<Leave>", lambda e, card=product_card: card.configure(bg=self.card_bg))
+        if products:
+            self.catalog_cursor = (products[-1].name, products[-1].id)
 
     def draw_product_image(self, canvas, category):
         """Dibuja una imagen representativa según la categoría"""
@@ -1747,14 +4945,153 @@ class ImprovedPetZoneApp:
         icon = icons.get(category, "🐾")
         canvas.create_text(50, 50, text=icon, font=("Arial", 20), fill="white")
 
+    def render_categories(self):
+        """Vuelca self.categories en el combobox (móvil) o en los botones (desktop)"""
+        if self.category_combo is not None:
+            self.category_combo.config(values=self.categories)
+            return
+        
+        for widget in self.categories_frame.winfo_children():
+            widget.destroy()
+        
+        for category in self.categories:
+            is_selected = category == self.selected_category
+            category_button = tk.Button(
+                self.categories_frame,
+                text=category,
+                font=self.copyright_font,
+                bg=self.button_color if is_selected else self.card_bg,
+                fg=self.button_text_color if is_selected else self.fg_color,
+                relief=tk.RAISED if is_selected else tk.GROOVE,
+                borderwidth=1,
+                padx=8,
+                pady=3,
+                command=lambda c=category: self.filter_by_category(c)
+            )
+            category_button.pack(side=tk.LEFT, padx=2)
+
     def filter_by_category(self, category):
         """Filtra productos por categoría"""
         self.selected_category = category
-        self.display_products()
+        self.display_products(getattr(self, 'catalog_search', None))
         self.notifications.show_notification(f"Mostrando: {category}", "info")
 
+    def active_facet_filters(self) -> Dict[str, set]:
+        """Copia de los filtros de facetas con algún valor marcado"""
+        return {facet: set(values) for facet, values in self.facet_filters.items() if values}
+
+    def toggle_facets_panel(self):
+        """Muestra u oculta el panel de facetas"""
+        self.facets_visible = not self.facets_visible
+        if self.facets_visible:
+            self.facets_frame.pack(fill=tk.X, after=self.filters_frame)
+            self.refresh_facet_counts()
+        else:
+            self.facets_frame.pack_forget()
+
+    def toggle_facet(self, facet, value):
+        """Marca o desmarca un valor de faceta y vuelve a cargar el catálogo"""
+        values = self.facet_filters.setdefault(facet, set())
+        if value in values:
+            values.discard(value)
+        else:
+            values.add(value)
+        self.display_products(getattr(self, 'catalog_search', None))
+
+    def clear_facets(self):
+        self.facet_filters = {}
+        self.display_products(getattr(self, 'catalog_search', None))
+
+    def refresh_facet_counts(self):
+        """Pide los conteos de facetas para la selección actual (sólo con el panel abierto)"""
+        if not self.facets_visible or not hasattr(self, 'facets_frame'):
+            return
+        self.async_db.submit(
+            "get_facet_counts",
+            category=self.selected_category if self.selected_category != "Todos" else None,
+            search=getattr(self, 'catalog_search', None),
+            filters=self.active_facet_filters(),
+            key="facets",
+            on_success=self.render_facet_counts
+        )
+
+    def render_facet_counts(self, counts: Dict[str, Dict[str, int]]):
+        """Dibuja el panel de facetas con los conteos recibidos"""
+        if not self.facets_frame.winfo_exists():
+            return
+        self.clear_container(self.facets_frame)
+        
+        for facet, title in self.FACET_LABELS.items():
+            selected = self.facet_filters.get(facet, set())
+            values = sorted(counts.get(facet, {}).items(), key=lambda item: (-item[1], item[0]))
+            # Se muestran los valores más frecuentes y siempre los ya marcados
+            shown = [item for item in values if item[0] in selected]
+            shown += [item for item in values if item[0] not in selected][:self.MAX_FACET_VALUES - len(shown)]
+            if not shown:
+                continue
+            
+            row = tk.Frame(self.facets_frame, bg=self.bg_color)
+            row.pack(fill=tk.X, pady=2)
+            tk.Label(
+                row, text=f"{title}:", font=self.copyright_font, bg=self.bg_color, fg=self.fg_color, width=8, anchor="w"
+            ).pack(side=tk.LEFT, padx=5)
+            
+            for value, count in shown:
+                is_selected = value in selected
+                tk.Button(
+                    row,
+                    text=f"{str(value).capitalize()} ({count})",
+                    font=self.copyright_font,
+                    bg=self.button_color if is_selected else self.card_bg,
+                    fg=self.button_text_color if is_selected else self.fg_color,
+                    relief=tk.RAISED if is_selected else tk.GROOVE,
+                    borderwidth=1,
+                    state=tk.NORMAL if count or is_selected else tk.DISABLED,
+                    command=lambda f=facet, v=value: self.toggle_facet(f, v)
+                ).pack(side=tk.LEFT, padx=2)
+        
+        self.draw_price_histogram(counts.get('precio', {}))
+        
+        if self.active_facet_filters():
+            tk.Button(
+                self.facets_frame,
+                text="✖ Limpiar filtros",
+                font=self.copyright_font,
+                bg=self.card_bg,
+                fg=self.fg_color,
+                relief=tk.GROOVE,
+                borderwidth=1,
+                command=self.clear_facets
+            ).pack(anchor="e", padx=5, pady=2)
+
+    def draw_price_histogram(self, price_counts: Dict[str, int]):
+        """Histograma de rangos de precio; cada barra se puede marcar como filtro"""
+        buckets = FacetIndex.PRICE_BUCKETS
+        selected = self.facet_filters.get('precio', set())
+        width = max(self.facets_frame.winfo_width(), self.window_width - 40)
+        height = 70
+        canvas = tk.Canvas(self.facets_frame, height=height, bg=self.bg_color, highlightthickness=0)
+        canvas.pack(fill=tk.X, padx=5, pady=4)
+        
+        bar_width = width / len(buckets)
+        max_count = max(price_counts.values(), default=0) or 1
+        for index, (key, low, high) in enumerate(buckets):
+            count = price_counts.get(key, 0)
+            x0 = index * bar_width + 6
+            x1 = (index + 1) * bar_width - 6
+            bar_height = (height - 30) * count / max_count
+            color = self.button_color if key in selected else self.accent_color
+            bar = canvas.create_rectangle(x0, height - 20 - bar_height, x1, height - 20, fill=color, outline="")
+            label = f"$ {low/1000:,.0f}k-{high/1000:,.0f}k" if high else f"+$ {low/1000:,.0f}k"
+            text = canvas.create_text(
+                (x0 + x1) / 2, height - 10, text=f"{label} ({count})", font=self.copyright_font, fill=self.fg_color
+            )
+            for item in (bar, text):
+                canvas.tag_bind(item, "<Button-1>", lambda e, k=key: self.toggle_facet('precio', k))
+
     def search_products(self):
         """Busca productos por término"""
+        self.cancel_pending_search()
         search_term = self.search_var.get().strip().lower()
         if not search_term:
             self.notifications.show_notification("Ingrese un término de búsqueda", "warning")
@@ -1763,6 +5100,110 @@ class ImprovedPetZoneApp:
         self.display_products(search_term)
         self.notifications.show_notification(f"Buscando: {search_term}", "info")
 
+    def on_search_changed(self, *args):
+        """Reprograma la búsqueda en vivo: sólo se busca cuando se deja de escribir"""
+        # Las sugerencias salen del trie en memoria: se actualizan en cada tecla
+        self.update_suggestions()
+        self.cancel_pending_search()
+        self.search_after_id = self.root.after(self.SEARCH_DEBOUNCE_MS, self.run_live_search)
+
+    def cancel_pending_search(self):
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+
+    def update_suggestions(self):
+        """Muestra debajo del buscador las sugerencias para lo escrito"""
+        if not hasattr(self, 'suggestions_listbox') or not self.suggestions_listbox.winfo_exists():
+            return
+        if self.root.focus_get() is not self.search_entry:
+            # El texto cambió por código (p. ej. al elegir una sugerencia)
+            self.hide_suggestions()
+            return
+        
+        suggestions = self.db.autocomplete.suggest(self.search_var.get())
+        if not suggestions:
+            self.hide_suggestions()
+            return
+        
+        self.current_suggestions = suggestions
+        self.suggestions_listbox.delete(0, tk.END)
+        for text, kind in suggestions:
+            self.suggestions_listbox.insert(tk.END, f"{self.SUGGESTION_ICONS.get(kind, '')} {text}")
+        self.suggestions_listbox.configure(height=len(suggestions))
+        self.suggestions_listbox.place(in_=self.search_frame, x=0, rely=1.0, relwidth=1.0)
+        self.suggestions_listbox.lift()
+
+    def hide_suggestions(self, focus_entry=False):
+        if hasattr(self, 'suggestions_listbox') and self.suggestions_listbox.winfo_exists():
+            self.suggestions_listbox.place_forget()
+        self.current_suggestions = []
+        if focus_entry:
+            self.search_entry.focus_set()
+
+    def hide_suggestions_if_unfocused(self):
+        if not hasattr(self, 'suggestions_listbox') or not self.suggestions_listbox.winfo_exists():
+            return
+        if self.root.focus_get() not in (self.search_entry, self.suggestions_listbox):
+            self.hide_suggestions()
+
+    def focus_suggestions(self, event=None):
+        """Flecha abajo en el buscador: pasa a la lista de sugerencias"""
+        if not self.current_suggestions:
+            return
+        self.suggestions_listbox.focus_set()
+        self.suggestions_listbox.selection_clear(0, tk.END)
+        self.suggestions_listbox.selection_set(0)
+        self.suggestions_listbox.activate(0)
+        return "break"
+
+    def choose_suggestion(self):
+        """Usa la sugerencia elegida como término de búsqueda"""
+        selection = self.suggestions_listbox.curselection()
+        if not selection or selection[0] >= len(self.current_suggestions):
+            return
+        text, _ = self.current_suggestions[selection[0]]
+        self.search_var.set(text)
+        self.hide_suggestions(focus_entry=True)
+        self.search_entry.icursor(tk.END)
+        self.search_products()
+
+    def show_search_correction(self):
+        """Muestra u oculta el "¿Quisiste decir...?" de la búsqueda actual"""
+        if not hasattr(self, 'correction_label') or not self.correction_label.winfo_exists():
+            return
+        correction = self.db.suggest_search_correction(self.catalog_search) if self.catalog_search else None
+        self.search_correction = correction
+        if correction:
+            self.correction_label.config(text=f"¿Quisiste decir «{correction}»?")
+            self.correction_label.pack(after=self.search_frame, anchor="w", padx=12)
+        else:
+            self.correction_label.pack_forget()
+
+    def apply_search_correction(self):
+        """Busca con el texto corregido"""
+        if not self.search_correction:
+            return
+        self.search_var.set(self.search_correction)
+        self.hide_suggestions()
+        self.search_products()
+
+    def run_live_search(self):
+        """Busca con el texto actual del buscador sin limpiar la grilla"""
+        self.search_after_id = None
+        if not hasattr(self, 'product_grid'):
+            return
+        
+        # Se conserva un espacio final: indica que la última palabra está completa
+        text = self.search_var.get().lstrip().lower()
+        search_term = text if text.strip() else None
+        if search_term == getattr(self, 'catalog_search', None):
+            return
+        
+        # display_products cancela la carga anterior (clave "products") y el
+        # resultado de una consulta ya en curso se descarta al llegar
+        self.display_products(search_term, keep_results=True)
+
     def add_to_cart(self, product: Product):
         """Añade producto al carrito con validaciones"""
         if product.stock <= 0:
@@ -1788,7 +5229,8 @@ class ImprovedPetZoneApp:
         self.cart_count_label.config(text=str(total_items))
         
         self.notifications.show_notification(f"{product.name} añadido al carrito", "success")
-        if hasattr(self, 'update_cart_display'):
+        # Si el carrito aún no se construyó, se dibuja completo al abrirlo
+        if self.is_screen_built(self.cart_frame):
             self.update_cart_display()
 
     def toggle_favorite(self, product: Product):
@@ -1797,24 +5239,42 @@ class ImprovedPetZoneApp:
             self.notifications.show_notification("Debe iniciar sesión", "warning")
             return
         
-        is_fav = self.db.is_favorite(self.current_user.id, product.id)
+        db = self.db
+        user_id = self.current_user.id
         
-        if is_fav:
-            if self.db.remove_from_favorites(self.current_user.id, product.id):
-                self.notifications.show_notification("Eliminado de favoritos", "info")
-            else:
-                self.notifications.show_notification("Error al eliminar favorito", "error")
-        else:
-            if self.db.add_to_favorites(self.current_user.id, product.id):
-                self.notifications.show_notification("Añadido a favoritos", "success")
-            else:
-                self.notifications.show_notification("Error al añadir favorito", "error")
+        def work():
+            if db.is_favorite(user_id, product.id):
+                return "removed", db.remove_from_favorites(user_id, product.id)
+            return "added", db.add_to_favorites(user_id, product.id)
         
-        # Refrescar la vista
-        self.display_products()
+        def done(result):
+            action, ok = result
+            if action == "removed":
+                if ok:
+                    self.notifications.show_notification("Eliminado de favoritos", "info")
+                else:
+                    self.notifications.show_notification("Error al eliminar favorito", "error")
+            else:
+                if ok:
+                    self.notifications.show_notification("Añadido a favoritos", "success")
+                else:
+                    self.notifications.show_notification("Error al añadir favorito", "error")
+            
+            # Actualizar sólo la tarjeta de este producto
+            self.product_grid.update_product(product.id)
+        
+        self.async_db.submit(
+            work,
+            key=f"favorite-{product.id}",
+            on_success=done,
+            on_error=lambda e: self.notifications.show_notification("Error al actualizar favoritos", "error")
+        )
 
+    @query_budget(4)
     def show_product_detail(self, product: Product):
         """Muestra detalles del producto"""
+        self.ensure_screen(self.product_detail_frame)
+        
         # Limpiar contenedor
         for widget in self.product_detail_container.winfo_children():
             widget.destroy()
@@ -2066,6 +5526,228 @@ class ImprovedPetZoneApp:
             justify=tk.LEFT
         )
         description_text.pack(padx=10, pady=10)
+        
+        self.create_reviews_section(product)
+
+    def create_reviews_section(self, product: Product):
+        """Sección de reseñas del detalle: resumen, formulario y lista paginada"""
+        reviews_frame = tk.Frame(self.product_detail_container, bg=self.card_bg, bd=1, relief=tk.SOLID)
+        reviews_frame.pack(fill=tk.X, padx=10, pady=10)
+        
+        tk.Label(
+            reviews_frame,
+            text="Reseñas",
+            font=self.button_font,
+            bg=self.card_bg,
+            fg=self.fg_color
+        ).pack(pady=10)
+        
+        self.reviews_summary_frame = tk.Frame(reviews_frame, bg=self.card_bg)
+        self.reviews_summary_frame.pack(fill=tk.X, padx=10)
+        
+        if self.current_user:
+            self.create_review_form(reviews_frame, product)
+        
+        self.reviews_container = tk.Frame(reviews_frame, bg=self.card_bg)
+        self.reviews_container.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.load_review_summary(product)
+        self.reviews_product = product
+        self.reviews_cursor = None
+        self.reviews_more_button = None
+        self.load_more_reviews()
+
+    def load_review_summary(self, product: Product):
+        self.async_db.submit(
+            "get_rating_summary",
+            product.id,
+            key="reviews_summary",
+            on_success=self.render_review_summary
+        )
+
+    def render_review_summary(self, summary: Dict):
+        """Promedio e histograma de estrellas, leídos del resumen precalculado"""
+        if not self.reviews_summary_frame.winfo_exists():
+            return
+        self.clear_container(self.reviews_summary_frame)
+        
+        if not summary['count']:
+            tk.Label(
+                self.reviews_summary_frame,
+                text="Todavía no hay reseñas",
+                font=self.label_font,
+                bg=self.card_bg,
+                fg=self.fg_color
+            ).pack(anchor="w")
+            return
+        
+        average = summary['average']
+        stars_text = "★" * round(average) + "☆" * (5 - round(average))
+        tk.Label(
+            self.reviews_summary_frame,
+            text=f"{stars_text} {average:.1f}/5 ({summary['count']} reseñas)",
+            font=self.label_font,
+            bg=self.card_bg,
+            fg="#FFD700"
+        ).pack(anchor="w")
+        
+        histogram = tk.Canvas(self.reviews_summary_frame, height=5 * 16, bg=self.card_bg, highlightthickness=0)
+        histogram.pack(fill=tk.X, pady=5)
+        bar_width = 160
+        for row, star in enumerate(range(5, 0, -1)):
+            count = summary['histogram'][star]
+            y = row * 16 + 8
+            histogram.create_text(20, y, text=f"{star} ★", font=self.copyright_font, fill=self.fg_color)
+            histogram.create_rectangle(40, y - 5, 40 + bar_width, y + 5, fill=self.bg_color, outline="")
+            filled = bar_width * count / summary['count']
+            histogram.create_rectangle(40, y - 5, 40 + filled, y + 5, fill="#FFD700", outline="")
+            histogram.create_text(50 + bar_width, y, text=str(count), font=self.copyright_font,
+                                  fill=self.fg_color, anchor="w")
+
+    def create_review_form(self, parent, product: Product):
+        """Formulario para calificar el producto (una reseña por usuario; se puede editar)"""
+        form_frame = tk.Frame(parent, bg=self.card_bg)
+        form_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        rating_var = tk.IntVar(value=5)
+        stars_frame = tk.Frame(form_frame, bg=self.card_bg)
+        stars_frame.pack(anchor="w")
+        tk.Label(
+            stars_frame, text="Tu calificación:", font=self.label_font, bg=self.card_bg, fg=self.fg_color
+        ).pack(side=tk.LEFT)
+        for star in range(1, 6):
+            tk.Radiobutton(
+                stars_frame,
+                text=f"{star}★",
+                variable=rating_var,
+                value=star,
+                font=self.copyright_font,
+                bg=self.card_bg,
+                fg=self.fg_color,
+                selectcolor=self.card_bg
+            ).pack(side=tk.LEFT)
+        
+        comment_entry = tk.Entry(
+            form_frame,
+            font=self.label_font,
+            bg=self.bg_color,
+            fg=self.fg_color,
+            insertbackground=self.fg_color
+        )
+        comment_entry.pack(fill=tk.X, pady=5)
+        
+        submit_button = tk.Button(
+            form_frame,
+            text="Publicar reseña",
+            font=self.label_font,
+            bg=self.button_color,
+            fg=self.button_text_color,
+            relief=tk.FLAT
+        )
+        submit_button.config(command=lambda: self.submit_review(
+            product, rating_var.get(), comment_entry.get().strip(), submit_button
+        ))
+        submit_button.pack(anchor="e")
+
+    def submit_review(self, product: Product, rating: int, comment: str, button):
+        """Guarda la reseña en segundo plano y refresca la sección"""
+        button.config(state=tk.DISABLED)
+        
+        def done(review_id):
+            if button.winfo_exists():
+                button.config(state=tk.NORMAL)
+            if review_id is None:
+                self.notifications.show_notification("No se pudo guardar la reseña", "error")
+                return
+            self.notifications.show_notification("¡Gracias por tu reseña!", "success")
+            if self.reviews_container.winfo_exists():
+                self.load_review_summary(product)
+                self.clear_container(self.reviews_container)
+                self.reviews_cursor = None
+                self.reviews_more_button = None
+                self.load_more_reviews()
+            # La tarjeta del catálogo muestra el rating nuevo sin recargar la grilla
+            self.async_db.submit(
+                "get_product_by_id",
+                product.id,
+                on_success=lambda updated: updated and self.product_grid.update_product(updated.id, updated)
+            )
+        
+        self.async_db.submit(
+            "submit_review",
+            self.current_user.id,
+            product.id,
+            rating,
+            comment or None,
+            key="review_submit",
+            on_success=done,
+            on_error=lambda e: done(None)
+        )
+
+    def load_more_reviews(self):
+        """Carga la siguiente página de reseñas del producto"""
+        if self.reviews_more_button is not None:
+            self.reviews_more_button.destroy()
+            self.reviews_more_button = None
+        
+        loading_label = self.create_loading_placeholder(self.reviews_container, "⏳ Cargando reseñas...")
+        
+        self.async_db.submit(
+            "get_product_reviews",
+            self.reviews_product.id,
+            limit=self.REVIEWS_PAGE_SIZE,
+            after=self.reviews_cursor,
+            key="reviews",
+            on_success=lambda reviews: self.render_reviews_page(reviews, loading_label),
+            on_error=lambda e: self.show_load_error(self.reviews_container, "reseñas")
+        )
+
+    def render_reviews_page(self, reviews: List[Dict], loading_label):
+        """Agrega una página de reseñas a la sección"""
+        if not self.reviews_container.winfo_exists():
+            return
+        loading_label.destroy()
+        
+        for review in reviews:
+            review_frame = tk.Frame(self.reviews_container, bg=self.card_bg)
+            review_frame.pack(fill=tk.X, pady=4)
+            
+            stars_text = "★" * review['rating'] + "☆" * (5 - review['rating'])
+            tk.Label(
+                review_frame,
+                text=f"{stars_text}  {review['username']} · {str(review['created_at'])[:10]}",
+                font=self.copyright_font,
+                bg=self.card_bg,
+                fg="#FFD700",
+                anchor="w"
+            ).pack(fill=tk.X)
+            
+            if review['comment']:
+                tk.Label(
+                    review_frame,
+                    text=review['comment'],
+                    font=self.copyright_font,
+                    bg=self.card_bg,
+                    fg=self.fg_color,
+                    wraplength=self.window_width - 60,
+                    justify=tk.LEFT,
+                    anchor="w"
+                ).pack(fill=tk.X)
+        
+        if reviews:
+            self.reviews_cursor = (reviews[-1]['created_at'], reviews[-1]['id'])
+        
+        if len(reviews) == self.REVIEWS_PAGE_SIZE:
+            self.reviews_more_button = tk.Button(
+                self.reviews_container,
+                text="Ver más reseñas",
+                font=self.copyright_font,
+                bg=self.card_bg,
+                fg=self.fg_color,
+                relief=tk.GROOVE,
+                command=self.load_more_reviews
+            )
+            self.reviews_more_button.pack(pady=5)
 
     def add_multiple_to_cart(self, product: Product, quantity: int):
         """Añade múltiples unidades de un producto al carrito"""
@@ -2094,7 +5776,8 @@ class ImprovedPetZoneApp:
         self.notifications.show_notification(
             f"{quantity} x {product.name} añadido al carrito", "success"
         )
-        if hasattr(self, 'update_cart_display'):
+        # Si el carrito aún no se construyó, se dibuja completo al abrirlo
+        if self.is_screen_built(self.cart_frame):
             self.update_cart_display()
 
     def setup_cart_screen(self):
@@ -2720,19 +6403,30 @@ class ImprovedPetZoneApp:
             self.notifications.show_notification("Por favor ingrese la dirección de envío", "warning")
             return
         
+        if self.async_db.is_pending("purchase"):
+            return
+        
+        # Crear lista de items para la orden
+        items = [{'product_id': item['product'].id, 'quantity': item['quantity']} 
+                for item in self.cart_items]
+        
+        self.notifications.show_notification("Procesando compra...", "info")
+        
+        # Crear la orden en la base de datos sin congelar la ventana
+        self.async_db.submit(
+            "create_order",
+            user_id=self.current_user.id,
+            items=items,
+            total=total,
+            shipping_address=address,
+            key="purchase",
+            on_success=lambda order_id: self.on_purchase_result(window, order_id, payment_method, total),
+            on_error=lambda e: messagebox.showerror("Error", f"Error al procesar la compra: {str(e)}")
+        )
+
+    def on_purchase_result(self, window, order_id, payment_method, total):
+        """Completa la compra con el resultado de la base de datos"""
         try:
-            # Crear lista de items para la orden
-            items = [{'product_id': item['product'].id, 'quantity': item['quantity']} 
-                    for item in self.cart_items]
-            
-            # Crear la orden en la base de datos
-            order_id = self.db.create_order(
-                user_id=self.current_user.id,
-                items=items,
-                total=total,
-                shipping_address=address
-            )
-            
             if order_id:
                 success_message = f"¡Compra realizada con éxito!\n\nNúmero de pedido: #{order_id}\nTotal: $ {total:,.0f} ARS\nMétodo de pago: {payment_method}\n\n¡Gracias por tu compra!"
                 
@@ -2745,7 +6439,8 @@ class ImprovedPetZoneApp:
                 self.update_cart_display()
                 
                 # Cerrar ventana y volver al inicio
-                window.destroy()
+                if window.winfo_exists():
+                    window.destroy()
                 self.show_frame_with_animation(self.home_frame)
                 
                 self.notifications.show_notification("¡Compra realizada con éxito!", "success")
@@ -2892,18 +6587,15 @@ class ImprovedPetZoneApp:
             stats_frame = tk.Frame(user_info_frame, bg=self.card_bg)
             stats_frame.pack(fill=tk.X, padx=20, pady=10)
             
-            # Obtener estadísticas
-            orders = self.db.get_user_orders(self.current_user.id)
-            favorites = self.db.get_user_favorites(self.current_user.id)
-            total_spent = sum(order['total'] for order in orders)
-            
+            # Las estadísticas se muestran con "..." hasta que llegan de la base de datos
             stats_data = [
-                ("📦", "Pedidos", len(orders)),
-                ("❤️", "Favoritos", len(favorites)),
-                ("💰", "Total gastado", f"${total_spent:,.0f}")
+                ("📦", "Pedidos", "orders"),
+                ("❤️", "Favoritos", "favorites"),
+                ("💰", "Total gastado", "total_spent")
             ]
+            stat_value_labels = {}
             
-            for i, (icon, label, value) in enumerate(stats_data):
+            for i, (icon, label, stat_key) in enumerate(stats_data):
                 stat_frame = tk.Frame(stats_frame, bg=self.card_bg)
                 if i % 2 == 0:
                     stat_frame.pack(side=tk.LEFT, padx=10, expand=True)
@@ -2918,13 +6610,15 @@ class ImprovedPetZoneApp:
                     fg=self.fg_color
                 ).pack()
                 
-                tk.Label(
+                value_label = tk.Label(
                     stat_frame,
-                    text=str(value),
+                    text="...",
                     font=self.button_font,
                     bg=self.card_bg,
                     fg=self.accent_color
-                ).pack()
+                )
+                value_label.pack()
+                stat_value_labels[stat_key] = value_label
                 
                 tk.Label(
                     stat_frame,
@@ -2933,6 +6627,26 @@ class ImprovedPetZoneApp:
                     bg=self.card_bg,
                     fg=self.fg_color
                 ).pack()
+            
+            # Obtener estadísticas en segundo plano
+            db = self.db
+            user_id = self.current_user.id
+            
+            def load_stats():
+                order_summary = db.get_user_order_summary(user_id)
+                favorites = db.get_user_favorites(user_id)
+                return {
+                    'orders': order_summary['count'],
+                    'favorites': len(favorites),
+                    'total_spent': f"${order_summary['total_spent']:,.0f}"
+                }
+            
+            def show_stats(stats):
+                for stat_key, value_label in stat_value_labels.items():
+                    if value_label.winfo_exists():
+                        value_label.config(text=str(stats[stat_key]))
+            
+            self.async_db.submit(load_stats, key="profile-stats", on_success=show_stats)
 
         else:
             guest_label = tk.Label(
@@ -3137,6 +6851,7 @@ class ImprovedPetZoneApp:
         self.display_favorites()
         self.create_responsive_footer(self.favorites_frame)
 
+    @query_budget(2)
     def display_favorites(self):
         """Muestra los productos favoritos"""
         for widget in self.favorites_container.winfo_children():
@@ -3153,8 +6868,20 @@ class ImprovedPetZoneApp:
             login_prompt.pack(pady=50)
             return
         
-        # Obtener favoritos de la base de datos
-        favorites = self.db.get_user_favorites(self.current_user.id)
+        self.create_loading_placeholder(self.favorites_container, "⏳ Cargando favoritos...")
+        
+        # Obtener favoritos de la base de datos en segundo plano
+        self.async_db.submit(
+            "get_user_favorites",
+            self.current_user.id,
+            key="favorites",
+            on_success=self.render_favorites,
+            on_error=lambda e: self.show_load_error(self.favorites_container, "favoritos")
+        )
+
+    def render_favorites(self, favorites: List[Product]):
+        """Dibuja la grilla de favoritos ya obtenidos"""
+        self.clear_container(self.favorites_container)
         
         if not favorites:
             empty_label = tk.Label(
@@ -3264,11 +6991,19 @@ class ImprovedPetZoneApp:
 
     def remove_favorite_and_refresh(self, product: Product):
         """Quita de favoritos y refresca la vista"""
-        if self.db.remove_from_favorites(self.current_user.id, product.id):
-            self.notifications.show_notification("Eliminado de favoritos", "info")
-            self.display_favorites()
-        else:
-            self.notifications.show_notification("Error al eliminar favorito", "error")
+        def done(removed):
+            if removed:
+                self.notifications.show_notification("Eliminado de favoritos", "info")
+                self.display_favorites()
+            else:
+                self.notifications.show_notification("Error al eliminar favorito", "error")
+        
+        self.async_db.submit(
+            "remove_from_favorites", self.current_user.id, product.id,
+            key=f"favorite-{product.id}",
+            on_success=done,
+            on_error=lambda e: self.notifications.show_notification("Error al eliminar favorito", "error")
+        )
 
     def setup_orders_screen(self):
         """Configura la pantalla de pedidos"""
@@ -3295,6 +7030,7 @@ class ImprovedPetZoneApp:
         self.display_orders()
         self.create_responsive_footer(self.orders_frame)
 
+    @query_budget(2)
     def display_orders(self):
         """Muestra los pedidos del usuario"""
         for widget in self.orders_container.winfo_children():
@@ -3311,10 +7047,34 @@ class ImprovedPetZoneApp:
             login_prompt.pack(pady=50)
             return
         
-        # Obtener pedidos de la base de datos
-        orders = self.db.get_user_orders(self.current_user.id)
+        self.orders_cursor = None
+        self.orders_more_button = None
+        self.load_more_orders()
+
+    def load_more_orders(self):
+        """Carga la siguiente página de pedidos del usuario"""
+        if self.orders_more_button is not None:
+            self.orders_more_button.destroy()
+            self.orders_more_button = None
+        
+        loading_label = self.create_loading_placeholder(self.orders_container, "⏳ Cargando pedidos...")
+        
+        # Obtener pedidos de la base de datos en segundo plano
+        self.async_db.submit(
+            "get_user_orders",
+            self.current_user.id,
+            limit=self.ORDERS_PAGE_SIZE,
+            after=self.orders_cursor,
+            key="orders",
+            on_success=lambda orders: self.render_orders_page(orders, loading_label),
+            on_error=lambda e: self.show_load_error(self.orders_container, "pedidos")
+        )
+
+    def render_orders_page(self, orders: List[Dict], loading_label):
+        """Agrega una página de pedidos a la pantalla"""
+        loading_label.destroy()
         
-        if not orders:
+        if not orders and self.orders_cursor is None:
             empty_label = tk.Label(
                 self.orders_container,
                 text="📦 No tienes pedidos aún\n\n¡Realiza tu primera compra\ny aparecerá aquí!",
@@ -3329,6 +7089,21 @@ class ImprovedPetZoneApp:
         # Mostrar pedidos
         for order in orders:
             self.create_order_card(order)
+        
+        if orders:
+            self.orders_cursor = (orders[-1]['created_at'], orders[-1]['id'])
+        
+        if len(orders) == self.ORDERS_PAGE_SIZE:
+            self.orders_more_button = tk.Button(
+                self.orders_container,
+                text="Cargar más pedidos",
+                font=self.label_font,
+                bg=self.button_color,
+                fg=self.button_text_color,
+                relief=tk.FLAT,
+                command=self.load_more_orders
+            )
+            self.orders_more_button.pack(pady=10)
 
     def create_order_card(self, order):
         """Crea una tarjeta de pedido"""
@@ -3445,6 +7220,7 @@ class ImprovedPetZoneApp:
             ("🔔", "Notificaciones", self.toggle_notifications),
             ("💾", "Exportar Datos", self.export_data),
             ("🗑️", "Limpiar Cache", self.clear_cache),
+            ("📊", "Métricas de consultas", self.show_query_metrics),
             ("ℹ️", "Acerca de", self.show_about)
         ]
         
@@ -3496,38 +7272,55 @@ class ImprovedPetZoneApp:
             self.notifications.show_notification("Debe iniciar sesión", "warning")
             return
         
-        try:
-            filename = filedialog.asksaveasfilename(
-                defaultextension=".json",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
-            )
-            
-            if filename:
-                # Obtener datos del usuario
-                user_data = {
-                    'user': {
-                        'username': self.current_user.username,
-                        'email': self.current_user.email,
-                        'created_at': self.current_user.created_at
-                    },
-                    'orders': self.db.get_user_orders(self.current_user.id),
-                    'favorites': [
-                        {
-                            'id': p.id,
-                            'name': p.name,
-                            'price': p.price,
-                            'category': p.category
-                        }
-                        for p in self.db.get_user_favorites(self.current_user.id)
-                    ]
-                }
-                
+        from tkinter import filedialog
+        
+        filename = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        
+        if not filename:
+            return
+        
+        db = self.db
+        user = self.current_user
+        
+        def collect_data():
+            # Obtener datos del usuario
+            return {
+                'user': {
+                    'username': user.username,
+                    'email': user.email,
+                    'created_at': user.created_at
+                },
+                'orders': db.get_user_orders(user.id),
+                'favorites': [
+                    {
+                        'id': p.id,
+                        'name': p.name,
+                        'price': p.price,
+                        'category': p.category
+                    }
+                    for p in db.get_user_favorites(user.id)
+                ]
+            }
+        
+        def write_file(user_data):
+            try:
                 with open(filename, 'w', encoding='utf-8') as f:
                     json.dump(user_data, f, indent=2, ensure_ascii=False)
                 
                 self.notifications.show_notification("Datos exportados correctamente", "success")
-        except Exception as e:
-            self.notifications.show_notification(f"Error al exportar: {str(e)}", "error")
+            except Exception as e:
+                self.notifications.show_notification(f"Error al exportar: {str(e)}", "error")
+        
+        self.notifications.show_notification("Exportando datos...", "info")
+        self.async_db.submit(
+            collect_data,
+            key="export",
+            on_success=write_file,
+            on_error=lambda e: self.notifications.show_notification(f"Error al exportar: {str(e)}", "error")
+        )
 
     def delete_account(self):
         """Elimina la cuenta del usuario"""
@@ -3554,6 +7347,147 @@ class ImprovedPetZoneApp:
         """Limpia el cache de la aplicación"""
         self.notifications.show_notification("Cache limpiado", "success")
 
+    def show_query_metrics(self):
+        """Panel de depuración con las consultas más costosas y el log de lentas"""
+        if self.db.metrics is None:
+            self.notifications.show_notification("Las métricas de consultas están desactivadas", "info")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Métricas de consultas")
+        window.geometry("760x520")
+        window.configure(bg=self.bg_color)
+        window.transient(self.root)
+        
+        tk.Label(
+            window,
+            text="📊 Métricas de consultas",
+            font=self.welcome_font,
+            bg=self.bg_color,
+            fg=self.fg_color
+        ).pack(pady=10)
+        
+        toolbar = tk.Frame(window, bg=self.bg_color)
+        toolbar.pack(fill=tk.X, padx=10)
+        
+        summary_label = tk.Label(
+            toolbar,
+            font=self.copyright_font,
+            bg=self.bg_color,
+            fg=self.fg_color,
+            anchor="w"
+        )
+        summary_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        order_var = tk.StringVar(value="total_ms")
+        ttk.Combobox(
+            toolbar,
+            textvariable=order_var,
+            values=["total_ms", "p95_ms", "calls", "rows"],
+            state="readonly",
+            width=10
+        ).pack(side=tk.RIGHT)
+        tk.Label(
+            toolbar,
+            text="Ordenar por:",
+            font=self.copyright_font,
+            bg=self.bg_color,
+            fg=self.fg_color
+        ).pack(side=tk.RIGHT, padx=5)
+        
+        columns = [
+            ("calls", "Llamadas", 70), ("total_ms", "Total ms", 80),
+            ("p50_ms", "p50", 60), ("p95_ms", "p95", 60), ("p99_ms", "p99", 60),
+            ("rows_per_call", "Filas/llam.", 75), ("cache_hits", "Caché", 60),
+            ("errors", "Errores", 60)
+        ]
+        tree = ttk.Treeview(window, columns=[c[0] for c in columns], height=12)
+        tree.heading("#0", text="Consulta")
+        tree.column("#0", width=260, stretch=True)
+        for key, title, width in columns:
+            tree.heading(key, text=title)
+            tree.column(key, width=width, anchor=tk.E, stretch=False)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        tk.Label(
+            window,
+            text="🐢 Consultas lentas recientes",
+            font=self.button_font,
+            bg=self.bg_color,
+            fg=self.fg_color
+        ).pack(anchor="w", padx=10)
+        
+        slow_list = tk.Listbox(window, height=6, font=self.copyright_font)
+        slow_list.pack(fill=tk.X, padx=10, pady=5)
+        
+        # Id del próximo refresco, para cancelarlo cuando se cierra la ventana
+        refresh_after = {'id': None}
+        
+        def refresh():
+            refresh_after['id'] = None
+            if not window.winfo_exists():
+                return
+            
+            tree.delete(*tree.get_children())
+            for row in self.db.get_query_metrics(top=15, order=order_var.get()):
+                tree.insert("", tk.END, text=row['query'], values=[row[key] for key, _, _ in columns])
+            
+            slow = self.db.get_slow_queries()
+            slow_list.delete(0, tk.END)
+            for entry in reversed(slow):
+                slow_list.insert(tk.END, f"{entry['at']}  {entry['ms']:.0f} ms  {entry['query']}  {entry['params']}")
+            
+            cache = self.db.get_query_cache_stats()
+            hit_rate = f"{cache['hit_rate']:.0%}" if cache['enabled'] else "desactivada"
+            summary_label.config(
+                text=f"Caché de consultas: {hit_rate}  •  Lentas (>{self.db.metrics.slow_threshold * 1000:.0f} ms): {len(slow)}"
+            )
+            refresh_after['id'] = window.after(1000, refresh)
+        
+        def stop_refresh(event=None):
+            # <Destroy> llega también por cada widget hijo
+            if event is not None and event.widget is not window:
+                return
+            if refresh_after['id'] is not None:
+                window.after_cancel(refresh_after['id'])
+                refresh_after['id'] = None
+        
+        def close():
+            stop_refresh()
+            window.destroy()
+        
+        window.bind("<Destroy>", stop_refresh)
+        
+        def export():
+            from tkinter import filedialog
+            
+            filename = filedialog.asksaveasfilename(
+                parent=window,
+                defaultextension=".json",
+                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            )
+            if filename:
+                self.db.export_metrics(filename)
+                self.notifications.show_notification("Métricas exportadas exitosamente", "success")
+        
+        buttons = tk.Frame(window, bg=self.bg_color)
+        buttons.pack(fill=tk.X, padx=10, pady=10)
+        
+        for text, command in [("💾 Exportar JSON", export),
+                              ("🔄 Reiniciar", self.db.metrics.reset),
+                              ("Cerrar", close)]:
+            tk.Button(
+                buttons,
+                text=text,
+                font=self.label_font,
+                bg=self.button_color,
+                fg=self.button_text_color,
+                relief=tk.FLAT,
+                command=command
+            ).pack(side=tk.LEFT, padx=5)
+        
+        refresh()
+
     def show_about(self):
         """Muestra información sobre la aplicación"""
         about_text = """PetZone - Tienda de Mascotas
@@ -3576,11 +7510,37 @@ Características:
         
         messagebox.showinfo("Acerca de PetZone", about_text)
 
+def instrument_action_tracing(tracer):
+    """Spans de las trazas de acciones (ACTION_TRACE): interfaz, base y SQL"""
+    query_shape = lambda self, query, *args, **kwargs: QueryMetrics.shape(query)
+    widget_prefixes = ("setup_", "create_", "display_", "render_", "draw_", "show_",
+                       "update_", "append_", "clear_", "set_", "replace_")
+    tracer.instrument(ImprovedPetZoneApp, "ui", widget_prefixes)
+    tracer.instrument(ImprovedPetZoneApp, "app")
+    for cls in (ProductCard, VirtualProductGrid, NotificationManager):
+        tracer.instrument(cls, "ui")
+    tracer.instrument(DatabaseManager, "sql", ("execute_query",), {"execute_query": query_shape})
+    tracer.instrument(DatabaseManager, "db")
+    tracer.instrument(_MeasuredCursor, "sql", ("execute",), {"execute": query_shape, "executemany": query_shape})
+
 def main():
     """Función principal para ejecutar la aplicación"""
+    global action_tracer
+    if os.environ.get("ACTION_TRACE"):
+        import action_tracer
+        tracer = action_tracer.enable_from_env()
+        if tracer is not None:
+            instrument_action_tracing(tracer)
     root = tk.Tk()
     app = ImprovedPetZoneApp(root)
+    # Vigilante de congelamientos opcional (STALL_WATCHDOG=1)
+    watchdog = None
+    if os.environ.get("STALL_WATCHDOG"):
+        import stall_watchdog
+        watchdog = stall_watchdog.start_from_env(root)
     root.mainloop()
+    if watchdog is not None:
+        watchdog.stop()
 
 if __name__ == "__main__":
     main()
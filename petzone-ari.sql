@@ -148,6 +148,26 @@ INSERT INTO `productos` (`id`, `nombre`, `descripcion`, `precio`, `stock`, `cate
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `producto_rating`
+--
+-- Resumen de reseñas por producto, mantenido en la misma transacción que
+-- cada alta, cambio o baja de una reseña
+--
+
+CREATE TABLE `producto_rating` (
+  `producto_id` int(11) NOT NULL,
+  `cantidad` int(11) NOT NULL DEFAULT 0,
+  `suma` int(11) NOT NULL DEFAULT 0,
+  `estrellas_1` int(11) NOT NULL DEFAULT 0,
+  `estrellas_2` int(11) NOT NULL DEFAULT 0,
+  `estrellas_3` int(11) NOT NULL DEFAULT 0,
+  `estrellas_4` int(11) NOT NULL DEFAULT 0,
+  `estrellas_5` int(11) NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `reseñas`
 --
@@ -245,7 +265,8 @@ ALTER TABLE `favoritos`
 ALTER TABLE `pedidos`
   ADD PRIMARY KEY (`id`),
   ADD KEY `idx_pedidos_usuario` (`usuario_id`),
-  ADD KEY `idx_pedidos_fecha` (`fecha_pedido`);
+  ADD KEY `idx_pedidos_fecha` (`fecha_pedido`),
+  ADD KEY `idx_pedidos_usuario_fecha` (`usuario_id`,`fecha_pedido`);
 
 --
 -- Indexes for table `productos`
@@ -253,15 +274,23 @@ ALTER TABLE `pedidos`
 ALTER TABLE `productos`
   ADD PRIMARY KEY (`id`),
   ADD KEY `idx_productos_categoria` (`categoria_id`),
-  ADD KEY `idx_productos_tipo` (`tipo_mascota`);
+  ADD KEY `idx_productos_tipo` (`tipo_mascota`),
+  ADD KEY `idx_productos_nombre` (`nombre`),
+  ADD KEY `idx_productos_categoria_nombre` (`categoria_id`,`nombre`);
+
+--
+-- Indexes for table `producto_rating`
+--
+ALTER TABLE `producto_rating`
+  ADD PRIMARY KEY (`producto_id`);
 
 --
 -- Indexes for table `reseñas`
 --
 ALTER TABLE `reseñas`
   ADD PRIMARY KEY (`id`),
-  ADD KEY `usuario_id` (`usuario_id`),
-  ADD KEY `producto_id` (`producto_id`);
+  ADD UNIQUE KEY `uq_reseñas_usuario_producto` (`usuario_id`,`producto_id`),
+  ADD KEY `idx_reseñas_producto_fecha` (`producto_id`,`fecha_creacion`);
 
 --
 -- Indexes for table `sesiones`
@@ -374,6 +403,12 @@ ALTER TABLE `pedidos`
 ALTER TABLE `productos`
   ADD CONSTRAINT `productos_ibfk_1` FOREIGN KEY (`categoria_id`) REFERENCES `categorias` (`id`);
 
+--
+-- Constraints for table `producto_rating`
+--
+ALTER TABLE `producto_rating`
+  ADD CONSTRAINT `producto_rating_ibfk_1` FOREIGN KEY (`producto_id`) REFERENCES `productos` (`id`) ON DELETE CASCADE;
+
 --
 -- Constraints for table `reseñas`
 --
@@ -0,0 +1,488 @@
+"""Generador de datos sintéticos y benchmarks de la base de datos de PetZone
+
+Llena productos, usuarios, reseñas, favoritos y pedidos a la escala que se
+pida (siempre con los mismos datos para una misma semilla) y mide los métodos
+de DatabaseManager: latencia p50/p95/p99 y cantidad de consultas por llamada.
+Los resultados se guardan en JSON para compararlos entre versiones.
+
+Ejemplos:
+    python petzone-bench.py --db sqlite:bench.db --scale medium --output base.json
+    python petzone-bench.py --db sqlite:bench.db --compare base.json
+    python petzone-bench.py --db mysql --scale large --skip-generate
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+def load_petzone():
+    """Carga mascotas-ari.py como módulo (el nombre con guion no se puede importar)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mascotas-ari.py")
+    spec = importlib.util.spec_from_file_location("petzone", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+petzone = load_petzone()
+
+# Cantidad de filas por tabla para cada escala
+SCALES = {
+    'small': {'products': 1_000, 'users': 500, 'reviews': 5_000, 'favorites': 2_000, 'orders': 2_000},
+    'medium': {'products': 10_000, 'users': 5_000, 'reviews': 100_000, 'favorites': 20_000, 'orders': 50_000},
+    'large': {'products': 100_000, 'users': 50_000, 'reviews': 1_000_000, 'favorites': 200_000, 'orders': 500_000},
+}
+
+CATEGORIES = ["Alimento Perros", "Alimento Gatos", "Juguetes", "Accesorios", "Higiene",
+              "Salud", "Peceras y Acuarios", "Aves"]
+BRANDS = ["Royal Canin", "Pro Plan", "Kong", "Bayer", "Vet Plus", "PetSafe", "OrthoPet",
+          "CatFurniture", "PetTech", "PetFun", "Eukanuba", "Hills", "Whiskas", "Pedigree",
+          "Tetra", "Vitakraft", "Trixie", "Ferplast", "Zolux", "Nath"]
+PRODUCT_WORDS = {
+    "Alimento Perros": ["Alimento", "Snack", "Galletas", "Croquetas", "Hueso Masticable"],
+    "Alimento Gatos": ["Alimento", "Paté", "Snack", "Croquetas", "Leche"],
+    "Juguetes": ["Pelota", "Cuerda", "Ratón", "Peluche", "Frisbee", "Juguete Interactivo"],
+    "Accesorios": ["Collar", "Correa", "Cama", "Comedero", "Bebedero", "Transportadora", "Rascador"],
+    "Higiene": ["Shampoo", "Cepillo", "Toallitas", "Arena", "Cortaúñas", "Perfume"],
+    "Salud": ["Vitaminas", "Antipulgas", "Desparasitante", "Suplemento", "Pipeta"],
+    "Peceras y Acuarios": ["Pecera", "Filtro", "Alimento en Escamas", "Termostato", "Grava"],
+    "Aves": ["Jaula", "Alpiste", "Columpio", "Comedero", "Vitaminas"],
+}
+ADJECTIVES = ["Premium", "Clásico", "Deluxe", "Natural", "Light", "Reforzado", "Compacto",
+              "Ecológico", "Hipoalergénico", "Grande", "Mediano", "Pequeño"]
+PET_TYPES = ["perro", "gato", "ave", "pez", "roedor", "reptil", "todas"]
+PET_AGES = ["cachorro", "adulto", "senior", "todas"]
+FIRST_NAMES = ["Ana", "Juan", "Lucía", "Martín", "Sofía", "Diego", "Valentina", "Tomás",
+               "Camila", "Mateo", "Julieta", "Nicolás", "Florencia", "Agustín"]
+LAST_NAMES = ["García", "Fernández", "López", "Martínez", "Gómez", "Pérez", "Romero",
+              "Sosa", "Díaz", "Álvarez", "Ruiz", "Torres"]
+COMMENTS = ["Excelente producto", "A mi mascota le encantó", "Buena calidad", "Llegó rápido",
+            "Cumple lo que promete", "Podría ser mejor", "No me convenció", "Muy buen precio",
+            None, None]
+ORDER_STATES = ["pendiente", "procesando", "enviado", "entregado", "entregado", "cancelado"]
+
+# Fecha de referencia fija para que las fechas también sean reproducibles
+BASE_DATE = datetime(2024, 1, 1)
+
+class DataGenerator:
+    """Inserta datos sintéticos reproducibles a través de un DatabaseManager
+
+    Usa executemany dentro de transacciones de batch_size filas, así que
+    funciona igual con cualquier backend. Los ids se asignan a partir del
+    máximo existente para poder relacionar las tablas sin consultarlas.
+    """
+    def __init__(self, db, seed: int = 42, batch_size: int = 5000):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.counts = {}
+
+    def _max_id(self, table: str) -> int:
+        row = self.db.execute_query(f"SELECT COALESCE(MAX(id), 0) as max_id FROM {table}", fetch_one=True)
+        return int(row['max_id']) if row else 0
+
+    def _insert(self, table: str, columns: tuple, rows):
+        """Inserta las filas de un iterable en lotes"""
+        query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        batch = []
+        total = 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                self._flush(query, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            self._flush(query, batch)
+            total += len(batch)
+        self.counts[table] = self.counts.get(table, 0) + total
+        return total
+
+    def _flush(self, query: str, batch: list):
+        with self.db.transaction() as cursor:
+            cursor.executemany(query, batch)
+
+    def _date(self, max_days: int = 365) -> str:
+        moment = BASE_DATE + timedelta(seconds=self.rng.randrange(max_days * 86400))
+        return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+    def _popular(self, ids: list) -> int:
+        """Elige un id con sesgo: unos pocos productos concentran la mayoría de la actividad"""
+        return ids[int(len(ids) * self.rng.random() ** 3)]
+
+    def _categories(self) -> dict:
+        existing = {row['nombre'] for row in self.db.execute_query(
+            "SELECT nombre FROM categorias", fetch_all=True) or []}
+        for name in CATEGORIES:
+            if name not in existing:
+                self.db.execute_query("INSERT INTO categorias (nombre) VALUES (%s)", (name,), commit=True)
+        rows = self.db.execute_query("SELECT id, nombre FROM categorias", fetch_all=True) or []
+        ids = {}
+        for row in rows:
+            ids.setdefault(row['nombre'], row['id'])
+        return ids
+
+    def generate(self, products: int, users: int, reviews: int, favorites: int, orders: int):
+        start = time.perf_counter()
+        categories = self._categories()
+
+        print(f"Generando {products} productos...")
+        first_product = self._max_id("productos") + 1
+        prices = {}
+
+        def product_rows():
+            for offset in range(products):
+                product_id = first_product + offset
+                category = self.rng.choice(CATEGORIES)
+                brand = self.rng.choice(BRANDS)
+                name = f"{self.rng.choice(PRODUCT_WORDS[category])} {self.rng.choice(ADJECTIVES)} {brand} {offset}"
+                price = round(self.rng.lognormvariate(9.3, 0.7), -1)
+                prices[product_id] = price
+                yield (product_id, name, f"{name} para tu mascota", price, self.rng.randint(50, 5000),
+                       categories.get(category), brand, self.rng.choice(PET_AGES),
+                       self.rng.choice(PET_TYPES), self._date())
+
+        self._insert("productos", ("id", "nombre", "descripcion", "precio", "stock", "categoria_id",
+                                   "marca", "edad_mascota", "tipo_mascota", "fecha_creacion"), product_rows())
+        product_ids = list(prices)
+        # El orden de popularidad no depende del id
+        self.rng.shuffle(product_ids)
+
+        print(f"Generando {users} usuarios...")
+        first_user = self._max_id("usuarios") + 1
+        user_ids = list(range(first_user, first_user + users))
+        password = self.db.hash_password("petzone")
+        self._insert("usuarios", ("id", "username", "email", "password", "nombre", "apellido", "fecha_registro"), (
+            (user_id, f"usuario{user_id}", f"usuario{user_id}@bench.petzone", password,
+             self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES), self._date())
+            for user_id in user_ids
+        ))
+
+        print(f"Generando {reviews} reseñas...")
+        self._insert("reseñas", ("usuario_id", "producto_id", "rating", "comentario", "fecha_creacion"),
+                     self._unique_pairs(reviews, user_ids, product_ids, lambda user_id, product_id: (
+                         user_id, product_id, self.rng.choices([1, 2, 3, 4, 5], [5, 8, 15, 32, 40])[0],
+                         self.rng.choice(COMMENTS), self._date())))
+
+        print(f"Generando {favorites} favoritos...")
+        self._insert("favoritos", ("usuario_id", "producto_id", "fecha_agregado"),
+                     self._unique_pairs(favorites, user_ids, product_ids, lambda user_id, product_id: (
+                         user_id, product_id, self._date())))
+
+        print(f"Generando {orders} pedidos...")
+        first_order = self._max_id("pedidos") + 1
+        details = []
+
+        def order_rows():
+            for order_id in range(first_order, first_order + orders):
+                total = 0
+                for product_id in {self._popular(product_ids) for _ in range(self.rng.randint(1, 5))}:
+                    quantity = self.rng.randint(1, 3)
+                    subtotal = prices[product_id] * quantity
+                    total += subtotal
+                    details.append((order_id, product_id, quantity, prices[product_id], subtotal))
+                yield (order_id, self.rng.choice(user_ids), total, self.rng.choice(ORDER_STATES),
+                       f"Calle {self.rng.randint(1, 9999)}", self._date())
+
+        # Los pedidos y su detalle se insertan por tandas para no acumular todo en memoria
+        order_columns = ("id", "usuario_id", "total", "estado", "direccion_envio", "fecha_pedido")
+        detail_columns = ("pedido_id", "producto_id", "cantidad", "precio_unitario", "subtotal")
+        rows = order_rows()
+        while True:
+            batch = [row for _, row in zip(range(self.batch_size), rows)]
+            if not batch:
+                break
+            self._insert("pedidos", order_columns, batch)
+            self._insert("detalle_pedido", detail_columns, details)
+            details.clear()
+
+        print("Recalculando resúmenes de ratings...")
+        self.db.rebuild_rating_summary()
+        for table in ('categorias', 'productos', 'usuarios', 'reseñas', 'favoritos', 'pedidos', 'detalle_pedido'):
+            self.db._notify_change(table)
+
+        elapsed = time.perf_counter() - start
+        print(f"Datos generados en {elapsed:.1f}s: {self.counts}")
+        return dict(self.counts)
+
+    def _unique_pairs(self, count: int, user_ids: list, product_ids: list, make_row):
+        """Filas con pares (usuario, producto) sin repetir, como exigen reseñas y favoritos"""
+        count = min(count, len(user_ids) * len(product_ids))
+        seen = set()
+        while len(seen) < count:
+            user_id = self.rng.choice(user_ids)
+            product_id = self._popular(product_ids)
+            key = user_id * (len(product_ids) + 1) + product_id
+            if key in seen:
+                continue
+            seen.add(key)
+            yield make_row(user_id, product_id)
+
+class _CountingCursor:
+    """Cursor que cuenta las sentencias que ejecuta"""
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter.add()
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.add()
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class QueryCounter:
+    """Cuenta las consultas que llegan a la base, por hilo"""
+    def __init__(self):
+        self._local = threading.local()
+
+    def add(self):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, 'count', 0)
+
+class CountingBackend:
+    """Envuelve un backend para contar las consultas de cada llamada medida"""
+    def __init__(self, backend, counter: QueryCounter):
+        self._backend = backend
+        self._counter = counter
+
+    def cursor(self, connection, prepared: bool = False):
+        return _CountingCursor(self._backend.cursor(connection, prepared), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+class Benchmark:
+    """Mide métodos de DatabaseManager con datos variados en cada iteración"""
+    def __init__(self, db, counter: QueryCounter, iterations: int = 200, warmup: int = 10, seed: int = 42):
+        self.db = db
+        self.counter = counter
+        self.iterations = iterations
+        self.warmup = warmup
+        self.rng = random.Random(seed)
+        self.results = {}
+
+    def measure(self, name: str, call, iterations: int = None):
+        """call(i) se ejecuta warmup + iterations veces; sólo se miden las últimas"""
+        iterations = iterations or self.iterations
+        for i in range(self.warmup):
+            call(i)
+
+        latencies = []
+        queries = 0
+        errors = 0
+        for i in range(iterations):
+            self.counter.reset()
+            start = time.perf_counter()
+            try:
+                result = call(i)
+            except Exception:
+                result = None
+            latencies.append((time.perf_counter() - start) * 1000)
+            queries += self.counter.count
+            if result is None:
+                errors += 1
+
+        latencies.sort()
+        self.results[name] = {
+            'iterations': iterations,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p95_ms': round(percentile(latencies, 0.95), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+            'mean_ms': round(sum(latencies) / len(latencies), 3),
+            'max_ms': round(latencies[-1], 3),
+            'queries_per_call': round(queries / iterations, 2),
+            'errors': errors,
+        }
+        result = self.results[name]
+        print(f"  {name:<32} p50 {result['p50_ms']:>9.2f}ms  p95 {result['p95_ms']:>9.2f}ms  "
+              f"p99 {result['p99_ms']:>9.2f}ms  consultas {result['queries_per_call']:>6.1f}")
+        return result
+
+    def run(self, write: bool = True):
+        db = self.db
+        products = db.execute_query("SELECT id, precio FROM productos WHERE stock > 100 ORDER BY id",
+                                    fetch_all=True) or []
+        users = [row['id'] for row in db.execute_query(
+            "SELECT DISTINCT usuario_id as id FROM pedidos ORDER BY usuario_id", fetch_all=True) or []]
+        users = users or [row['id'] for row in db.execute_query("SELECT id FROM usuarios", fetch_all=True) or []]
+        categories = sorted(set(db.get_categories()) - {"Todos"})
+        words = ["alimento", "pelota", "collar", "shampoo", "royal", "premium", "cama", "snack",
+                 "kong", "natural", "vitaminas", "colar", "shampo"]
+        if not products or not users:
+            raise SystemExit("No hay datos para medir: generá datos primero (sin --skip-generate)")
+
+        pick_user = lambda: self.rng.choice(users)
+        pick_product = lambda: self.rng.choice(products)['id']
+
+        print("Lecturas:")
+        self.measure("get_products", lambda i: db.get_products(limit=petzone.ImprovedPetZoneApp.CATALOG_PAGE_SIZE))
+        self.measure("get_products_category", lambda i: db.get_products(
+            category=self.rng.choice(categories), limit=petzone.ImprovedPetZoneApp.CATALOG_PAGE_SIZE))
+        self.measure("get_products_search", lambda i: db.get_products(
+            search=self.rng.choice(words), limit=petzone.ImprovedPetZoneApp.CATALOG_PAGE_SIZE))
+        self.measure("get_products_filters", lambda i: db.get_products(
+            filters={'tipo_mascota': {self.rng.choice(PET_TYPES[:-1])}},
+            limit=petzone.ImprovedPetZoneApp.CATALOG_PAGE_SIZE))
+        self.measure("get_facet_counts", lambda i: db.get_facet_counts(category=self.rng.choice(categories)))
+        self.measure("get_product_by_id", lambda i: db.get_product_by_id(pick_product()))
+        self.measure("get_product_reviews", lambda i: db.get_product_reviews(pick_product(), limit=10))
+        self.measure("get_rating_summary", lambda i: db.get_rating_summary(pick_product()))
+        self.measure("get_user_orders", lambda i: db.get_user_orders(pick_user(), limit=20))
+        self.measure("get_user_favorites", lambda i: db.get_user_favorites(pick_user()))
+        self.measure("get_user_order_summary", lambda i: db.get_user_order_summary(pick_user()))
+
+        if write:
+            print("Escrituras:")
+
+            def order(i):
+                product = self.rng.choice(products)
+                return db.create_order(pick_user(), [
+                    {'product_id': product['id'], 'quantity': 1, 'price': float(product['precio'])}
+                ], float(product['precio']), "Calle Benchmark 123")
+
+            self.measure("create_order", order)
+            self.measure("submit_review", lambda i: db.submit_review(
+                pick_user(), pick_product(), self.rng.randint(1, 5), "Reseña de benchmark"))
+        return self.results
+
+def table_counts(db) -> dict:
+    counts = {}
+    for table in ('productos', 'usuarios', 'reseñas', 'favoritos', 'pedidos', 'detalle_pedido'):
+        row = db.execute_query(f"SELECT COUNT(*) as count FROM {table}", fetch_one=True)
+        counts[table] = int(row['count']) if row else None
+    return counts
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """Compara contra un JSON anterior; devuelve los casos que empeoraron más que threshold
+
+    Diferencias menores a min_delta_ms no cuentan: en consultas de pocos
+    microsegundos el ruido de medición supera fácilmente el umbral relativo.
+    """
+    regressions = []
+    print(f"\nComparación con la línea de base ({baseline.get('meta', {}).get('timestamp', '?')}):")
+    for name, current in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            print(f"  {name:<32} (nuevo)")
+            continue
+        ratios = {
+            metric: current[metric] / previous[metric] if previous[metric] else 1.0
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms')
+        }
+        marks = []
+        slower = [
+            metric for metric in ('p50_ms', 'p95_ms')
+            if ratios[metric] > threshold and current[metric] - previous[metric] > min_delta_ms
+        ]
+        if slower:
+            marks.append("MÁS LENTO")
+        if current['queries_per_call'] > previous['queries_per_call']:
+            marks.append(f"más consultas ({previous['queries_per_call']} -> {current['queries_per_call']})")
+        if marks:
+            regressions.append(name)
+        print(f"  {name:<32} p50 x{ratios['p50_ms']:.2f}  p95 x{ratios['p95_ms']:.2f}  "
+              f"p99 x{ratios['p99_ms']:.2f}  {' '.join(marks)}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Datos sintéticos y benchmarks de la base de PetZone")
+    parser.add_argument("--db", default="sqlite:petzone-bench.db",
+                        help="mysql, sqlite o sqlite:ruta.db (como PETZONE_DB)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for table in SCALES['small']:
+        parser.add_argument(f"--{table}", type=int, help=f"cantidad de {table} (reemplaza la escala)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-generate", action="store_true", help="medir sobre los datos existentes")
+    parser.add_argument("--generate-only", action="store_true")
+    parser.add_argument("--read-only", action="store_true", help="no medir create_order ni submit_review")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--query-cache", type=int, default=0, help="tamaño de la caché de consultas (0: sin caché)")
+    parser.add_argument("--output", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="factor de empeoramiento de p50/p95 que cuenta como regresión")
+    parser.add_argument("--min-delta", type=float, default=0.5,
+                        help="diferencia mínima en ms para considerar una regresión")
+    args = parser.parse_args(argv)
+
+    counter = QueryCounter()
+    backend = petzone.create_backend(args.db)
+    db = petzone.DatabaseManager(query_cache_size=args.query_cache,
+                                 backend=backend and CountingBackend(backend, counter))
+    if backend is None:
+        # MySQL con la configuración de DatabaseManager
+        db.backend = CountingBackend(db.backend, counter)
+    # Una base importada de un dump anterior no tiene producto_rating
+    db.ensure_schema()
+
+    scale = dict(SCALES[args.scale])
+    for table in scale:
+        if getattr(args, table) is not None:
+            scale[table] = getattr(args, table)
+
+    if not args.skip_generate:
+        DataGenerator(db, seed=args.seed).generate(**scale)
+    if args.generate_only:
+        db.close()
+        return 0
+
+    print(f"\nBenchmark sobre {db.backend.name} ({args.iterations} iteraciones):")
+    benchmark = Benchmark(db, counter, iterations=args.iterations, warmup=args.warmup, seed=args.seed)
+    results = benchmark.run(write=not args.read_only)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'backend': db.backend.name,
+            'db': args.db,
+            'scale': args.scale,
+            'rows': table_counts(db),
+            'seed': args.seed,
+            'iterations': args.iterations,
+            'query_cache': args.query_cache,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    db.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold, args.min_delta)
+        if regressions:
+            print(f"\nRegresiones: {', '.join(regressions)}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,8 @@
+# Perfil de arranque opcional (STARTUP_PROFILE=1 o --profile-startup): va antes
+# que los demás imports para poder medirlos
+import startup_profiler
+startup_profiler.enable_from_env()
+
 import tkinter as tk
 from tkinter import ttk, font, messagebox, simpledialog
 from datetime import datetime
@@ -0,0 +1,246 @@
+"""Vigilante de congelamientos del hilo de Tk
+
+Un latido programado con root.after marca cada vez que el bucle de eventos
+atiende sus timers. Un hilo aparte revisa el último latido: si se atrasa más
+que el umbral, el hilo de Tk está trabado (una consulta síncrona, un
+time.sleep, destruir cientos de widgets) y mientras dure toma muestras de su
+pila con sys._current_frames(). Cuando el latido vuelve, el congelamiento se
+guarda como una línea JSON, con su duración y las pilas más vistas, en un
+archivo que rota solo.
+
+Está desactivado salvo que se pida:
+    STALL_WATCHDOG=1 python mascotas-ari.py            (escribe mascotas-ari.stalls.jsonl)
+    STALL_WATCHDOG=congelamientos.jsonl python mascotas-ari.py
+    STALL_WATCHDOG_MS=100                              umbral de atraso (por defecto 100 ms)
+
+Para ver los peores:
+    python stall_watchdog.py mascotas-ari.stalls.jsonl [--limit 20] [--stacks 2]
+"""
+import collections
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+ENV_VAR = "STALL_WATCHDOG"
+THRESHOLD_ENV_VAR = "STALL_WATCHDOG_MS"
+
+_STDLIB_DIR = os.path.dirname(os.__file__)
+
+
+class StallWatchdog:
+    def __init__(self, root, output: str, threshold_ms: float = 100, interval_ms: int = 50,
+                 sample_ms: float = 10, max_stack_depth: int = 40,
+                 max_bytes: int = 5 * 1024 * 1024, backups: int = 3):
+        self.root = root
+        self.output = output
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self.sample_interval = sample_ms / 1000
+        self.max_stack_depth = max_stack_depth
+        self.stalls = 0
+
+        self._logger = logging.getLogger(f"stall_watchdog.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._handler = RotatingFileHandler(output, maxBytes=max_bytes, backupCount=backups,
+                                            encoding="utf-8", delay=True)
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger.addHandler(self._handler)
+
+        self._main_ident = threading.main_thread().ident
+        self._last_beat = time.perf_counter()
+        self._after_id = None
+        self._running = False
+        self._thread = None
+
+    # --- latido (hilo de Tk) ------------------------------------------------
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._last_beat = time.perf_counter()
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el vigilante; guarda el congelamiento en curso si lo hay"""
+        if not self._running:
+            return
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+        self._handler.close()
+
+    def _beat(self):
+        self._last_beat = time.perf_counter()
+        if self._running:
+            self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    # --- muestreo (hilo del vigilante) --------------------------------------
+
+    def _watch(self):
+        expected = self.interval_ms / 1000
+        stall = None
+        while self._running:
+            time.sleep(self.sample_interval)
+            beat = self._last_beat
+            late = time.perf_counter() - beat - expected
+
+            if stall is not None and beat != stall["beat"]:
+                # Volvió el latido: el congelamiento duró hasta ese momento
+                self._report(stall, beat - stall["beat"] - expected)
+                stall = None
+                continue
+
+            if late < self.threshold:
+                continue
+            if stall is None:
+                stall = {
+                    "beat": beat,
+                    "at": time.time() - late,
+                    "samples": collections.Counter(),
+                }
+            stack = self._sample()
+            if stack:
+                stall["samples"][stack] += 1
+
+        if stall is not None:
+            self._report(stall, time.perf_counter() - stall["beat"] - expected, ongoing=True)
+
+    def _sample(self) -> tuple:
+        """Pila actual del hilo principal, de afuera hacia adentro"""
+        frame = sys._current_frames().get(self._main_ident)
+        stack = []
+        while frame is not None and len(stack) < self.max_stack_depth:
+            code = frame.f_code
+            stack.append((code.co_filename, frame.f_lineno, code.co_name))
+            frame = frame.f_back
+        return tuple(reversed(stack))
+
+    def _report(self, stall: dict, seconds: float, ongoing: bool = False):
+        samples = stall["samples"]
+        total = sum(samples.values())
+        stacks = [
+            {"count": count, "frames": [format_frame(frame) for frame in stack]}
+            for stack, count in samples.most_common(5)
+        ]
+        culprit = find_culprit(samples.most_common(1)[0][0]) if samples else "?"
+        record = {
+            "at": datetime.fromtimestamp(stall["at"]).isoformat(timespec="milliseconds"),
+            "duration_ms": round(seconds * 1000, 1),
+            "samples": total,
+            "culprit": culprit,
+            "stacks": stacks,
+        }
+        if ongoing:
+            record["ongoing"] = True
+        self.stalls += 1
+        print(f"⚠️ Interfaz congelada {record['duration_ms']:.0f} ms en {culprit}")
+        try:
+            self._logger.info(json.dumps(record, ensure_ascii=False))
+        except Exception as e:
+            print(f"No se pudo guardar el congelamiento: {e}")
+
+
+def format_frame(frame: tuple) -> str:
+    filename, lineno, name = frame
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def find_culprit(stack: tuple) -> str:
+    """El frame más interno que no es de la biblioteca estándar (tkinter incluido)"""
+    for frame in reversed(stack):
+        if not frame[0].startswith(_STDLIB_DIR) and frame[0] != __file__:
+            return format_frame(frame)
+    return format_frame(stack[-1]) if stack else "?"
+
+
+def start_from_env(root, app_name: str = None):
+    """Arranca el vigilante si se pidió por STALL_WATCHDOG; devuelve el vigilante o None"""
+    output = os.environ.get(ENV_VAR, "")
+    if not output or output == "0":
+        return None
+
+    if output == "1":
+        app_name = app_name or os.path.basename(sys.argv[0] or "app")
+        output = os.path.splitext(app_name)[0] + ".stalls.jsonl"
+    threshold = float(os.environ.get(THRESHOLD_ENV_VAR, "100") or 100)
+    watchdog = StallWatchdog(root, output, threshold_ms=threshold)
+    watchdog.start()
+    print(f"Vigilante de congelamientos (>{threshold:.0f} ms) en {output}")
+    return watchdog
+
+
+# --- visor --------------------------------------------------------------------
+
+def load_records(paths: list) -> list:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    records.append(json.loads(line))
+    return records
+
+
+def print_worst(records: list, limit: int = 20, stacks: int = 1):
+    ranked = sorted(records, key=lambda record: -record["duration_ms"])[:limit]
+    print(f"{'ms':>8}  {'cuándo':<23}  dónde")
+    for record in ranked:
+        print(f"{record['duration_ms']:>8.0f}  {record['at']:<23}  {record['culprit']}")
+        for stack in record["stacks"][:stacks]:
+            share = stack["count"] / record["samples"] if record["samples"] else 0
+            print(f"{'':>10}{share:>4.0%} de {record['samples']} muestras:")
+            for frame in stack["frames"][-8:]:
+                print(f"{'':>16}{frame}")
+
+
+def print_by_culprit(records: list, limit: int = 20):
+    """Suma de congelamientos por lugar: lo que más tiempo de interfaz cuesta"""
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record["culprit"], [0, 0.0, 0.0])
+        group[0] += 1
+        group[1] += record["duration_ms"]
+        group[2] = max(group[2], record["duration_ms"])
+    rows = sorted(groups.items(), key=lambda item: -item[1][1])[:limit]
+    print(f"{'veces':>6} {'total ms':>10} {'máx ms':>9}  dónde")
+    for culprit, (count, total, worst) in rows:
+        print(f"{count:>6} {total:>10.0f} {worst:>9.0f}  {culprit}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Peores congelamientos del hilo de Tk")
+    parser.add_argument("logs", nargs="+", help="archivos .stalls.jsonl (y sus rotados .1, .2, ...)")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--stacks", type=int, default=1, help="pilas a mostrar por congelamiento")
+    parser.add_argument("--by-culprit", action="store_true", help="agrupar por lugar (total y máximo)")
+    args = parser.parse_args(argv)
+
+    records = load_records(args.logs)
+    if not records:
+        print("No hay congelamientos registrados")
+        return 1
+    if args.by_culprit:
+        print_by_culprit(records, args.limit)
+    else:
+        print_worst(records, args.limit, args.stacks)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
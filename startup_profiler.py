@@ -0,0 +1,420 @@
+"""Perfil del arranque de las apps (mascotas-ari.py, comida-guada.py, ropa-alma.py)
+
+Registra una línea de tiempo anidada desde el primer import hasta que Tk
+dibuja la primera pantalla: cada import, cada método setup_*/show_*/init_* y
+__init__ de la app, cada llamada a la base de datos y la creación de Tk,
+fuentes e imágenes. Al terminar escribe un JSON en formato Chrome trace (se
+abre en chrome://tracing o https://ui.perfetto.dev) e imprime un resumen.
+
+Está desactivado salvo que se pida, con la variable de entorno o con el flag:
+    STARTUP_PROFILE=1 python mascotas-ari.py
+    STARTUP_PROFILE=arranque.json python comida-guada.py
+    python ropa-alma.py --profile-startup[=arranque.json]
+
+STARTUP_PROFILE_LINGER=segundos sigue registrando un rato después de la
+primera pantalla (p. ej. para ver la inicialización de la base en segundo
+plano). Para comparar dos corridas:
+    python startup_profiler.py --compare antes.json despues.json
+"""
+import builtins
+import functools
+import os
+import sys
+import threading
+import time
+
+ENV_VAR = "STARTUP_PROFILE"
+LINGER_ENV_VAR = "STARTUP_PROFILE_LINGER"
+CLI_FLAG = "--profile-startup"
+
+# Métodos de la app que se registran, por prefijo
+APP_METHOD_PREFIXES = ("setup_", "show_", "init_")
+# Clases de la app cuyos métodos cuentan como acceso a la base de datos
+DB_CLASS_SUFFIXES = ("DatabaseManager", "Backend", "ConnectionPool")
+# (módulo, clase, método) de bibliotecas que pesan en el arranque
+LIBRARY_METHODS = {
+    ("tkinter", "Tk", "__init__"): "tk",
+    ("tkinter", "PhotoImage", "__init__"): "tk",
+    ("tkinter.font", "Font", "__init__"): "tk",
+    ("PIL.ImageTk", "PhotoImage", "__init__"): "tk",
+}
+# (módulo, función) que se reemplazan al importarse
+LIBRARY_FUNCTIONS = {
+    ("mysql.connector", "connect"): "db",
+    ("sqlite3", "connect"): "db",
+}
+
+_profiler = None
+
+class StartupProfiler:
+    def __init__(self, output: str, app_name: str, linger: float = 0):
+        self.output = output
+        self.app_name = app_name
+        self.linger = linger
+        self.started = time.perf_counter_ns()
+        # (nombre, categoría, hilo, inicio ns, duración ns, args)
+        self.spans = []
+        self.instants = []
+        self.thread_names = {}
+        self.first_paint_ns = None
+        self.finished = False
+        self._lock = threading.Lock()
+        self._original_build_class = None
+        self._import_hook = None
+
+    # --- registro ---------------------------------------------------------
+
+    def record(self, name: str, category: str, start_ns: int, end_ns: int, args: dict = None):
+        if self.finished:
+            return
+        thread = threading.current_thread()
+        with self._lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            self.spans.append((name, category, thread.ident, start_ns, end_ns - start_ns, args))
+
+    def mark(self, name: str):
+        self.instants.append((name, threading.get_ident(), time.perf_counter_ns()))
+
+    def timed(self, name: str, category: str, function):
+        """Envuelve function para registrar cada llamada"""
+        profiler = self
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if profiler.finished:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(name, category, start, time.perf_counter_ns())
+
+        wrapper.__startup_profiled__ = True
+        return wrapper
+
+    # --- instalación ------------------------------------------------------
+
+    def install(self):
+        """Engancha imports y definiciones de clases (sin costo por llamada en lo demás)"""
+        self._import_hook = _ImportTimer(self)
+        sys.meta_path.insert(0, self._import_hook)
+        self._original_build_class = builtins.__build_class__
+        builtins.__build_class__ = self._build_class
+        import atexit
+        atexit.register(self.finish)
+
+    def uninstall(self):
+        if self._import_hook in sys.meta_path:
+            sys.meta_path.remove(self._import_hook)
+        if self._original_build_class is not None:
+            builtins.__build_class__ = self._original_build_class
+
+    def _build_class(self, func, name, *bases, **kwargs):
+        cls = self._original_build_class(func, name, *bases, **kwargs)
+        try:
+            self.instrument_class(cls)
+        except Exception:
+            pass
+        return cls
+
+    def instrument_class(self, cls):
+        module = getattr(cls, "__module__", "")
+        if module == "__main__":
+            is_db = cls.__name__.endswith(DB_CLASS_SUFFIXES)
+            for attr, value in list(vars(cls).items()):
+                if not _is_plain_function(value):
+                    continue
+                if is_db:
+                    category = "db"
+                elif attr == "__init__":
+                    category = "init"
+                elif attr.startswith(APP_METHOD_PREFIXES):
+                    category = "setup"
+                else:
+                    continue
+                setattr(cls, attr, self.timed(f"{cls.__name__}.{attr}", category, value))
+            return
+        for (lib_module, lib_class, attr), category in LIBRARY_METHODS.items():
+            if module == lib_module and cls.__name__ == lib_class and _is_plain_function(vars(cls).get(attr)):
+                setattr(cls, attr, self.timed(f"{lib_class}.{attr}", category, vars(cls)[attr]))
+
+    def module_loaded(self, name: str, module):
+        """Ajustes sobre módulos recién importados"""
+        for (lib_module, function), category in LIBRARY_FUNCTIONS.items():
+            original = getattr(module, function, None) if name == lib_module else None
+            if original is not None and not getattr(original, "__startup_profiled__", False):
+                setattr(module, function, self.timed(f"{lib_module}.{function}", category, original))
+        if name == "tkinter":
+            self._hook_mainloop(module)
+
+    def _hook_mainloop(self, tkinter):
+        profiler = self
+        original = tkinter.Misc.mainloop
+
+        @functools.wraps(original)
+        def mainloop(widget, n=0):
+            if not profiler.finished and profiler.first_paint_ns is None:
+                profiler.mark("mainloop")
+                # Tk dibuja en sus tareas idle: esta corre después de la primera pintada
+                widget.after_idle(lambda: profiler.first_paint(widget))
+            return original(widget, n)
+
+        tkinter.Misc.mainloop = mainloop
+
+    def first_paint(self, widget):
+        if self.first_paint_ns is not None:
+            return
+        self.first_paint_ns = time.perf_counter_ns()
+        self.mark("primera pantalla")
+        if self.linger > 0:
+            widget.after(int(self.linger * 1000), self.finish)
+        else:
+            self.finish()
+
+    # --- salida -----------------------------------------------------------
+
+    def finish(self):
+        if self.finished:
+            return
+        end = time.perf_counter_ns()
+        self.finished = True
+        self.uninstall()
+        with self._lock:
+            spans = list(self.spans)
+        trace = self.build_trace(spans, end)
+        try:
+            with open(self.output, "w", encoding="utf-8") as f:
+                import json
+                json.dump(trace, f)
+        except OSError as e:
+            print(f"No se pudo guardar el perfil de arranque: {e}")
+            return
+        print_summary(trace)
+        print(f"Perfil de arranque guardado en {self.output}")
+
+    def build_trace(self, spans, end_ns: int) -> dict:
+        pid = os.getpid()
+        main_thread = threading.main_thread().ident
+        to_us = lambda ns: round((ns - self.started) / 1000, 1)
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": self.app_name}}]
+        for ident, name in self.thread_names.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}})
+
+        first_paint = self.first_paint_ns or end_ns
+        events.append({
+            "name": "arranque", "cat": "startup", "ph": "X", "pid": pid, "tid": main_thread,
+            "ts": 0, "dur": to_us(first_paint)
+        })
+        for name, category, tid, start, duration, args in spans:
+            event = {"name": name, "cat": category, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": to_us(start), "dur": round(duration / 1000, 1)}
+            if args:
+                event["args"] = args
+            events.append(event)
+        for name, tid, moment in self.instants:
+            events.append({"name": name, "ph": "i", "s": "g", "pid": pid, "tid": tid, "ts": to_us(moment)})
+
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "app": self.app_name,
+                "first_paint_ms": round((first_paint - self.started) / 1e6, 1) if self.first_paint_ns else None,
+                "python": sys.version.split()[0],
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+        }
+
+class _TimedLoader:
+    """Loader que mide la carga de un módulo y delega todo lo demás"""
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def create_module(self, spec):
+        create = getattr(self._loader, "create_module", None)
+        if create is None:
+            return None
+        start = time.perf_counter_ns()
+        module = create(spec)
+        if module is not None:
+            # Las extensiones en C hacen casi todo su trabajo al crearse
+            self._profiler.record(f"import {self._name} (crear)", "import", start, time.perf_counter_ns())
+        return module
+
+    def exec_module(self, module):
+        start = time.perf_counter_ns()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler.record(f"import {self._name}", "import", start, time.perf_counter_ns())
+        self._profiler.module_loaded(self._name, module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+class _ImportTimer:
+    """Buscador de sys.meta_path que envuelve el loader de cada módulo importado"""
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, name, path=None, target=None):
+        if self.profiler.finished or getattr(self._local, "busy", False):
+            return None
+        self._local.busy = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.busy = False
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self.profiler, name)
+        return spec
+
+def _is_plain_function(value) -> bool:
+    """Funciones comunes: no generadores ni context managers (medirían sólo su creación)"""
+    code = getattr(value, "__code__", None)
+    return (
+        code is not None
+        and not hasattr(value, "__wrapped__")
+        and not code.co_flags & 0x2A0  # CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR
+    )
+
+def self_times(events: list) -> dict:
+    """Tiempo propio (sin hijos del mismo hilo) de cada evento X, en µs"""
+    result = {}
+    by_thread = {}
+    for index, event in enumerate(events):
+        if event.get("ph") == "X" and event.get("cat") != "startup":
+            by_thread.setdefault(event["tid"], []).append((event["ts"], -event["dur"], index))
+    for spans in by_thread.values():
+        spans.sort()
+        stack = []
+        for ts, negative_duration, index in spans:
+            end = ts - negative_duration
+            while stack and stack[-1][1] <= ts:
+                stack.pop()
+            result[index] = -negative_duration
+            if stack:
+                result[stack[-1][0]] -= min(end, stack[-1][1]) - ts
+            stack.append((index, end))
+    return result
+
+def aggregate(trace: dict) -> dict:
+    """{nombre: {'category', 'calls', 'total_ms', 'self_ms'}}"""
+    events = trace.get("traceEvents", [])
+    own = self_times(events)
+    totals = {}
+    for index, event in enumerate(events):
+        if index not in own:
+            continue
+        entry = totals.setdefault(event["name"], {"category": event.get("cat", ""), "calls": 0,
+                                                   "total_ms": 0.0, "self_ms": 0.0})
+        entry["calls"] += 1
+        entry["total_ms"] += event["dur"] / 1000
+        entry["self_ms"] += own[index] / 1000
+    return totals
+
+def print_summary(trace: dict, limit: int = 20):
+    other = trace.get("otherData", {})
+    totals = aggregate(trace)
+    first_paint = other.get("first_paint_ms")
+    print(f"\nArranque de {other.get('app', '?')}: "
+          + (f"primera pantalla en {first_paint:.1f} ms" if first_paint is not None else "sin primera pantalla"))
+
+    main_tid = next((e["tid"] for e in trace["traceEvents"] if e.get("cat") == "startup"), None)
+    main_events = {i for i, e in enumerate(trace["traceEvents"]) if e.get("tid") == main_tid}
+    own = self_times(trace["traceEvents"])
+    categories = {}
+    for index, duration in own.items():
+        event = trace["traceEvents"][index]
+        key = (event.get("cat", ""), "principal" if index in main_events else "otros hilos")
+        categories[key] = categories.get(key, 0) + duration / 1000
+    print(f"\n  {'categoría':<12} {'hilo':<12} {'propio ms':>10}")
+    for (category, thread), value in sorted(categories.items(), key=lambda item: -item[1]):
+        print(f"  {category:<12} {thread:<12} {value:>10.1f}")
+
+    print(f"\n  {'nombre':<48} {'cat':<7} {'llamadas':>8} {'total ms':>9} {'propio ms':>10}")
+    for name, entry in sorted(totals.items(), key=lambda item: -item[1]["self_ms"])[:limit]:
+        print(f"  {name[:48]:<48} {entry['category']:<7} {entry['calls']:>8} "
+              f"{entry['total_ms']:>9.1f} {entry['self_ms']:>10.1f}")
+
+def compare(before: dict, after: dict, limit: int = 20):
+    """Imprime las diferencias de tiempo entre dos perfiles de arranque"""
+    old_paint = before.get("otherData", {}).get("first_paint_ms")
+    new_paint = after.get("otherData", {}).get("first_paint_ms")
+    if old_paint is not None and new_paint is not None:
+        print(f"Primera pantalla: {old_paint:.1f} ms -> {new_paint:.1f} ms ({new_paint - old_paint:+.1f} ms)")
+
+    old_totals = aggregate(before)
+    new_totals = aggregate(after)
+    rows = []
+    for name in set(old_totals) | set(new_totals):
+        old = old_totals.get(name, {}).get("self_ms", 0.0)
+        new = new_totals.get(name, {}).get("self_ms", 0.0)
+        rows.append((new - old, name, old, new))
+    rows.sort(key=lambda row: -abs(row[0]))
+    print(f"\n  {'nombre':<48} {'antes ms':>9} {'después ms':>11} {'dif ms':>9}")
+    for delta, name, old, new in rows[:limit]:
+        print(f"  {name[:48]:<48} {old:>9.1f} {new:>11.1f} {delta:>+9.1f}")
+
+def enable_from_env(argv: list = None):
+    """Activa el perfil si se pidió por STARTUP_PROFILE o --profile-startup
+
+    Hay que llamarla antes de los demás imports de la app para que cuenten.
+    """
+    global _profiler
+    if _profiler is not None:
+        return _profiler
+    argv = sys.argv if argv is None else argv
+    output = os.environ.get(ENV_VAR, "")
+    for arg in list(argv[1:]):
+        if arg == CLI_FLAG or arg.startswith(CLI_FLAG + "="):
+            output = arg.partition("=")[2] or "1"
+            # La app no conoce el flag
+            argv.remove(arg)
+    if not output or output == "0":
+        return None
+
+    app_name = os.path.basename(argv[0]) if argv and argv[0] else "app"
+    if output == "1":
+        output = os.path.splitext(app_name)[0] + ".startup-trace.json"
+    linger = float(os.environ.get(LINGER_ENV_VAR, "0") or 0)
+    _profiler = StartupProfiler(output, app_name, linger)
+    _profiler.install()
+    return _profiler
+
+def main(argv=None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Resumen y comparación de perfiles de arranque")
+    parser.add_argument("traces", nargs="+", help="uno o dos archivos .startup-trace.json")
+    parser.add_argument("--compare", action="store_true", help="comparar el primero (antes) con el segundo")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    loaded = []
+    for path in args.traces:
+        with open(path, encoding="utf-8") as f:
+            loaded.append(json.load(f))
+    if args.compare:
+        if len(loaded) != 2:
+            parser.error("--compare necesita dos perfiles")
+        compare(loaded[0], loaded[1], args.limit)
+    else:
+        for trace in loaded:
+            print_summary(trace, args.limit)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())